@@ -0,0 +1,177 @@
+# backend/exports.py
+import csv
+import datetime
+import io
+import json
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import compress_sequence
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.views import APIView
+
+
+class CSVRenderer(BaseRenderer):
+    """Usado apenas na negociação (?format=csv); o conteúdo é gerado pela view"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Usado apenas na negociação (?format=ndjson); o conteúdo é gerado pela view"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+
+_BOOLEAN_VALUES = {'true': True, 'false': False}
+
+
+def model_field(model, path):
+    """Campo do modelo no fim de um caminho de lookup (ex.: 'category__slug')"""
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+class StreamingExportView(APIView):
+    """
+    Exportação completa de uma tabela em CSV ou NDJSON, com memória constante.
+
+    As linhas vêm de values_list() com apenas as colunas de `columns`, lidas com
+    QuerySet.iterator(chunk_size=...) e enviadas em blocos por um
+    StreamingHttpResponse, opcionalmente comprimidas com gzip (?gzip=true).
+
+    Filtros: ?date_from= / ?date_to= (data ou data/hora) sobre `date_field`, e os
+    parâmetros de `filter_params`, que aceitam vários valores separados por vírgula.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    # Lista de (cabeçalho, campo para values_list)
+    columns = []
+    date_field = 'created_at'
+    # {parâmetro da URL: campo}
+    filter_params = {}
+    filename = 'export'
+    chunk_size = 2000
+    # Tamanho aproximado de cada bloco enviado ao cliente
+    buffer_size = 64 * 1024
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.order_by('pk').values_list(*[field for _, field in self.columns])
+        fmt = request.accepted_renderer.format
+        content = self.render_csv(rows) if fmt == 'csv' else self.render_ndjson(rows)
+
+        filename = f"{self.filename}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+        content_type = request.accepted_renderer.media_type
+        if request.query_params.get('gzip', '').lower() in ('1', 'true'):
+            content = compress_sequence(content)
+            filename += '.gz'
+            content_type = 'application/gzip'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def handle_exception(self, exc):
+        # Erros (filtro inválido, permissão) voltam em JSON, não no formato da exportação
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+    def filter_queryset(self, queryset):
+        params = self.request.query_params
+        date_from = self.parse_date_param('date_from')
+        date_to = self.parse_date_param('date_to', end_of_day=True)
+        if date_from:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': date_from})
+        if date_to:
+            queryset = queryset.filter(**{f'{self.date_field}__lt': date_to})
+
+        for param, field in self.filter_params.items():
+            values = [value.strip() for value in params.get(param, '').split(',') if value.strip()]
+            if values:
+                values = self.parse_filter_values(param, model_field(queryset.model, field), values)
+                queryset = queryset.filter(**{f'{field}__in': values})
+        return queryset
+
+    def parse_filter_values(self, name, field, values):
+        """Converte os valores com o campo do modelo (ex.: ?is_active=true); inválidos viram 400"""
+        if isinstance(field, models.BooleanField):
+            values = [_BOOLEAN_VALUES.get(value.lower(), value) for value in values]
+        try:
+            return [field.to_python(value) for value in values]
+        except DjangoValidationError as exc:
+            raise ValidationError({name: exc.messages})
+
+    def parse_date_param(self, name, end_of_day=False):
+        """
+        Converte YYYY-MM-DD ou data/hora ISO em datetime. Datas puras em date_to
+        incluem o dia inteiro (o filtro usa < início do dia seguinte), o que
+        mantém a comparação direta na coluna e o uso do índice.
+        """
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            # Data pura primeiro: parse_datetime também aceita AAAA-MM-DD (meia-noite)
+            day = parse_date(value)
+            if day is not None:
+                if end_of_day:
+                    day += datetime.timedelta(days=1)
+                moment = datetime.datetime.combine(day, datetime.time.min)
+            else:
+                moment = parse_datetime(value)
+                if moment is None:
+                    raise ValueError
+        except ValueError:
+            raise ValidationError({name: "Use o formato AAAA-MM-DD ou AAAA-MM-DDTHH:MM:SS."})
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def _flush(self, buffer, force=False):
+        """Esvazia o buffer quando atinge ~buffer_size, para enviar poucos blocos grandes"""
+        if buffer.tell() >= self.buffer_size or (force and buffer.tell()):
+            chunk = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            return chunk
+        return None
+
+    def render_csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _ in self.columns])
+        for row in rows.iterator(chunk_size=self.chunk_size):
+            writer.writerow(['' if value is None else value for value in row])
+            chunk = self._flush(buffer)
+            if chunk:
+                yield chunk
+        chunk = self._flush(buffer, force=True)
+        if chunk:
+            yield chunk
+
+    def render_ndjson(self, rows):
+        buffer = io.StringIO()
+        headers = [header for header, _ in self.columns]
+        for row in rows.iterator(chunk_size=self.chunk_size):
+            buffer.write(json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+            buffer.write('\n')
+            chunk = self._flush(buffer)
+            if chunk:
+                yield chunk
+        chunk = self._flush(buffer, force=True)
+        if chunk:
+            yield chunk
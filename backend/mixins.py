@@ -0,0 +1,92 @@
+# backend/mixins.py
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Suporte a GET condicional (ETag / Last-Modified) para views de listagem e detalhe.
+
+    Em listagens paginadas, o estado é o da página que a resposta usaria (IDs e
+    datas das linhas, lidos com a mesma consulta indexada da paginação), e não um
+    aggregate sobre a tabela inteira; sem paginação e no detalhe, é um único
+    aggregate (Max do campo de data + Count) sobre o queryset já filtrado. O 304 é
+    devolvido antes de qualquer serialização.
+
+    Se a view tiver estado extra (get_etag_extra), que muda a resposta sem mudar
+    a data, só o ETag é usado: o Last-Modified não é enviado e o
+    If-Modified-Since é ignorado, senão um cliente que mande só a data
+    receberia 304 com a resposta desatualizada. Views com cache versionado
+    devem usar os validadores guardados com a resposta (CatalogCacheMixin).
+    """
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, 'list', super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, 'retrieve', super().retrieve, *args, **kwargs)
+
+    def get_conditional_queryset(self, kind, **kwargs):
+        """Queryset sobre o qual o estado é calculado (mesmos filtros da resposta)"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if kind == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_etag_extra(self, request):
+        """Informações adicionais que mudam a resposta sem alterar o campo de data"""
+        return ''
+
+    def get_page_state(self, request, queryset):
+        """(Max do campo de data, linhas da página e se há próxima) da página pedida"""
+        page = self.paginator.paginate_queryset(queryset.prefetch_related(None), request, view=self)
+        rows = [(obj.pk, getattr(obj, self.last_modified_field)) for obj in page]
+        last_modified = max((value for _, value in rows if value), default=None)
+        has_next = self.paginator.get_next_link() is not None
+        return last_modified, ','.join(f"{pk}@{value.isoformat() if value else ''}" for pk, value in rows) + f"|{has_next}"
+
+    def get_conditional_state(self, request, kind, **kwargs):
+        queryset = self.get_conditional_queryset(kind, **kwargs)
+        if kind == 'list' and self.paginator is not None:
+            last_modified, rows = self.get_page_state(request, queryset)
+        else:
+            state = queryset.order_by().aggregate(
+                last_modified=Max(self.last_modified_field),
+                total=Count('pk'),
+            )
+            if kind == 'retrieve' and not state['total']:
+                return None, None
+            last_modified, rows = state['last_modified'], str(state['total'])
+
+        extra = str(self.get_etag_extra(request))
+        raw = '|'.join([
+            request.path,
+            request.META.get('QUERY_STRING', ''),
+            str(request.user.pk or ''),
+            last_modified.isoformat() if last_modified else '',
+            rows,
+            extra,
+        ])
+        etag = quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+        return etag, None if extra else last_modified
+
+    def conditional_response(self, request, kind, handler, *args, **kwargs):
+        etag, last_modified = self.get_conditional_state(request, kind, **kwargs)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
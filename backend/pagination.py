@@ -0,0 +1,246 @@
+# backend/pagination.py
+import datetime
+import json
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .exports import model_field
+
+
+class CursorEncoder(json.JSONEncoder):
+    """Serializa os valores do cursor sem perder precisão (microssegundos, decimais)"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.date, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, (Decimal, uuid.UUID)):
+            return str(o)
+        return super().default(o)
+
+
+class StaffPageNumberPagination(PageNumberPagination):
+    """Paginação por número de página, disponível apenas para administradores (?page=)"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre a ordenação do queryset.
+
+    O cursor guarda os valores de todos os campos da ordenação da última linha
+    da página, com o ID como desempate, e a próxima página é obtida com um filtro
+    lexicográfico (a < x OR (a = x AND id < y)). Assim o custo de cada página é
+    constante, qualquer que seja a profundidade, desde que exista um índice
+    composto com os mesmos campos.
+
+    Ordenações por expressões (como a relevância da busca textual) usam um
+    deslocamento dentro do cursor.
+    Administradores podem optar pela paginação por página com ?page=.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    default_ordering = ('-created_at', '-id')
+    offset_pagination_class = StaffPageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.offset_paginator = None
+        if request.user.is_staff and self.offset_pagination_class.page_query_param in request.query_params:
+            self.offset_paginator = self.offset_pagination_class()
+            return self.offset_paginator.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request, queryset.model)
+
+        if self.ordering is None:
+            return self._paginate_by_offset(queryset, cursor)
+        return self._paginate_by_keyset(queryset, cursor)
+
+    def _paginate_by_offset(self, queryset, cursor):
+        offset = cursor.get('o', 0) if cursor else 0
+        results = list(queryset[offset:offset + self.page_size + 1])
+        has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        self.next_cursor = {'o': offset + self.page_size} if has_next else None
+        self.previous_cursor = {'o': max(offset - self.page_size, 0)} if offset else None
+        return results
+
+    def _paginate_by_keyset(self, queryset, cursor):
+        # Na volta (página anterior) a ordenação é invertida por completo,
+        # inclusive a posição dos NULLs, e o resultado é desvirado no final
+        reverse = bool(cursor and cursor.get('r'))
+        ordering = [(field, desc != reverse, nullable) for field, desc, nullable in self.ordering]
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+
+        queryset = queryset.order_by(*[
+            F(field).desc(**nulls) if desc else F(field).asc(**nulls)
+            for field, desc, _ in ordering
+        ])
+        if cursor:
+            queryset = queryset.filter(self._after(ordering, cursor['v'], nulls_last=not reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = cursor is not None if not reverse else has_more
+        self.next_cursor = {'v': self._key(results[-1])} if has_next and results else None
+        self.previous_cursor = {'v': self._key(results[0]), 'r': 1} if has_previous and results else None
+        return results
+
+    def _after(self, ordering, values, nulls_last):
+        """
+        Condição "linha vem depois do cursor" na ordenação informada:
+        (a < x) OR (a = x AND id < y), tratando NULLs apenas nos campos que os aceitam.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (field, desc, nullable), value in zip(ordering, values):
+            isnull = Q(**{f'{field}__isnull': True})
+            if value is None:
+                # Com NULLs por último, depois de um NULL só vêm outros NULLs
+                greater = Q(pk__in=[]) if nulls_last else ~isnull
+                same = isnull
+            else:
+                greater = Q(**{f"{field}__{'lt' if desc else 'gt'}": value})
+                if nullable and nulls_last:
+                    greater |= isnull
+                same = Q(**{field: value})
+            condition |= equal & greater
+            equal &= same
+
+        # Limite redundante no primeiro campo para o banco usar o índice como intervalo
+        field, desc, nullable = ordering[0]
+        if values[0] is not None and not nullable:
+            condition &= Q(**{f"{field}__{'lte' if desc else 'gte'}": values[0]})
+        return condition
+
+    def _key(self, obj):
+        values = []
+        for field, _, _ in self.ordering:
+            value = obj
+            for attr in field.split(LOOKUP_SEP):
+                value = getattr(value, attr, None) if value is not None else None
+            values.append(value)
+        return values
+
+    def get_ordering(self, queryset):
+        """
+        Lista de (campo, decrescente, aceita NULL) da ordenação atual do queryset,
+        com o ID como desempate. Retorna None se a ordenação usar expressões.
+        """
+        order_by = list(queryset.query.order_by) or list(queryset.model._meta.ordering) or list(self.default_ordering)
+        if not all(isinstance(field, str) for field in order_by):
+            return None
+
+        ordering = []
+        for field in order_by:
+            desc = field.startswith('-')
+            name = field.lstrip('-')
+            name = 'id' if name == 'pk' else name
+            ordering.append((name, desc, self._is_nullable(queryset.model, name)))
+
+        if not any(name == 'id' for name, _, _ in ordering):
+            ordering.append(('id', ordering[-1][1], False))
+        return ordering
+
+    def _is_nullable(self, model, path):
+        """Indica se o campo (podendo atravessar relações) pode ser NULL"""
+        meta = model._meta
+        for attr in path.split(LOOKUP_SEP):
+            field = meta.get_field(attr)
+            if field.null:
+                return True
+            if field.is_relation and field.related_model:
+                meta = field.related_model._meta
+        return False
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def encode_cursor(self, cursor):
+        data = json.dumps(cursor, cls=CursorEncoder, separators=(',', ':'))
+        token = urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        """
+        Cursor da URL, com os valores convertidos pelos campos da ordenação:
+        um cursor adulterado recebe 400 em vez de chegar ao banco
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            if self.ordering is None:
+                cursor['o'] = max(int(cursor['o']), 0)
+            elif not isinstance(cursor['v'], list) or len(cursor['v']) != len(self.ordering):
+                raise ValueError
+            else:
+                cursor['v'] = [
+                    None if value is None else model_field(model, field).to_python(value)
+                    for (field, _, _), value in zip(self.ordering, cursor['v'])
+                ]
+        except (TypeError, ValueError, KeyError, UnicodeError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: "Cursor inválido."})
+        return cursor
+
+    def get_next_link(self):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_next_link()
+        if self.next_cursor is None:
+            return None
+        return self.encode_cursor(self.next_cursor)
+
+    def get_previous_link(self):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_previous_link()
+        if self.previous_cursor is None:
+            return None
+        if self.previous_cursor == {'o': 0}:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,97 @@
+# backend/query_plans.py
+#
+# Verificação dos planos das consultas quentes. Cada app declara em
+# <app>/query_plans.py uma lista QUERY_PLANS de QueryPlan; cada entrada faz a
+# requisição real (view, filtros, paginação) ou chama a função real de um job,
+# e todas as consultas SELECT executadas passam por EXPLAIN. O teste em
+# products/tests.py roda a lista com a suíte.
+import json
+import re
+from collections import namedtuple
+from importlib import import_module
+from django.apps import apps
+from django.utils.module_loading import module_has_submodule
+
+# `run(client, fixtures)` executa o trabalho; `index_scans` são os índices que podem
+# ser percorridos inteiros (página com LIMIT na ordem do índice, índice parcial
+# que já é o resultado); qualquer outro acesso precisa ser uma busca pelo índice
+# (SEARCH no SQLite, Index Cond no PostgreSQL)
+QueryPlan = namedtuple('QueryPlan', ['name', 'run', 'index_scans'], defaults=[()])
+
+_SQLITE_ACCESS_RE = re.compile(r'\b(SCAN|SEARCH) (\w+)(.*)$')
+_SQLITE_INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+# Resultados intermediários (subconsultas, janelas) lidos pelo próprio plano
+_SQLITE_SUBQUERY_RE = re.compile(r'\b(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+
+def api_get(path, params=None, user=None, pages=1):
+    """
+    Requisição GET à API com `path` formatado pelas fixtures; com `pages`,
+    segue o link 'next' para verificar também o filtro do cursor
+    """
+    def run(client, fixtures):
+        client.force_authenticate(fixtures[user] if user else None)
+        url, query = path.format(**fixtures), {key: str(value).format(**fixtures) for key, value in (params or {}).items()}
+        for _ in range(pages):
+            response = client.get(url, query, HTTP_ACCEPT='application/json')
+            if response.status_code != 200:
+                raise AssertionError(f"GET {url}: {response.status_code} {response.content[:200]!r}")
+            url, query = response.json().get('next') if pages > 1 else None, None
+            if not url:
+                break
+    return run
+
+
+def call(function, *args, **kwargs):
+    """Chama a função real de um job (ex.: recent_sales), fora de uma view"""
+    return lambda client, fixtures: function(*args, **kwargs)
+
+
+def collect_query_plans():
+    """Lê QUERY_PLANS dos módulos query_plans.py de cada app instalado"""
+    for app_config in apps.get_app_configs():
+        if module_has_submodule(app_config.module, 'query_plans'):
+            yield from import_module(f'{app_config.name}.query_plans').QUERY_PLANS
+
+
+def explain(connection, sql, index_scans=()):
+    """Retorna (linhas do plano, acessos que não são busca por índice)"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            lines = [row[-1] for row in cursor.fetchall()]
+            subqueries = {match.group(1) for match in map(_SQLITE_SUBQUERY_RE.search, lines) if match}
+            problems = []
+            for line in lines:
+                match = _SQLITE_ACCESS_RE.search(line)
+                if not match or match.group(1) == 'SEARCH' or match.group(2) in subqueries | {'CONSTANT'}:
+                    continue
+                detail = match.group(3)
+                # O índice FTS5 (MATCH) aparece como varredura da tabela virtual
+                if 'VIRTUAL TABLE' in detail:
+                    continue
+                index = _SQLITE_INDEX_RE.search(detail)
+                if index and index.group(1) in index_scans:
+                    continue
+                problems.append(line.strip())
+            return lines, problems
+
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    lines, problems = [], []
+
+    def walk(node, depth=0):
+        relation = node.get('Relation Name', '')
+        line = f"{'  ' * depth}{node['Node Type']} {relation}".rstrip()
+        lines.append(line)
+        if node['Node Type'] == 'Seq Scan':
+            problems.append(line.strip())
+        elif node['Node Type'] in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node:
+            if node.get('Index Name') not in index_scans:
+                problems.append(line.strip())
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk(plan[0]['Plan'])
+    return lines, problems
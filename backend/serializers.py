@@ -0,0 +1,53 @@
+# backend/serializers.py
+from rest_framework.serializers import ListSerializer
+
+
+def _parse_fields(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def sparse_fieldsets(query_params, fields_param='fields', omit_param='omit'):
+    """Conjuntos (only, omit) pedidos em ?fields= e ?omit="""
+    return _parse_fields(query_params.get(fields_param)), _parse_fields(query_params.get(omit_param))
+
+
+def apply_sparse_fieldsets(items, only, omit):
+    """
+    Aplica ?fields=/?omit= a dados já serializados (ex.: um snapshot
+    renderizado sem eles e compartilhado entre requisições)
+    """
+    return [
+        {name: value for name, value in item.items() if (not only or name in only) and name not in omit}
+        for item in items
+    ]
+
+
+class SparseFieldsetsMixin:
+    """
+    Permite escolher os campos da resposta com ?fields=id,name ou remover
+    campos com ?omit=description,images.
+
+    Vale apenas para leituras (GET) e para o serializer de nível superior;
+    os campos removidos nem chegam a ser calculados. Com
+    context['sparse_fieldsets'] = False o serializer ignora os parâmetros.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if (request is None or request.method != 'GET' or not self._is_top_level()
+                or not self.context.get('sparse_fieldsets', True)):
+            return fields
+
+        only, omit = sparse_fieldsets(request.query_params, self.fields_query_param, self.omit_query_param)
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        for name in omit:
+            fields.pop(name, None)
+        return fields
+
+    def _is_top_level(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, ListSerializer) and parent.parent is None)
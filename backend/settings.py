@@ -85,6 +85,9 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    # Paginação por cursor (keyset); administradores podem usar ?page= (ver backend/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
 # Configuração específica para o Django Filter
@@ -121,6 +124,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Banco de testes em arquivo: os testes de concorrência usam uma conexão por
+        # thread, e o banco em memória compartilhado trava as tabelas em vez de esperar
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -173,6 +179,17 @@ AUTH_USER_MODEL = 'users.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Versões redimensionadas das imagens de produtos e categorias (ver products/images.py).
+# Os arquivos em media/derivatives/ têm nome pelo hash do conteúdo e podem ser
+# servidos com Cache-Control: immutable.
+IMAGE_DERIVATIVES = {
+    'SIZES': {'thumb': 160, 'card': 480, 'zoom': 1600},
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 82,
+    'WORKERS': 2,
+    'ASYNC': True,
+}
+
 # Configuração do JWT
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -217,6 +234,43 @@ if not DEBUG:
         }
     }
 
+# Tempo de vida das respostas do catálogo em cache (invalidadas pela versão do catálogo)
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Número de avaliações recentes incluídas no detalhe do produto (o restante em /api/products/<slug>/reviews/)
+PRODUCT_DETAIL_REVIEWS = 5
+
+# Intervalo (segundos) entre verificações da versão do snapshot de produtos de emergência
+EMERGENCY_SNAPSHOT_CHECK_INTERVAL = 1
+
+# Ranking de produtos em destaque (recalculado por `manage.py refresh_featured_products`).
+# WEIGHTS aceita uma entrada 'default' e entradas por slug de categoria.
+FEATURED_PRODUCTS = {
+    'SIZE': 50,
+    'SALES_DAYS': 30,
+    'WEIGHTS': {
+        'default': {'rating': 1.0, 'reviews': 0.5, 'sales': 1.0},
+    },
+}
+
+# Produtos "comprados juntos" (manage.py refresh_related_products; ver products/related.py)
+RELATED_PRODUCTS = {
+    'TOP_K': 10,
+    'METRIC': 'jaccard',
+    'MIN_ORDERS': 2,
+    'MAX_BASKET': 50,
+    'SETTLE_HOURS': 48,
+}
+
+# Produtos similares por conteúdo (manage.py refresh_similar_products; ver products/similar.py)
+SIMILAR_PRODUCTS = {
+    'TOP_K': 10,
+    'MIN_SCORE': 0.05,
+}
+
+# Limites inferiores das faixas de preço em /api/products/facets/ (a última faixa é aberta)
+PRODUCT_FACET_PRICE_BUCKETS = [0, 25, 50, 100, 250, 500]
+
 # MercadoPago Settings
 MERCADOPAGO_ACCESS_TOKEN = os.environ.get('MERCADOPAGO_ACCESS_TOKEN', 'TEST-2468244974210228-040212-ba99ed463c5a8779bddb3c37d8eb5f2a-643647222')
 MERCADOPAGO_PUBLIC_KEY = os.environ.get('MERCADOPAGO_PUBLIC_KEY', 'TEST-c65e2dc8-d032-4cd8-8f1e-04c45c2f42cf')
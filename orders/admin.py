@@ -2,7 +2,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Order, OrderItem, Cart, CartItem
+from django.db.models import Count
+from .models import CART_ITEMS_TOTAL, Order, OrderItem, Cart, CartItem
 from .notifications import send_order_status_notification
 
 class OrderItemInline(admin.TabularInline):
@@ -127,16 +128,19 @@ class CartItemInline(admin.TabularInline):
 class CartAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'total', 'items_count', 'created_at', 'updated_at']
     search_fields = ['user__username', 'user__email']
-    readonly_fields = ['total', 'created_at', 'updated_at']
+    readonly_fields = ['total', 'version', 'created_at', 'updated_at']
     inlines = [CartItemInline]
     
     def items_count(self, obj):
-        return obj.items.count()
+        return obj.items_count
     items_count.short_description = 'Itens'
     
     def get_queryset(self, request):
+        # Total e quantidade de itens calculados na mesma consulta da listagem
         qs = super().get_queryset(request)
-        return qs.select_related('user').prefetch_related('items')
+        return qs.select_related('user').annotate(
+            items_total=CART_ITEMS_TOTAL, items_count=Count('items'),
+        )
 
 
 # Registrar os modelos no admin
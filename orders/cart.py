@@ -0,0 +1,210 @@
+# orders/cart.py
+from django.core.cache import cache
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Window
+from django.utils import timezone
+from products.models import ProductImage
+from .models import CART_ITEMS_TOTAL, CART_LINE_SUBTOTAL, Cart, CartItem, to_cents
+
+# Colunas do produto usadas no resumo do carrinho
+CART_PRODUCT_FIELDS = ('id', 'name', 'slug', 'price', 'discount_price', 'stock', 'is_active')
+
+CART_CACHE_KEY = 'cart:user:{}'
+CART_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def user_cart(user):
+    """
+    Carrinho do usuário para as alterações, sem consulta quando o ID está em
+    cache. O objeto traz só id, usuário e created_at; versão e updated_at são
+    relidos pela resposta. A chave só é gravada depois do commit (um carrinho
+    criado numa transação revertida não fica em cache) e é apagada quando o
+    carrinho é excluído (orders.signals).
+    """
+    key = CART_CACHE_KEY.format(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        pk, created_at = cached
+        cart = Cart.from_db(router.db_for_read(Cart), ['id', 'user_id', 'created_at'], [pk, user.pk, created_at])
+        cart.user = user
+        return cart
+
+    cart, created = Cart.objects.get_or_create(user=user)
+    transaction.on_commit(lambda: remember_user_cart(cart))
+    return cart
+
+
+def with_user_cart(user, action):
+    """
+    Chama `action(cart)` com o carrinho do usuário (user_cart). O ID em cache
+    pode estar pendurado: carrinho excluído por SQL direto, ou uma exclusão
+    confirmada depois que outra requisição voltou a guardar o ID. Nesse caso
+    a ação falha com IntegrityError (FK de um item novo) ou Cart.DoesNotExist
+    (versão relida ou incrementada sem linha); a chave é apagada e a ação é
+    repetida uma vez com o carrinho do banco (get_or_create). A ação deve
+    abrir a própria transação, para a primeira tentativa ser revertida inteira.
+    """
+    try:
+        return action(user_cart(user))
+    except (IntegrityError, Cart.DoesNotExist):
+        forget_user_cart(user.pk)
+    return action(user_cart(user))
+
+
+def remember_user_cart(cart):
+    cache.set(CART_CACHE_KEY.format(cart.user_id), (cart.pk, cart.created_at), timeout=CART_CACHE_TIMEOUT)
+
+
+def forget_user_cart(user_id):
+    cache.delete(CART_CACHE_KEY.format(user_id))
+
+
+def cart_items(cart):
+    """
+    Itens do carrinho em uma única consulta: o produto (só as colunas do
+    resumo), a imagem principal, o subtotal de cada linha e o total do
+    carrinho (soma em janela sobre as mesmas linhas), todos calculados no banco.
+    """
+    main_image = ProductImage.objects.filter(product=OuterRef('product')).order_by('-is_main', 'id').values('image')[:1]
+    return list(
+        CartItem.objects.filter(cart=cart)
+        .select_related('product')
+        .only('id', 'cart_id', 'quantity', 'added_at', *(f'product__{field}' for field in CART_PRODUCT_FIELDS))
+        .annotate(
+            line_subtotal=CART_LINE_SUBTOTAL,
+            cart_total=Window(Sum(CART_LINE_SUBTOTAL)),
+            main_image=Subquery(main_image),
+        )
+        .order_by('added_at', 'id')
+    )
+
+
+def load_cart(cart):
+    """
+    Anexa ao carrinho os itens e o total calculados, para serializar sem novas
+    consultas. Um carrinho vindo do cache (user_cart) tem versão e updated_at
+    relidos em uma consulta, que falha com Cart.DoesNotExist se ele não existir.
+    """
+    deferred = cart.get_deferred_fields()
+    if deferred:
+        cart.refresh_from_db(fields=deferred)
+    items = cart_items(cart)
+    for item in items:
+        item.product.main_image = item.main_image
+    cart.loaded_items = items
+    cart.items_total = to_cents(items[0].cart_total if items else None)
+    return cart
+
+
+def add_to_cart(cart, product_id, quantity):
+    """
+    Soma `quantity` ao item (carrinho, produto) em um único comando, sem
+    perder incrementos de requisições simultâneas (duplo toque, várias abas):
+    INSERT ... ON CONFLICT DO UPDATE sobre a restrição única (cart, product).
+    Nos bancos sem upsert, UPDATE com F() e, se não houver linha, INSERT, que
+    volta ao UPDATE quando outra requisição criou o item antes.
+    Retorna o item com a quantidade resultante.
+    """
+    connection = connections[router.db_for_write(CartItem)]
+    if connection.features.supports_update_conflicts_with_target and connection.features.can_return_columns_from_insert:
+        table = connection.ops.quote_name(CartItem._meta.db_table)
+        added_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (cart_id, product_id, quantity, added_at) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = {table}.quantity + excluded.quantity "
+                f"RETURNING id, quantity",
+                [cart.pk, product_id, quantity, added_at],
+            )
+            pk, total = cursor.fetchone()
+        return CartItem(pk=pk, cart=cart, product_id=product_id, quantity=total)
+
+    items = CartItem.objects.filter(cart=cart, product_id=product_id)
+    if not items.update(quantity=F('quantity') + quantity):
+        try:
+            with transaction.atomic():
+                return CartItem.objects.create(cart=cart, product_id=product_id, quantity=quantity)
+        except IntegrityError:
+            items.update(quantity=F('quantity') + quantity)
+    return items.get()
+
+
+def apply_cart_batch(cart, quantities):
+    """
+    Aplica um lote {product_id: quantidade final} ao carrinho: uma leitura dos
+    itens afetados, um DELETE para as quantidades zeradas, um bulk_update e um
+    bulk_create. Os produtos já devem ter sido validados e a chamada deve estar
+    dentro da transação do chamador (tudo ou nada). Retorna se algo mudou.
+
+    Um item criado por outra requisição depois da leitura (duplo toque, várias
+    abas) não quebra o lote: o bulk_create é um upsert sobre (cart, product)
+    que grava a quantidade final, e nos bancos sem upsert cada item novo cai
+    no UPDATE quando o INSERT viola a restrição única.
+    """
+    items = CartItem.objects.filter(cart=cart, product_id__in=list(quantities))
+    existing = {item.product_id: item for item in items.only('id', 'cart_id', 'product_id', 'quantity')}
+    removed, changed, added = [], [], []
+    for product_id, quantity in quantities.items():
+        item = existing.get(product_id)
+        if item is None:
+            if quantity > 0:
+                added.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+        elif quantity == 0:
+            removed.append(item.pk)
+        elif item.quantity != quantity:
+            item.quantity = quantity
+            changed.append(item)
+
+    if removed:
+        CartItem.objects.filter(pk__in=removed).delete()
+    if changed:
+        CartItem.objects.bulk_update(changed, ['quantity'])
+    if added:
+        connection = connections[router.db_for_write(CartItem)]
+        if connection.features.supports_update_conflicts_with_target:
+            CartItem.objects.bulk_create(
+                added, update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'],
+            )
+        else:
+            for item in added:
+                try:
+                    with transaction.atomic():
+                        item.save(force_insert=True)
+                except IntegrityError:
+                    CartItem.objects.filter(cart=cart, product_id=item.product_id).update(quantity=item.quantity)
+    return bool(removed or changed or added)
+
+
+def bump_cart_version(cart):
+    """
+    Incrementa a versão do carrinho no banco (atômico mesmo com requisições
+    simultâneas). Sem a linha, Cart.DoesNotExist (ver with_user_cart).
+    """
+    if not Cart.objects.filter(pk=cart.pk).update(version=F('version') + 1, updated_at=timezone.now()):
+        raise Cart.DoesNotExist(f"Carrinho {cart.pk} não existe.")
+
+
+def cart_delta(cart, item=None, removed_item_id=None):
+    """
+    Resposta compacta de uma alteração: só a linha alterada (ou o ID da
+    removida), a versão e os totais novos, lidos em uma única consulta.
+    Valores em texto, como nos DecimalField do CartSerializer.
+    """
+    summary = Cart.objects.filter(pk=cart.pk).annotate(
+        items_total=CART_ITEMS_TOTAL, items_count=Count('items')
+    ).values('version', 'items_total', 'items_count').get()
+    line = None
+    if item is not None:
+        line = {
+            'id': item.pk,
+            'product_id': item.product_id,
+            'quantity': item.quantity,
+            'subtotal': str(to_cents(item.product.price * item.quantity)),
+        }
+    return {
+        'version': summary['version'],
+        'item': line,
+        'removed_item_id': removed_item_id,
+        'total': str(to_cents(summary['items_total'])),
+        'items_count': summary['items_count'],
+    }
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def merge_duplicate_carts(apps, schema_editor):
+    """Junta os carrinhos repetidos de um usuário no mais antigo, somando as quantidades"""
+    Cart = apps.get_model('orders', 'Cart')
+    CartItem = apps.get_model('orders', 'CartItem')
+
+    duplicated = Cart.objects.values('user_id').annotate(total=Count('id')).filter(total__gt=1).order_by()
+    for row in duplicated:
+        keep, *others = Cart.objects.filter(user_id=row['user_id']).order_by('id').values_list('id', flat=True)
+        kept_products = set(CartItem.objects.filter(cart_id=keep).values_list('product_id', flat=True))
+        for item in CartItem.objects.filter(cart_id__in=others).order_by('id'):
+            if item.product_id in kept_products:
+                CartItem.objects.filter(cart_id=keep, product_id=item.product_id).update(
+                    quantity=F('quantity') + item.quantity
+                )
+                item.delete()
+            else:
+                item.cart_id = keep
+                item.save(update_fields=['cart'])
+                kept_products.add(item.product_id)
+        Cart.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_cart_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user',), name='cart_user_unique'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
 from django.contrib.auth import get_user_model
 from products.models import Product
 from decimal import Decimal
@@ -8,6 +9,27 @@ from decimal import Decimal
 
 User = get_user_model()
 
+# Subtotal de um item do carrinho calculado no banco (preço atual do produto x quantidade)
+CART_LINE_SUBTOTAL = ExpressionWrapper(
+    F('product__price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+# Total do carrinho a partir da tabela Cart (anotações em consultas de carrinhos)
+CART_ITEMS_TOTAL = Sum(
+    F('items__product__price') * F('items__quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+
+def to_cents(value):
+    """Arredonda para centavos valores calculados no banco (o SQLite devolve somas com várias casas)"""
+    return Decimal(value or 0).quantize(Decimal('0.01'))
+
+
+def discounted_total(subtotal, discount):
+    """Subtotal menos o desconto, limitado ao subtotal (Order.total e o total_amount gravado)"""
+    return subtotal - Decimal(min(discount or 0, subtotal))
+
+
 class Order(models.Model):
     ORDER_STATUS_CHOICES = [
         ('CREATED', 'Criado'),
@@ -84,6 +106,21 @@ class Order(models.Model):
     cancellation_reason = models.TextField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        # Índices compostos para a paginação por cursor dos pedidos
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            # Filtros por status (listagem, exportação, vendas pagas do ranking de destaques)
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            models.Index(fields=['payment_status', '-created_at', '-id'], name='order_payment_created_idx'),
+            # Retorno do Mercado Pago busca o pedido pela preferência; a maioria dos pedidos não tem uma
+            models.Index(
+                fields=['preference_id'], name='order_preference_idx',
+                condition=models.Q(preference_id__isnull=False),
+            ),
+        ]
+
     def __str__(self):
         return f"Pedido #{self.id} - {self.user.username}"
 
@@ -95,9 +132,7 @@ class Order(models.Model):
         else:
             subtotal = sum(item.price * item.quantity for item in self.items.all())
         
-        # Conversão do float para Decimal
-        discount = Decimal(min(self.discount_amount or 0, subtotal))
-        return subtotal - discount
+        return discounted_total(subtotal, self.discount_amount)
 
 
 class OrderItem(models.Model):
@@ -117,16 +152,30 @@ class OrderItem(models.Model):
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart')
+    # Incrementada a cada alteração; o cliente compara com a sua para saber se perdeu alguma
+    version = models.PositiveIntegerField(_("Versão"), default=0)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # Um carrinho por usuário: o get_or_create concorrente cai no registro já criado
+            models.UniqueConstraint(fields=['user'], name='cart_user_unique'),
+        ]
+
     def __str__(self):
         return f"Carrinho de {self.user.username}"
 
     @property
     def total(self):
-        """Calcula o total do carrinho"""
-        return sum(item.subtotal for item in self.items.all())
+        """
+        Total do carrinho. Usa o valor já calculado por orders.cart.load_cart
+        ou por uma anotação items_total; sem ele, faz um único aggregate no banco.
+        """
+        if hasattr(self, 'items_total'):
+            return to_cents(self.items_total)
+        total = self.items.aggregate(total=Sum(CART_LINE_SUBTOTAL))['total']
+        return to_cents(total)
 
 
 class CartItem(models.Model):
@@ -0,0 +1,59 @@
+# orders/placement.py
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from products.models import Product
+from .models import OrderItem, discounted_total
+
+
+def create_order(serializer, user, lines):
+    """
+    Cria o pedido e os itens em uma transação com número fixo de consultas:
+    a leitura dos produtos com SELECT ... FOR UPDATE, o INSERT do pedido, já
+    com o total calculado no servidor (menos o desconto, como Order.total), e
+    um bulk_create dos itens. `lines` vem de OrderLinesSerializer.
+
+    Produtos ausentes, inativos ou sem estoque para a soma das linhas são
+    recusados (ValidationError) com as linhas bloqueadas: uma alteração de
+    estoque ou preço confirmada durante o pedido não passa despercebida.
+
+    Os itens criados ficam no cache de prefetch do pedido, para a resposta
+    (e Order.total) não consultarem a tabela de novo.
+    """
+    requested = {}
+    for line in lines:
+        requested[line['product']] = requested.get(line['product'], 0) + line['quantity']
+
+    with transaction.atomic():
+        # Bloqueio em ordem de ID, para pedidos simultâneos não travarem um ao outro
+        products = Product.objects.select_for_update().only(
+            'id', 'name', 'price', 'stock', 'is_active'
+        ).order_by('pk').in_bulk(list(requested))
+
+        errors = []
+        missing = [pk for pk in requested if pk not in products]
+        if missing:
+            errors.append(f"Produtos não encontrados: {', '.join(map(str, missing))}.")
+        for pk, quantity in requested.items():
+            product = products.get(pk)
+            if product is None:
+                continue
+            if not product.is_active:
+                errors.append(f"Produto indisponível: {product.name}.")
+            elif product.stock < quantity:
+                errors.append(f"Estoque insuficiente para {product.name}: {product.stock} disponível(is).")
+        if errors:
+            raise ValidationError({'items': errors})
+
+        items = [
+            OrderItem(product=products[line['product']], product_name=products[line['product']].name,
+                      price=products[line['product']].price, quantity=line['quantity'])
+            for line in lines
+        ]
+        subtotal = sum(item.subtotal for item in items)
+        discount = serializer.validated_data.get('discount_amount')
+        order = serializer.save(user=user, total_amount=discounted_total(subtotal, discount))
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+    order._prefetched_objects_cache = {'items': items}
+    return order
@@ -0,0 +1,17 @@
+# orders/query_plans.py
+#
+# Consultas quentes de pedidos e pagamentos, verificadas pelo teste de planos (products/tests.py).
+from backend.query_plans import QueryPlan, api_get, call
+from products.featured import recent_sales
+
+QUERY_PLANS = [
+    QueryPlan('pedidos: histórico do usuário', api_get('/api/orders/history/', user='user', pages=2)),
+    QueryPlan('pedidos: listagem do usuário', api_get('/api/orders/', user='user', pages=2)),
+    QueryPlan('pedidos: listagem por status', api_get(
+        '/api/orders/', {'status': 'PAID'}, user='admin', pages=2,
+    )),
+    QueryPlan('pedidos: de um usuário (admin)', api_get('/api/orders/user/{user_id}/', user='admin', pages=2)),
+    QueryPlan('pedidos: retorno do Mercado Pago', api_get('/api/orders/by-preference/{preference_id}/', user='user')),
+    QueryPlan('pedidos: detalhe', api_get('/api/orders/{order_id}/', user='user')),
+    QueryPlan('itens: vendas pagas recentes', call(recent_sales, 30)),
+]
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import Cart, CartItem, Order, OrderItem
-from products.serializers import ProductSerializer
-from products.models import Product
+from backend.serializers import SparseFieldsetsMixin
+from products.models import Product, ProductImage
 import datetime
 import re
 
@@ -23,7 +23,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['subtotal']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     delivery_type_display = serializers.CharField(source='get_delivery_type_display', read_only=True)
@@ -69,25 +69,84 @@ class OrderSerializer(serializers.ModelSerializer):
         return data
 
 
+class OrderLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    # Limite por linha: o estoque é conferido depois, e o total precisa caber em total_amount
+    quantity = serializers.IntegerField(min_value=1, max_value=1000, default=1)
+
+
+class OrderLinesSerializer(serializers.Serializer):
+    """
+    Itens de um novo pedido. Os produtos são conferidos por create_order
+    (existem, estão ativos, têm estoque para a soma das linhas), com as linhas
+    bloqueadas na transação do pedido; o preço vem sempre do produto, nunca
+    do cliente.
+    """
+    items = OrderLineSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class CartProductSerializer(serializers.ModelSerializer):
+    """Resumo do produto exibido no carrinho (sem imagens, categoria ou avaliações)"""
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'slug', 'price', 'discount_price', 'stock', 'is_active', 'image']
+
+    def get_image(self, obj):
+        """URL da imagem principal, anotada por orders.cart.cart_items"""
+        name = getattr(obj, 'main_image', None)
+        if not name:
+            return None
+        url = ProductImage._meta.get_field('image').storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
 class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = CartProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(),
         source='product',
         write_only=True
     )
-    subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    # Calculado no banco por orders.cart.cart_items
+    subtotal = serializers.DecimalField(source='line_subtotal', max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = CartItem
         fields = ['id', 'product', 'product_id', 'quantity', 'subtotal']
 
 
-class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(many=True, read_only=True)
+class CartSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """Carrinho carregado por orders.cart.load_cart (itens e total já calculados)"""
+    items = CartItemSerializer(source='loaded_items', many=True, read_only=True)
     total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Cart
-        fields = ['id', 'user', 'items', 'total', 'created_at', 'updated_at']
-        read_only_fields = ['user', 'created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'user', 'version', 'items', 'total', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'version', 'created_at', 'updated_at']
+
+
+class CartBatchOperationSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(min_value=1)
+    # Quantidade final do produto no carrinho; 0 remove o item
+    quantity = serializers.IntegerField(min_value=0)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """Lote de alterações do carrinho (PATCH /cart/), validado com uma única consulta de produtos"""
+    items = CartBatchOperationSerializer(many=True, allow_empty=False, max_length=200)
+
+    def validate_items(self, value):
+        product_ids = [operation['product_id'] for operation in value]
+        if len(set(product_ids)) != len(product_ids):
+            raise serializers.ValidationError("Cada produto só pode aparecer uma vez no lote.")
+        # Só produtos ativos entram no carrinho; remover (quantidade 0) vale para qualquer um
+        added = [operation['product_id'] for operation in value if operation['quantity'] > 0]
+        found = set(Product.objects.filter(id__in=added, is_active=True).values_list('id', flat=True))
+        missing = [pk for pk in added if pk not in found]
+        if missing:
+            raise serializers.ValidationError(f"Produtos não encontrados: {', '.join(map(str, missing))}.")
+        return value
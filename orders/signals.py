@@ -0,0 +1,17 @@
+# orders/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .cart import forget_user_cart
+from .models import Cart
+
+
+@receiver(post_delete, sender=Cart)
+def forget_deleted_cart(sender, instance, **kwargs):
+    """
+    O ID em cache apontaria para um carrinho que não existe mais. Apagado de
+    novo depois do commit: até lá, outra requisição ainda encontra o carrinho
+    e pode voltar a guardá-lo.
+    """
+    forget_user_cart(instance.user_id)
+    transaction.on_commit(lambda: forget_user_cart(instance.user_id))
@@ -1,3 +1,383 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import math
+import threading
+from unittest import mock
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from payments.models import Coupon
+from payments.services import MercadoPagoService
+from products.models import Product
+from products.testing import create_products
+from users.models import User
+from .cart import apply_cart_batch, remember_user_cart
+from .models import Cart, CartItem, Order, OrderItem
 
-# Create your tests here.
+
+class OrderConditionalGetTests(TestCase):
+    """Os validadores das listagens de pedidos vêm só da página pedida"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='cliente', email='cliente@example.com')
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', is_staff=True)
+        cls.orders = [Order.objects.create(user=cls.user, total_amount=10) for _ in range(25)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path, **headers):
+        return self.client.get(path, HTTP_ACCEPT='application/json', **headers)
+
+    def test_history_answers_304_until_the_page_changes(self):
+        first = self.get('/api/orders/history/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(1):
+            response = self.get('/api/orders/history/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.get('/api/orders/history/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        newest = Order.objects.get(pk=first.json()['results'][0]['id'])
+        newest.delete()
+        response = self.get('/api/orders/history/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_staff_listing_does_not_read_the_whole_table(self):
+        self.client.force_authenticate(self.admin)
+        first = self.get('/api/orders/')
+        # Um pedido fora da página (o mais antigo) não muda os validadores da primeira
+        oldest = self.orders[0]
+        oldest.status = 'PAID'
+        oldest.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/api/orders/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 21', queries[0]['sql'])
+
+        newest = self.orders[-1]
+        newest.status = 'PAID'
+        newest.save()
+        self.assertEqual(self.get('/api/orders/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+        page = self.get('/api/orders/?page=2')
+        self.assertEqual(self.get('/api/orders/?page=2', HTTP_IF_NONE_MATCH=page['ETag']).status_code, 304)
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = create_products(1, images=True)[0]
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', is_staff=True)
+        days = [datetime.datetime(2024, 1, day, 23, tzinfo=datetime.timezone.utc) for day in (9, 10, 11)]
+        cls.orders = [
+            Order.objects.create(user=cls.admin, status=status, total_amount=10, created_at=day)
+            for status, day in zip(['PAID', 'CANCELLED', 'PAID'], days)
+        ]
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, product_name=product.name, price=10) for order in cls.orders
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def rows(self, path, params):
+        response = self.client.get(path, {'format': 'csv', **params})
+        self.assertEqual(response.status_code, 200)
+        return list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_filters_accept_several_values(self):
+        rows = self.rows('/api/orders/export/', {'status': 'PAID,CANCELLED', 'date_from': '2024-01-10'})
+        self.assertEqual([int(row['id']) for row in rows], [order.pk for order in self.orders[1:]])
+
+    def test_items_are_filtered_by_the_order(self):
+        rows = self.rows('/api/orders/export/items/', {'status': 'PAID', 'date_to': '2024-01-10'})
+        self.assertEqual([int(row['order_id']) for row in rows], [self.orders[0].pk])
+
+
+class CartQueryTests(TestCase):
+    """
+    Os endpoints do carrinho fazem o mesmo número de consultas com 1 ou 20
+    itens, com o usuário autenticado e o carrinho já em cache. Dentro do
+    TestCase, cada transaction.atomic() da view conta também SAVEPOINT e RELEASE.
+    """
+    sizes = (1, 20)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(max(cls.sizes) + 1, images=True)
+        cls.user = User.objects.create(username='cliente', email='cliente@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill(self, size):
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        cart.items.all().delete()
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2) for product in self.products[:size]])
+        remember_user_cart(cart)
+        return cart.items.order_by('id').first()
+
+    def assertQueries(self, expected, method, path, data=None):
+        for size in self.sizes:
+            with self.subTest(size=size):
+                item = self.fill(size)
+                url = '/api/orders' + path.format(item=item.pk)
+                payload = data(size) if callable(data) else data or {}
+                with self.assertNumQueries(expected):
+                    response = getattr(self.client, method)(url, payload, format='json')
+                self.assertEqual(response.status_code, 200, response.content[:200])
+
+    def add_new_product(self, size):
+        return {'product_id': self.products[size].pk, 'quantity': 1}
+
+    def test_get(self):
+        self.assertQueries(2, 'get', '/cart/')
+
+    def test_add(self):
+        self.assertQueries(7, 'post', '/cart/items/', self.add_new_product)
+        self.assertQueries(6, 'post', '/cart/items/?delta=true', self.add_new_product)
+
+    def test_update(self):
+        self.assertQueries(7, 'put', '/cart/items/{item}/update/', {'quantity': 3})
+        self.assertQueries(6, 'put', '/cart/items/{item}/update/?delta=true', {'quantity': 3})
+
+    def test_delete(self):
+        self.assertQueries(7, 'delete', '/cart/items/{item}/')
+        self.assertQueries(6, 'delete', '/cart/items/{item}/?delta=true')
+
+    def test_clear(self):
+        self.assertQueries(6, 'delete', '/cart/clear/')
+        self.assertQueries(5, 'delete', '/cart/clear/?delta=true')
+
+    def test_batch(self):
+        def batch(size):
+            # Altera um item existente e adiciona um produto novo
+            return {'items': [
+                {'product_id': self.products[0].pk, 'quantity': 3},
+                {'product_id': self.products[size].pk, 'quantity': 1},
+            ]}
+
+        self.assertQueries(9, 'patch', '/cart/', batch)
+
+
+class CartVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_products(1, images=True)[0]
+        cls.user = User.objects.create(username='cliente', email='cliente@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_mutation_and_version_share_the_transaction(self):
+        """Se o incremento da versão falhar, a alteração também é revertida"""
+        data = {'product_id': self.product.pk, 'quantity': 1}
+        with mock.patch('orders.views.bump_cart_version', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/api/orders/cart/items/', data, format='json')
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+
+        response = self.client.post('/api/orders/cart/items/?delta=true', data, format='json')
+        self.assertEqual(response.json()['version'], 1)
+
+
+class CartBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product, cls.inactive = create_products(2, images=True)
+        Product.objects.filter(pk=cls.inactive.pk).update(is_active=False)
+        cls.user = User.objects.create(username='cliente', email='cliente@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_item_created_concurrently_gets_the_final_quantity(self):
+        """Outra requisição cria o item entre a leitura e o bulk_create do lote"""
+        cart = Cart.objects.create(user=self.user)
+        bulk_create = CartItem.objects.bulk_create
+
+        def racing_bulk_create(items, **kwargs):
+            CartItem.objects.create(cart=cart, product=self.product, quantity=5)
+            return bulk_create(items, **kwargs)
+
+        with mock.patch.object(CartItem.objects, 'bulk_create', side_effect=racing_bulk_create):
+            self.assertTrue(apply_cart_batch(cart, {self.product.pk: 2}))
+        self.assertEqual(list(cart.items.values_list('quantity', flat=True)), [2])
+
+    def test_unchanged_batch_keeps_the_delta_shape(self):
+        data = {'items': [{'product_id': self.product.pk, 'quantity': 2}]}
+        first = self.client.patch('/api/orders/cart/?delta=true', data, format='json').json()
+        second = self.client.patch('/api/orders/cart/?delta=true', data, format='json').json()
+        self.assertEqual(set(second), set(first))
+        self.assertEqual(second['version'], first['version'])
+        self.assertEqual((second['total'], second['items_count']), (first['total'], 1))
+
+    def test_inactive_products_cannot_be_added_one_by_one(self):
+        response = self.client.post('/api/orders/cart/items/', {'product_id': self.inactive.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_inactive_products_can_only_be_removed(self):
+        response = self.client.patch('/api/orders/cart/', {'items': [
+            {'product_id': self.inactive.pk, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.inactive, quantity=1)
+        response = self.client.patch('/api/orders/cart/', {'items': [
+            {'product_id': self.inactive.pk, 'quantity': 0},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(cart.items.exists())
+
+
+class CartCacheTests(TestCase):
+    """O ID do carrinho em cache pode apontar para um carrinho excluído"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_products(1, images=True)[0]
+        cls.user = User.objects.create(username='cliente', email='cliente@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Outra requisição guardou o ID antes do commit da exclusão
+        stale = Cart.objects.create(user=self.user)
+        stale.delete()
+        remember_user_cart(stale)
+        self.stale_id = stale.pk
+
+    def test_get(self):
+        response = self.client.get('/api/orders/cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], Cart.objects.get(user=self.user).pk)
+
+    def test_add(self):
+        response = self.client.post('/api/orders/cart/items/', {'product_id': self.product.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(CartItem.objects.values_list('cart__user', 'quantity')), [(self.user.pk, 2)])
+        self.assertFalse(CartItem.objects.filter(cart_id=self.stale_id).exists())
+
+    def test_update_item_of_the_current_cart(self):
+        item = CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=self.product, quantity=1)
+        response = self.client.put(f'/api/orders/cart/items/{item.pk}/update/', {'quantity': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 4)
+
+
+class CartConcurrencyTests(TransactionTestCase):
+    """Adições simultâneas ao mesmo carrinho, cada thread com sua conexão"""
+    threads = 8
+    adds = 10
+
+    def setUp(self):
+        cache.clear()
+        self.product = create_products(1, images=True)[0]
+        self.user = User.objects.create(username='cliente', email='cliente@example.com')
+
+    def test_concurrent_adds_keep_every_increment(self):
+        errors = []
+        # Todas as threads começam juntas, inclusive a criação do carrinho
+        barrier = threading.Barrier(self.threads)
+
+        def worker():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                for _ in range(self.adds):
+                    response = client.post(
+                        '/api/orders/cart/items/?delta=true', {'product_id': self.product.pk, 'quantity': 1}, format='json',
+                    )
+                    if response.status_code != 200:
+                        errors.append(f"{response.status_code}: {response.content[:200]!r}")
+            except Exception as exc:
+                errors.append(repr(exc))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(list(cart.items.values_list('quantity', flat=True)), [self.threads * self.adds])
+        self.assertEqual(cart.version, self.threads * self.adds)
+
+
+class OrderPlacementTests(TestCase):
+    """
+    Criação de pedidos: mesmo número de consultas para 1 ou 500 linhas (além
+    dos lotes do INSERT dos itens, que dependem do limite de parâmetros do
+    banco) e estoque conferido com os produtos bloqueados.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(500, images=True)
+        cls.user = User.objects.create(username='cliente', email='cliente@example.com')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place(self, items):
+        return self.client.post('/api/orders/', {'phone': '11987654321', 'items': items}, format='json')
+
+    def test_queries_do_not_depend_on_the_number_of_lines(self):
+        fields = [field for field in OrderItem._meta.concrete_fields if not field.primary_key]
+        for size in (1, 500):
+            with self.subTest(size=size):
+                items = [{'product': product.pk, 'quantity': 2} for product in self.products[:size]]
+                batches = math.ceil(size / connection.ops.bulk_batch_size(fields, items))
+                with self.assertNumQueries(4 + batches):
+                    response = self.place(items)
+                self.assertEqual(response.status_code, 201, response.content[:200])
+                self.assertEqual(len(response.json()['items']), size)
+
+    def test_stock_is_checked_for_the_sum_of_the_lines(self):
+        product = self.products[0]
+        response = self.place([{'product': product.pk, 'quantity': 60}, {'product': product.pk, 'quantity': 41}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Estoque insuficiente', response.json()['items'][0])
+        self.assertFalse(Order.objects.exists())
+
+    def test_quantity_has_an_upper_bound(self):
+        response = self.place([{'product': self.products[0].pk, 'quantity': 1001}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_total_amount_subtracts_the_coupon_discount(self):
+        response = self.place([{'product': self.products[0].pk, 'quantity': 3}])
+        order = Order.objects.get(pk=response.json()['id'])
+        self.assertEqual(order.total_amount, 30)
+
+        Coupon.objects.create(code='DESCONTO5', discount_type='fixed', discount_value=5)
+        service = MercadoPagoService()
+        with mock.patch.object(service, 'mp') as sdk:
+            sdk.preference.return_value.create.return_value = {'response': {'id': 'pref-1'}}
+            service.create_preference(order.pk, 'DESCONTO5')
+        order = Order.objects.prefetch_related('items').get(pk=order.pk)
+        self.assertEqual((order.discount_amount, order.total_amount), (5, 25))
+        self.assertEqual(order.total_amount, order.total)
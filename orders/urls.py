@@ -11,7 +11,9 @@ from .views import (
     CartItemDeleteView,
     CartClearView,
     OrderHistoryView,  # Nova importação
-    OrderCancelView    # Nova importação
+    OrderCancelView,    # Nova importação
+    OrderExportView,
+    OrderItemExportView,
 )
 
 urlpatterns = [
@@ -22,6 +24,8 @@ urlpatterns = [
     path('by-preference/<str:preference_id>/', OrderByPreferenceView.as_view(), name='order-by-preference'),
     path('history/', OrderHistoryView.as_view(), name='order-history'),  # Nova rota
      path('<int:order_id>/cancel/', OrderCancelView.as_view(), name='order-cancel'),  # Nova rota
+    path('export/', OrderExportView.as_view(), name='order-export'),
+    path('export/items/', OrderItemExportView.as_view(), name='order-item-export'),
 
     # Rotas do carrinho
     path('cart/', CartView.as_view(), name='cart-detail'),
@@ -4,10 +4,15 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Order, OrderItem, Cart, CartItem
-from .serializers import OrderSerializer, OrderItemSerializer, CartSerializer, CartItemSerializer
+from .models import Order, OrderItem, CartItem
+from .serializers import OrderSerializer, OrderItemSerializer, CartSerializer, CartItemSerializer, CartBatchSerializer, OrderLinesSerializer
+from .placement import create_order
+from .cart import add_to_cart, apply_cart_batch, bump_cart_version, cart_delta, load_cart, with_user_cart
 from products.models import Product
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from backend.exports import StreamingExportView
+from backend.mixins import ConditionalGetMixin
 
 class OrderCancelView(APIView):
     """
@@ -53,7 +58,7 @@ class OrderCancelView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class OrderHistoryView(generics.ListAPIView):
+class OrderHistoryView(ConditionalGetMixin, generics.ListAPIView):
     """
     Retorna o histórico de pedidos do usuário autenticado
     """
@@ -65,89 +70,137 @@ class OrderHistoryView(generics.ListAPIView):
         return Order.objects.filter(user=self.request.user).order_by('-created_at').prefetch_related('items')
 
 
+def cart_response(cart, request):
+    """Carrinho serializado com itens, subtotais e total de uma única consulta (orders.cart)"""
+    return Response(CartSerializer(load_cart(cart), context={'request': request}).data)
+
+def wants_delta(request):
+    return request.query_params.get('delta', '').lower() in ('1', 'true')
+
+def cart_mutation_response(request, cart, item=None, removed_item_id=None):
+    """
+    Resposta das alterações do carrinho. Com ?delta=true, só a linha alterada,
+    os totais e a versão (o cliente pede o carrinho completo se a versão pular);
+    sem ele, o carrinho completo, como antes. Chamada dentro da transação da
+    alteração: o incremento da versão é confirmado (ou revertido) junto com ela.
+    """
+    bump_cart_version(cart)
+    if wants_delta(request):
+        return Response(cart_delta(cart, item, removed_item_id))
+    cart.refresh_from_db(fields=['version', 'updated_at'])
+    return cart_response(cart, request)
+
 class CartView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         """Obter ou criar carrinho do usuário"""
-        cart, created = Cart.objects.prefetch_related('items__product').get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return with_user_cart(request.user, lambda cart: cart_response(cart, request))
+
+    def patch(self, request):
+        """
+        Aplicar um lote de alterações ao carrinho (sincronização do app):
+        {"items": [{"product_id": 1, "quantity": 3}, ...]}, com a quantidade
+        final de cada produto (0 remove). Tudo ou nada, em uma transação.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantities = {operation['product_id']: operation['quantity'] for operation in serializer.validated_data['items']}
+
+        def apply(cart):
+            with transaction.atomic():
+                if not apply_cart_batch(cart, quantities):
+                    # Nada mudou: a versão atual, no mesmo formato pedido
+                    return Response(cart_delta(cart)) if wants_delta(request) else cart_response(cart, request)
+                return cart_mutation_response(request, cart)
+
+        return with_user_cart(request.user, apply)
 
 class CartItemCreateView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
-        """Adicionar item ao carrinho"""
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        
+        """
+        Adicionar item ao carrinho (?delta=true para a resposta compacta).
+        A quantidade é somada no banco em um único upsert (orders.cart.add_to_cart).
+        """
         product_id = request.data.get('product_id')
-        quantity = int(request.data.get('quantity', 1))
-        
         if not product_id:
             return Response({'error': 'product_id é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
         
-        product = get_object_or_404(Product, id=product_id)
-        
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart, 
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        try:
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity <= 0:
+            return Response({'error': 'quantity deve ser um inteiro positivo'}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        # Produtos inativos não entram no carrinho, como no lote (CartBatchSerializer)
+        product = get_object_or_404(Product.objects.only('id', 'price'), id=product_id, is_active=True)
+        def add(cart):
+            with transaction.atomic():
+                cart_item = add_to_cart(cart, product.pk, quantity)
+                cart_item.product = product
+                return cart_mutation_response(request, cart, item=cart_item)
+
+        return with_user_cart(request.user, add)
 
 class CartItemUpdateView(APIView):
     permission_classes = [IsAuthenticated]
     
     def put(self, request, item_id):
-        """Atualizar quantidade de um item no carrinho"""
-        cart = get_object_or_404(Cart, user=request.user)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-        
+        """Atualizar quantidade de um item no carrinho (?delta=true para a resposta compacta)"""
         quantity = request.data.get('quantity')
         if quantity is None:
             return Response({'error': 'quantity é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
         
-        quantity = int(quantity)
-        if quantity <= 0:
-            cart_item.delete()
-        else:
-            cart_item.quantity = quantity
-            cart_item.save()
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            return Response({'error': 'quantity deve ser um inteiro'}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        def update(cart):
+            with transaction.atomic():
+                # O dono do item vem do banco, não do ID do carrinho em cache
+                cart_item = get_object_or_404(
+                    CartItem.objects.select_related('product'), id=item_id, cart__user=request.user,
+                )
+                if quantity <= 0:
+                    cart_item.delete()
+                    return cart_mutation_response(request, cart, removed_item_id=item_id)
+                
+                cart_item.quantity = quantity
+                cart_item.save(update_fields=['quantity'])
+                return cart_mutation_response(request, cart, item=cart_item)
+
+        return with_user_cart(request.user, update)
 
 class CartItemDeleteView(APIView):
     permission_classes = [IsAuthenticated]
     
     def delete(self, request, item_id):
-        """Remover item do carrinho"""
-        cart = get_object_or_404(Cart, user=request.user)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-        cart_item.delete()
-        
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        """Remover item do carrinho (?delta=true para a resposta compacta)"""
+        def remove(cart):
+            with transaction.atomic():
+                cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+                cart_item.delete()
+                return cart_mutation_response(request, cart, removed_item_id=item_id)
+
+        return with_user_cart(request.user, remove)
 
 class CartClearView(APIView):
     permission_classes = [IsAuthenticated]
     
     def delete(self, request):
-        """Limpar carrinho"""
-        cart = get_object_or_404(Cart, user=request.user)
-        cart.items.all().delete()
-        
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        """Limpar carrinho (?delta=true para a resposta compacta)"""
+        def clear(cart):
+            with transaction.atomic():
+                cart.items.all().delete()
+                return cart_mutation_response(request, cart)
 
-class OrderListCreateView(generics.ListCreateAPIView):
+        return with_user_cart(request.user, clear)
+
+class OrderListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -162,22 +215,10 @@ class OrderListCreateView(generics.ListCreateAPIView):
         return Order.objects.filter(user=user).prefetch_related('items')
     
     def perform_create(self, serializer):
-        # Criar pedido a partir dos dados enviados
-        order = serializer.save(user=self.request.user)
-        
-        # Processar itens do pedido
-        items_data = self.request.data.get('items', [])
-        for item_data in items_data:
-            product_id = item_data.get('product')
-            product = get_object_or_404(Product, id=product_id)
-            
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                product_name=product.name,
-                price=item_data.get('price', product.price),
-                quantity=item_data.get('quantity', 1)
-            )
+        """Pedido e itens em uma transação, com o mesmo número de consultas para 1 ou 500 linhas"""
+        lines = OrderLinesSerializer(data={'items': self.request.data.get('items', [])})
+        lines.is_valid(raise_exception=True)
+        create_order(serializer, self.request.user, lines.validated_data['items'])
 
 class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = OrderSerializer
@@ -210,4 +251,38 @@ class OrderByPreferenceView(APIView):
             return Response(
                 {"detail": "Pedido não encontrado para esta preferência."},
                 status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+            )
+
+
+class OrderExportView(StreamingExportView):
+    """Exportação de pedidos (uma linha por pedido) para a contabilidade"""
+    columns = [
+        ('id', 'id'), ('created_at', 'created_at'), ('user_id', 'user_id'), ('email', 'email'),
+        ('full_name', 'full_name'), ('status', 'status'), ('payment_status', 'payment_status'),
+        ('payment_method', 'payment_method'), ('payment_id', 'payment_id'),
+        ('total_amount', 'total_amount'), ('discount_amount', 'discount_amount'),
+        ('coupon_code', 'coupon_code'), ('delivery_type', 'delivery_type'),
+        ('shipping_city', 'shipping_city'), ('shipping_state', 'shipping_state'),
+        ('shipping_postal_code', 'shipping_postal_code'), ('updated_at', 'updated_at'),
+    ]
+    filter_params = {'status': 'status', 'payment_status': 'payment_status'}
+    filename = 'pedidos'
+
+    def get_queryset(self):
+        return Order.objects.all()
+
+
+class OrderItemExportView(StreamingExportView):
+    """Exportação dos itens de pedidos, filtrada pela data e status do pedido"""
+    columns = [
+        ('id', 'id'), ('order_id', 'order_id'), ('order_created_at', 'order__created_at'),
+        ('order_status', 'order__status'), ('payment_status', 'order__payment_status'),
+        ('product_id', 'product_id'), ('sku', 'product__sku'), ('product_name', 'product_name'),
+        ('price', 'price'), ('quantity', 'quantity'),
+    ]
+    date_field = 'order__created_at'
+    filter_params = {'status': 'order__status', 'payment_status': 'order__payment_status'}
+    filename = 'itens-pedidos'
+
+    def get_queryset(self):
+        return OrderItem.objects.all()
@@ -140,13 +140,15 @@ class MercadoPagoService:
             preference = preference_response["response"]
             
             # Atualizar pedido com o ID da preferência e cupom (se aplicado)
-            update_fields = ['preference_id']
+            update_fields = ['preference_id', 'updated_at']
             order.preference_id = preference["id"]
             
             if coupon and discount_amount > 0:
                 order.coupon_code = coupon_code
                 order.discount_amount = discount_amount
-                update_fields.extend(['coupon_code', 'discount_amount'])
+                # total_amount segue Order.total (itens já em prefetch)
+                order.total_amount = order.total
+                update_fields.extend(['coupon_code', 'discount_amount', 'total_amount'])
             
             order.save(update_fields=update_fields)
             
@@ -232,7 +234,7 @@ class MercadoPagoService:
             order.payment_id = str(payment_id)
             order.payment_method = payment_data.get('payment_method_id', '')
             
-            order.save(update_fields=['payment_status', 'status', 'payment_id', 'payment_method'])
+            order.save(update_fields=['payment_status', 'status', 'payment_id', 'payment_method', 'updated_at'])
             
             # Criar ou atualizar o registro de pagamento
             payment_obj, created = Payment.objects.update_or_create(
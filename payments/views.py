@@ -32,7 +32,7 @@ class CouponApplyView(APIView):
     def post(self, request):
         # Obter o carrinho do usuário autenticado
         try:
-            cart = Cart.objects.prefetch_related('items__product').get(user=request.user)
+            cart = Cart.objects.get(user=request.user)
             cart_total = cart.total
         except Cart.DoesNotExist:
             return Response(
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Category, Product, ProductImage, ProductReview
+from django.db import transaction
+from .models import (
+    Category, FeaturedProduct, Product, ProductImage, ProductReview, RelatedProduct, RelatedProductsRun,
+    SimilarProduct,
+)
+from .cache import bump_catalog_version, invalidate_emergency_products
+from .ratings import apply_review_changes, get_rating_summary
 
 # Inline para imagens do produto
 class ProductImageInline(admin.TabularInline):
@@ -52,22 +58,22 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
-    def average_rating(self, obj):
-        """Calcula e exibe a média das avaliações"""
-        from django.db.models import Avg
-
-        avg = obj.reviews.filter(is_approved=True).aggregate(
-            avg_rating=Avg('rating')
-        )['avg_rating']
+    def get_queryset(self, request):
+        """Carrega o resumo de avaliações junto com o produto"""
+        return super().get_queryset(request).select_related('category', 'rating_summary')
 
-        if avg:
-            return f"{round(avg, 1)} / 5.0"
+    def average_rating(self, obj):
+        """Exibe a média das avaliações a partir do resumo do produto"""
+        summary = get_rating_summary(obj)
+        if summary and summary.average_rating is not None:
+            return f"{round(summary.average_rating, 1)} / 5.0"
         return "Sem avaliações"
     average_rating.short_description = "Avaliação Média"
 
     def reviews_count(self, obj):
         """Retorna o número de avaliações do produto"""
-        return obj.reviews.filter(is_approved=True).count()
+        summary = get_rating_summary(obj)
+        return summary.reviews_count if summary else 0
     reviews_count.short_description = "Número de Avaliações"
 
 # Admin para avaliações de produtos
@@ -85,12 +91,64 @@ class ProductReviewAdmin(admin.ModelAdmin):
 
     def approve_reviews(self, request, queryset):
         """Ação para aprovar avaliações em massa"""
-        updated = queryset.update(is_approved=True)
+        with transaction.atomic():
+            # queryset.update() não dispara sinais: atualizar o resumo manualmente
+            changed = list(queryset.filter(is_approved=False).values_list('product_id', 'rating'))
+            updated = queryset.update(is_approved=True)
+            apply_review_changes(changed, 1)
+        transaction.on_commit(bump_catalog_version)
+        invalidate_emergency_products(pk__in={product_id for product_id, _ in changed})
         self.message_user(request, f"{updated} avaliação(ões) aprovada(s) com sucesso.")
     approve_reviews.short_description = "Aprovar avaliações selecionadas"
 
     def reject_reviews(self, request, queryset):
         """Ação para rejeitar avaliações em massa"""
-        updated = queryset.update(is_approved=False)
+        with transaction.atomic():
+            # queryset.update() não dispara sinais: atualizar o resumo manualmente
+            changed = list(queryset.filter(is_approved=True).values_list('product_id', 'rating'))
+            updated = queryset.update(is_approved=False)
+            apply_review_changes(changed, -1)
+        transaction.on_commit(bump_catalog_version)
+        invalidate_emergency_products(pk__in={product_id for product_id, _ in changed})
         self.message_user(request, f"{updated} avaliação(ões) rejeitada(s) com sucesso.")
-    reject_reviews.short_description = "Rejeitar avaliações selecionadas"
\ No newline at end of file
+    reject_reviews.short_description = "Rejeitar avaliações selecionadas"
+
+# Admin para o ranking de destaques (somente leitura, gerado por refresh_featured_products)
+@admin.register(FeaturedProduct)
+class FeaturedProductAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'product', 'score', 'computed_at')
+    list_select_related = ('product',)
+    readonly_fields = ('rank', 'product', 'score', 'computed_at')
+
+    def has_add_permission(self, request):
+        return False
+
+# Admin para os produtos comprados juntos (somente leitura, gerados por refresh_related_products)
+@admin.register(RelatedProduct)
+class RelatedProductAdmin(admin.ModelAdmin):
+    list_display = ('product', 'rank', 'related', 'score', 'orders')
+    list_select_related = ('product', 'related')
+    search_fields = ('product__name', 'product__sku')
+    readonly_fields = ('product', 'rank', 'related', 'score', 'orders')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(RelatedProductsRun)
+class RelatedProductsRunAdmin(admin.ModelAdmin):
+    list_display = ('computed_at', 'full', 'processed_orders', 'skipped_orders', 'total_orders', 'orders_until')
+    readonly_fields = ('computed_at', 'full', 'processed_orders', 'skipped_orders', 'total_orders', 'orders_until')
+
+    def has_add_permission(self, request):
+        return False
+
+# Admin para os produtos similares (somente leitura, gerados por refresh_similar_products)
+@admin.register(SimilarProduct)
+class SimilarProductAdmin(admin.ModelAdmin):
+    list_display = ('product', 'rank', 'similar', 'score')
+    list_select_related = ('product', 'similar')
+    search_fields = ('product__name', 'product__sku')
+    readonly_fields = ('product', 'rank', 'similar', 'score')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,276 @@
+# products/autocomplete.py
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .cache import bump_version, get_version
+from .featured import get_featured_settings, recent_sales
+from .models import Category, Product, ProductRatingSummary
+from .search import _TOKEN_RE, fold_accents
+
+AUTOCOMPLETE_VERSION_KEY = 'catalog:autocomplete:version'
+AUTOCOMPLETE_CHANGES_KEY = 'catalog:autocomplete:changes:{}'
+
+DEFAULT_AUTOCOMPLETE = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 20,
+    # Segundos entre verificações da versão do índice no cache compartilhado
+    'CHECK_INTERVAL': 1,
+    # Acima de quantas alterações pendentes é mais barato reconstruir tudo
+    'MAX_INCREMENTAL': 500,
+    'CATEGORY_LIMIT': 5,
+    # Prefixos com mais entradas que isso têm a lista ordenada memorizada
+    'MEMO_THRESHOLD': 256,
+}
+
+_index = None
+_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_settings():
+    config = dict(DEFAULT_AUTOCOMPLETE)
+    config.update(getattr(settings, 'AUTOCOMPLETE', {}))
+    return config
+
+
+def normalize_terms(text):
+    """Termos sem acento e em minúsculas, na ordem em que aparecem"""
+    return _TOKEN_RE.findall(fold_accents(text))
+
+
+def product_terms(name, sku, category=None):
+    """Termos do nome, do SKU e da categoria do produto ("ilum" encontra os produtos de "Iluminação")"""
+    terms = set(normalize_terms(name)) | set(normalize_terms(sku)) | set(normalize_terms(category or ''))
+    # SKU também inteiro, sem separadores ("ABC-123" casa com "abc12")
+    terms.add(''.join(normalize_terms(sku)))
+    terms.discard('')
+    return sorted(terms)
+
+
+class PrefixIndex:
+    """
+    Índice de prefixos em um array ordenado de (termo, -popularidade, id).
+
+    Um prefixo corresponde a uma faixa contígua do array, encontrada com duas
+    buscas binárias. Os IDs da faixa são ordenados por popularidade; prefixos
+    curtos, cujas faixas são grandes, têm essa lista memorizada até que um
+    produto com um termo daquele prefixo mude. Alterações de produtos são aplicadas no lugar,
+    removendo e inserindo apenas as entradas do produto.
+    """
+
+    def __init__(self, version, memo_threshold):
+        self.version = version
+        self.memo_threshold = memo_threshold
+        self.entries = []
+        self.products = {}
+        self.terms = {}
+        self.memo = {}
+        self.categories = []
+
+    def build(self, products, popularity, categories):
+        entries = []
+        for product in products:
+            pk = product['id']
+            rank = -popularity.get(pk, 0)
+            terms = product_terms(product['name'], product['sku'], product['category__name'])
+            self.products[pk] = (product['name'], product['slug'], product['sku'], rank)
+            self.terms[pk] = terms
+            entries.extend((term, rank, pk) for term in terms)
+        entries.sort()
+        self.entries = entries
+        self.categories = sorted(
+            (-count, normalize_terms(name), name, slug) for name, slug, count in categories
+        )
+
+    def clone(self, version):
+        """Cópia rasa para aplicar alterações sem afetar leituras em andamento"""
+        index = PrefixIndex(version, self.memo_threshold)
+        index.entries = list(self.entries)
+        index.products = dict(self.products)
+        index.terms = dict(self.terms)
+        index.memo = dict(self.memo)
+        index.categories = self.categories
+        return index
+
+    def remove(self, pk):
+        if pk not in self.products:
+            return
+        rank = self.products.pop(pk)[3]
+        for term in self.terms.pop(pk):
+            position = bisect_left(self.entries, (term, rank, pk))
+            if position < len(self.entries) and self.entries[position] == (term, rank, pk):
+                del self.entries[position]
+            self._forget(term)
+
+    def add(self, product, popularity):
+        pk = product['id']
+        rank = -popularity
+        terms = product_terms(product['name'], product['sku'], product['category__name'])
+        self.products[pk] = (product['name'], product['slug'], product['sku'], rank)
+        self.terms[pk] = terms
+        for term in terms:
+            insort(self.entries, (term, rank, pk))
+            self._forget(term)
+
+    def _forget(self, term):
+        for length in range(1, len(term) + 1):
+            self.memo.pop(term[:length], None)
+
+    def _range(self, prefix):
+        low = bisect_left(self.entries, (prefix,))
+        high = bisect_left(self.entries, (prefix + '\uffff',), low)
+        return low, high
+
+    def _ranked(self, prefix, low, high):
+        """IDs distintos da faixa do prefixo, do mais para o menos popular"""
+        ranked = self.memo.get(prefix)
+        if ranked is None:
+            best = {}
+            for term, rank, pk in self.entries[low:high]:
+                best[pk] = rank
+            ranked = [pk for rank, pk in sorted((rank, pk) for pk, rank in best.items())]
+            if high - low >= self.memo_threshold:
+                self.memo[prefix] = ranked
+        return ranked
+
+    def search_products(self, query, limit):
+        terms = normalize_terms(query)
+        if not terms:
+            return []
+
+        # Percorre o prefixo mais seletivo em ordem de popularidade e para ao
+        # encontrar `limit` produtos em que todos os termos da busca são
+        # prefixo de algum termo do produto
+        ranges = sorted(((self._range(term), term) for term in terms), key=lambda r: r[0][1] - r[0][0])
+        (low, high), term = ranges[0]
+        ranked = self._ranked(term, low, high)
+        if len(terms) == 1:
+            return ranked[:limit]
+
+        others = [other for _, other in ranges[1:]]
+        results = []
+        for pk in ranked:
+            candidate_terms = self.terms[pk]
+            if all(any(t.startswith(other) for t in candidate_terms) for other in others):
+                results.append(pk)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def search_categories(self, query, limit):
+        terms = normalize_terms(query)
+        if not terms:
+            return []
+        matches = []
+        for _, category_terms, name, slug in self.categories:
+            if all(any(t.startswith(term) for t in category_terms) for term in terms):
+                matches.append({'name': name, 'slug': slug})
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def product_data(self, pk):
+        name, slug, sku, _ = self.products[pk]
+        return {'id': pk, 'name': name, 'slug': slug, 'sku': sku}
+
+
+def product_rows(product_ids=None):
+    queryset = Product.objects.filter(is_active=True)
+    if product_ids is not None:
+        queryset = queryset.filter(id__in=product_ids)
+    return queryset.values('id', 'name', 'slug', 'sku', 'category__name').order_by().iterator(chunk_size=2000)
+
+
+def product_popularity(product_ids=None):
+    """Unidades vendidas no período do ranking de destaques + número de avaliações"""
+    popularity = recent_sales(get_featured_settings()['sales_days'], product_ids)
+    summaries = ProductRatingSummary.objects.all()
+    if product_ids is not None:
+        summaries = summaries.filter(product_id__in=product_ids)
+    for pk, reviews in summaries.values_list('product_id', 'reviews_count').iterator(chunk_size=2000):
+        popularity[pk] = popularity.get(pk, 0) + reviews
+    return popularity
+
+
+def build_index(version):
+    index = PrefixIndex(version, get_autocomplete_settings()['MEMO_THRESHOLD'])
+    # Categorias ordenadas pelo número de produtos ativos
+    categories = Category.objects.filter(is_active=True).annotate(
+        total=Count('products', filter=Q(products__is_active=True))
+    ).values_list('name', 'slug', 'total')
+    index.build(product_rows(), product_popularity(), categories)
+    return index
+
+
+def get_autocomplete_version():
+    return get_version(AUTOCOMPLETE_VERSION_KEY)
+
+
+def record_autocomplete_change(product_ids=None):
+    """
+    Registra uma alteração para todos os processos. Com IDs, os processos
+    atualizam só esses produtos; sem IDs (categorias, cujo nome está nos termos
+    dos produtos, e carga em massa), o índice é reconstruído por completo.
+    """
+    version = bump_version(AUTOCOMPLETE_VERSION_KEY)
+    # Sem versão anterior (None), os processos farão uma reconstrução completa
+    if version is not None and product_ids is not None:
+        cache.set(AUTOCOMPLETE_CHANGES_KEY.format(version), list(product_ids), timeout=60 * 60 * 24)
+
+
+def get_autocomplete_index():
+    """
+    Índice deste processo, sincronizado com a versão do cache compartilhado
+    no máximo uma vez a cada CHECK_INTERVAL segundos.
+    """
+    global _index, _checked_at
+    config = get_autocomplete_settings()
+    index = _index
+    if index is not None and time.monotonic() - _checked_at < config['CHECK_INTERVAL']:
+        return index
+
+    with _index_lock:
+        version = get_autocomplete_version()
+        if _index is None:
+            _index = build_index(version)
+        elif _index.version != version:
+            changed = _pending_changes(_index.version, version, config['MAX_INCREMENTAL'])
+            if changed is None:
+                _index = build_index(version)
+            else:
+                index = _index.clone(version)
+                _apply_changes(index, changed)
+                _index = index
+        _checked_at = time.monotonic()
+        return _index
+
+
+def _pending_changes(current, target, limit):
+    """IDs alterados entre as versões, ou None se for preciso reconstruir"""
+    if not 0 < target - current <= limit:
+        return None
+    keys = [AUTOCOMPLETE_CHANGES_KEY.format(version) for version in range(current + 1, target + 1)]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return {pk for ids in found.values() for pk in ids}
+
+
+def _apply_changes(index, product_ids):
+    popularity = product_popularity(product_ids)
+    for pk in product_ids:
+        index.remove(pk)
+    for product in product_rows(product_ids):
+        index.add(product, popularity.get(product['id'], 0))
+
+
+def autocomplete(prefix, limit):
+    """Sugestões de produtos (por popularidade) e categorias para o prefixo digitado"""
+    index = get_autocomplete_index()
+    return {
+        'products': [index.product_data(pk) for pk in index.search_products(prefix, limit)],
+        'categories': index.search_categories(prefix, min(limit, get_autocomplete_settings()['CATEGORY_LIMIT'])),
+    }
@@ -0,0 +1,222 @@
+# products/cache.py
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_HITS_KEY = 'catalog:stats:hits'
+CATALOG_MISSES_KEY = 'catalog:stats:misses'
+CATEGORY_TREE_KEY = 'catalog:category-tree'
+EMERGENCY_VERSION_KEY = 'catalog:emergency:version'
+
+# Snapshot dos produtos de emergência deste processo: {host: (versão, (dados, JSON renderizado))}
+_emergency_snapshots = {}
+_emergency_checked_at = {}
+_emergency_lock = threading.Lock()
+
+
+def get_version(key):
+    """
+    Versão guardada no cache compartilhado. Se a chave não existir (cache
+    vazio ou expulsa), começa a partir do relógio em nanossegundos para nunca
+    reaproveitar uma versão antiga e servir dados desatualizados.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Incrementa a versão e retorna a nova, ou None se a chave não existia
+    (recomeça do relógio: quem guardou a anterior a vê mudar de qualquer forma).
+    Quem invalida dados do banco deve chamar depois do commit (on_commit),
+    senão outro processo pode reconstruí-los com as linhas antigas e a versão nova.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+        return None
+
+
+def get_catalog_version():
+    """Versão global do catálogo, parte das chaves das respostas em cache"""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalida todas as respostas em cache do catálogo em O(1)"""
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_cache_stats():
+    """Contadores de acertos e falhas do cache do catálogo"""
+    stats = cache.get_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
+    hits = stats.get(CATALOG_HITS_KEY, 0)
+    misses = stats.get(CATALOG_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': get_catalog_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
+
+
+def get_category_tree(builder):
+    """Menu de categorias com contagens, guardado até a próxima invalidação"""
+    tree = cache.get(CATEGORY_TREE_KEY)
+    if tree is None:
+        tree = builder()
+        cache.set(CATEGORY_TREE_KEY, tree, timeout=None)
+    return tree
+
+
+def invalidate_category_tree():
+    cache.delete(CATEGORY_TREE_KEY)
+
+
+def get_emergency_version():
+    return get_version(EMERGENCY_VERSION_KEY)
+
+
+def bump_emergency_version():
+    """Faz todos os processos reconstruírem o snapshot de emergência na próxima verificação"""
+    bump_version(EMERGENCY_VERSION_KEY)
+
+
+def invalidate_emergency_products(**lookup):
+    """Invalida o snapshot se algum produto de emergência corresponder ao filtro"""
+    from .models import Product
+
+    if Product.objects.filter(is_emergency=True, **lookup).exists():
+        transaction.on_commit(bump_emergency_version)
+
+
+def get_emergency_snapshot(host, builder):
+    """
+    Dados serializados e JSON pré-renderizado dos produtos de emergência,
+    mantidos na memória do processo. O snapshot é o mesmo para todas as
+    requisições do host: `builder` não pode depender de outros parâmetros.
+
+    Entre verificações (EMERGENCY_SNAPSHOT_CHECK_INTERVAL segundos) a resposta sai
+    direto da memória, sem banco nem cache compartilhado. Depois disso a versão é
+    conferida no cache e, se mudou, o snapshot é reconstruído uma única vez por
+    processo, mesmo com várias threads atendendo ao mesmo tempo.
+    """
+    interval = getattr(settings, 'EMERGENCY_SNAPSHOT_CHECK_INTERVAL', 1)
+    snapshot = _emergency_snapshots.get(host)
+    now = time.monotonic()
+    if snapshot is not None and now - _emergency_checked_at.get(host, 0) < interval:
+        return snapshot[1]
+
+    with _emergency_lock:
+        version = get_emergency_version()
+        snapshot = _emergency_snapshots.get(host)
+        if snapshot is None or snapshot[0] != version:
+            snapshot = (version, builder())
+            _emergency_snapshots[host] = snapshot
+        _emergency_checked_at[host] = time.monotonic()
+    return snapshot[1]
+
+
+def normalize_query_params(query_params, exclude=()):
+    """Parâmetros ordenados e sem valores vazios, para que ?a=1&b=2 e ?b=2&a=1 usem a mesma chave"""
+    items = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+        if value != '' and key not in exclude
+    )
+    return urlencode(items)
+
+
+def catalog_cache_key(request, view_name, *parts, exclude=()):
+    """Chave de cache versionada para uma resposta do catálogo"""
+    # O host entra na chave porque as URLs das imagens são absolutas
+    params = normalize_query_params(request.query_params, exclude)
+    raw = '|'.join([request.get_host(), view_name, *map(str, parts), params])
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f"catalog:v{get_catalog_version()}:{view_name}:{digest}"
+
+
+class CatalogCacheMixin:
+    """
+    Cache de respostas para list/retrieve de viewsets do catálogo.
+
+    Guarda o JSON já renderizado junto com o ETag (hash do conteúdo), então
+    um acerto não executa consultas nem serializers, e um If-None-Match igual
+    ao ETag guardado recebe 304 sem nem copiar o conteúdo. As chaves incluem a
+    versão do catálogo, que é incrementada a cada escrita em produtos,
+    categorias, imagens ou avaliações; não há Last-Modified, porque essas
+    escritas (exclusões, avaliações, imagens) não se refletem em uma data.
+    """
+    cached_actions = ('list', 'retrieve')
+    # Parâmetros que não alteram a resposta de uma ação (ex.: paginação nas facetas)
+    cache_ignored_params = {}
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def get_catalog_cache_key(self, request, *args, **kwargs):
+        # Administradores podem receber respostas diferentes (ex.: paginação por página)
+        return catalog_cache_key(
+            request, self.basename, self.action, f"staff={request.user.is_staff}",
+            *(f"{k}={v}" for k, v in sorted(kwargs.items())),
+            exclude=self.cache_ignored_params.get(self.action, ())
+        )
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        # Só cacheia JSON; a API navegável e outros formatos seguem o fluxo normal
+        if self.action not in self.cached_actions or not isinstance(request.accepted_renderer, JSONRenderer):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_catalog_cache_key(request, *args, **kwargs)
+        entry = cache.get(key)
+        if isinstance(entry, tuple):
+            _increment(CATALOG_HITS_KEY)
+            etag, content = entry
+            return get_conditional_response(request, etag=etag) or self._cached_content(request, etag, content)
+
+        _increment(CATALOG_MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+
+        content = request.accepted_renderer.render(
+            response.data, request.accepted_media_type, self.get_renderer_context()
+        )
+        etag = quote_etag(hashlib.sha1(content).hexdigest())
+        cache.set(key, (etag, content), getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+        return get_conditional_response(request, etag=etag) or self._cached_content(request, etag, content)
+
+    def _cached_content(self, request, etag, content):
+        response = HttpResponse(content, content_type=request.accepted_renderer.media_type)
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,67 @@
+# products/categories.py
+import threading
+from .cache import bump_version, get_version
+from .models import Category
+from .search import fold_accents
+
+CATEGORY_RESOLVER_VERSION_KEY = 'catalog:categories:version'
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+class CategoryResolver:
+    """
+    Mapa em memória de ID, slug e nome das categorias para IDs.
+
+    Segue as regras de ProductFilter.filter_category: um número é tratado como
+    ID, depois o slug exato (sem diferenciar maiúsculas/acentos) e, por último,
+    qualquer categoria cujo nome contenha o valor.
+    """
+
+    def __init__(self, version, categories):
+        self.version = version
+        self.slugs = {}
+        self.names = []
+        for pk, slug, name in categories:
+            self.slugs[fold_accents(slug)] = pk
+            self.names.append((fold_accents(name), pk))
+
+    def resolve(self, value):
+        """Lista de IDs de categoria correspondentes ao valor informado"""
+        value = (value or '').strip()
+        try:
+            return [int(value)]
+        except ValueError:
+            pass
+
+        folded = fold_accents(value)
+        if folded in self.slugs:
+            return [self.slugs[folded]]
+        return [pk for name, pk in self.names if folded in name]
+
+
+def get_category_version():
+    return get_version(CATEGORY_RESOLVER_VERSION_KEY)
+
+
+def invalidate_category_resolver():
+    """Faz todos os processos recarregarem as categorias na próxima consulta"""
+    bump_version(CATEGORY_RESOLVER_VERSION_KEY)
+
+
+def get_category_resolver():
+    """
+    Resolver deste processo. A versão fica no cache compartilhado, então uma
+    categoria salva em outro processo também invalida este mapa; a recarga é
+    uma única consulta às três colunas da tabela de categorias.
+    """
+    global _resolver
+    version = get_category_version()
+    resolver = _resolver
+    if resolver is None or resolver.version != version:
+        with _resolver_lock:
+            if _resolver is None or _resolver.version != version:
+                _resolver = CategoryResolver(version, Category.objects.values_list('id', 'slug', 'name'))
+            resolver = _resolver
+    return resolver
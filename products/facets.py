@@ -0,0 +1,80 @@
+# products/facets.py
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+from .models import Product
+
+DEFAULT_PRICE_BUCKETS = (0, 25, 50, 100, 250, 500)
+
+
+def get_price_buckets():
+    """Limites inferiores das faixas de preço; a última faixa é aberta"""
+    bounds = getattr(settings, 'PRODUCT_FACET_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+    return [Decimal(str(bound)) for bound in bounds]
+
+
+def price_bucket_expression(bounds):
+    """Índice da faixa de preço de cada produto, calculado no próprio banco"""
+    whens = [
+        When(price__gte=low, price__lt=high, then=Value(index))
+        for index, (low, high) in enumerate(zip(bounds, bounds[1:]))
+    ]
+    return Case(*whens, default=Value(len(bounds) - 1), output_field=IntegerField())
+
+
+def compute_facets(queryset):
+    """
+    Calcula todas as facetas do queryset em uma única consulta agrupada.
+
+    O GROUP BY por (categoria, disponibilidade, emergência, faixa de preço) gera a
+    distribuição conjunta, que é pequena, e cada faceta é somada a partir dela.
+    Com a busca textual, o índice entra como junção no mesmo SQL (products.search),
+    então as contagens cobrem todos os produtos que casam com a busca e os filtros;
+    a ordenação por relevância é descartada.
+    """
+    bounds = get_price_buckets()
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket_expression(bounds))
+        .values('category_id', 'category__name', 'category__slug', 'availability', 'is_emergency', 'price_bucket')
+        .annotate(total=Count('id'))
+    )
+
+    total = 0
+    categories = {}
+    availability = defaultdict(int)
+    emergency = {'true': 0, 'false': 0}
+    prices = defaultdict(int)
+    for row in rows:
+        count = row['total']
+        total += count
+        category = categories.setdefault(row['category_id'], {
+            'id': row['category_id'],
+            'name': row['category__name'],
+            'slug': row['category__slug'],
+            'count': 0,
+        })
+        category['count'] += count
+        availability[row['availability']] += count
+        emergency['true' if row['is_emergency'] else 'false'] += count
+        prices[row['price_bucket']] += count
+
+    availability_labels = dict(Product.AVAILABILITY_CHOICES)
+    return {
+        'total': total,
+        'categories': sorted(categories.values(), key=lambda c: (-c['count'], c['name'])),
+        'availability': [
+            {'value': value, 'label': str(label), 'count': availability.get(value, 0)}
+            for value, label in availability_labels.items()
+        ],
+        'is_emergency': emergency,
+        'price': [
+            {
+                'min': bound,
+                'max': bounds[index + 1] if index + 1 < len(bounds) else None,
+                'count': prices.get(index, 0),
+            }
+            for index, bound in enumerate(bounds)
+        ],
+    }
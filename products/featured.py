@@ -0,0 +1,94 @@
+# products/featured.py
+import math
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from .models import FeaturedProduct, Product
+
+# Pesos padrão da pontuação; podem ser sobrescritos por categoria (slug) em
+# settings.FEATURED_PRODUCTS['WEIGHTS']
+DEFAULT_WEIGHTS = {
+    'rating': 1.0,   # média das avaliações (0-5)
+    'reviews': 0.5,  # log(1 + número de avaliações)
+    'sales': 1.0,    # log(1 + unidades vendidas no período)
+}
+PAID_ORDER_STATUSES = ('PAID', 'PROCESSING', 'SHIPPED', 'DELIVERED')
+
+
+def get_featured_settings():
+    config = getattr(settings, 'FEATURED_PRODUCTS', {})
+    return {
+        'size': config.get('SIZE', 50),
+        'sales_days': config.get('SALES_DAYS', 30),
+        'weights': config.get('WEIGHTS', {}),
+    }
+
+
+def get_weights(category_slug, overrides):
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update(overrides.get('default', {}))
+    weights.update(overrides.get(category_slug, {}))
+    return weights
+
+
+def recent_sales(days, product_ids=None):
+    """Unidades vendidas por produto em pedidos pagos dos últimos `days` dias (uma consulta agrupada)"""
+    from orders.models import OrderItem
+
+    since = timezone.now() - timedelta(days=days)
+    items = OrderItem.objects.filter(
+        product__isnull=False,
+        order__status__in=PAID_ORDER_STATUSES,
+        order__created_at__gte=since,
+    )
+    if product_ids is not None:
+        items = items.filter(product_id__in=product_ids)
+    rows = (
+        items
+        .values('product_id')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    return {row['product_id']: row['units'] for row in rows}
+
+
+def score_product(average_rating, reviews_count, units_sold, weights):
+    return (
+        weights['rating'] * (average_rating or 0)
+        + weights['reviews'] * math.log1p(reviews_count or 0)
+        + weights['sales'] * math.log1p(units_sold or 0)
+    )
+
+
+def refresh_featured_products():
+    """
+    Recalcula o ranking de destaques e grava os N primeiros na tabela
+    FeaturedProduct. Retorna a quantidade de produtos gravados.
+    """
+    config = get_featured_settings()
+    sales = recent_sales(config['sales_days'])
+
+    candidates = Product.objects.filter(is_active=True, stock__gt=0).values_list(
+        'id', 'category__slug', 'rating_summary__average_rating', 'rating_summary__reviews_count'
+    ).order_by()
+
+    scored = []
+    for product_id, category_slug, average_rating, reviews_count in candidates.iterator(chunk_size=2000):
+        weights = get_weights(category_slug, config['weights'])
+        score = score_product(average_rating, reviews_count, sales.get(product_id), weights)
+        scored.append((score, product_id))
+
+    # Empates ficam com o produto mais recente (maior ID)
+    scored.sort(reverse=True)
+    entries = [
+        FeaturedProduct(product_id=product_id, rank=rank, score=score)
+        for rank, (score, product_id) in enumerate(scored[:config['size']], start=1)
+    ]
+
+    with transaction.atomic():
+        FeaturedProduct.objects.all().delete()
+        FeaturedProduct.objects.bulk_create(entries)
+
+    return len(entries)
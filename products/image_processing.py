@@ -0,0 +1,53 @@
+# products/image_processing.py
+#
+# Funções puras (somente Pillow, sem Django) executadas nos processos do pool
+# de derivados de imagem. Não importe modelos ou settings aqui: com o contexto
+# 'spawn' este módulo é importado em um processo sem Django configurado.
+import hashlib
+from io import BytesIO
+from PIL import Image, ImageOps
+
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def render_derivatives(data, sizes, formats, quality):
+    """
+    Gera as versões redimensionadas de uma imagem.
+
+    `sizes` é um dicionário {nome: lado máximo em pixels}. Retorna
+    {nome: {'width': w, 'height': h, 'files': {formato: bytes}}}. Imagens
+    menores que o tamanho pedido não são ampliadas.
+    """
+    with Image.open(BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        source.load()
+
+    if source.mode in ('RGBA', 'LA', 'P'):
+        rgba = source.convert('RGBA')
+        # JPEG não tem transparência: compor sobre fundo branco
+        flattened = Image.new('RGB', rgba.size, (255, 255, 255))
+        flattened.paste(rgba, mask=rgba.split()[-1])
+    else:
+        rgba = None
+        flattened = source.convert('RGB')
+
+    result = {}
+    for name, max_side in sizes.items():
+        files = {}
+        for fmt in formats:
+            image = (rgba if fmt == 'webp' and rgba is not None else flattened).copy()
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            buffer = BytesIO()
+            options = {'quality': quality}
+            if fmt == 'jpeg':
+                options.update(optimize=True, progressive=True)
+            else:
+                options.update(method=4)
+            image.save(buffer, PIL_FORMATS[fmt], **options)
+            files[fmt] = buffer.getvalue()
+        result[name] = {'width': image.width, 'height': image.height, 'files': files}
+    return result
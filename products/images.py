@@ -0,0 +1,211 @@
+# products/images.py
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image
+from .image_processing import content_hash, render_derivatives
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DERIVATIVES = {
+    'SIZES': {'thumb': 160, 'card': 480, 'zoom': 1600},
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 82,
+    'WORKERS': 2,
+    'ASYNC': True,
+    'PATH': 'derivatives',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+# Resultados do pool à espera de gravação: (future, dados da imagem, rótulo do modelo, pk, nome de origem, config)
+_results = queue.Queue()
+_writer = None
+
+
+def get_derivative_settings():
+    config = dict(DEFAULT_DERIVATIVES)
+    config.update(getattr(settings, 'IMAGE_DERIVATIVES', {}))
+    return config
+
+
+def get_executor():
+    """Pool de processos compartilhado, criado sob demanda"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=get_derivative_settings()['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def derivative_name(digest, size, fmt, config):
+    """Nome derivado do conteúdo: o mesmo arquivo nunca muda e pode ter cache imutável"""
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f"{config['PATH']}/{digest[:2]}/{digest[:16]}-{size}.{extension}"
+
+
+def needs_derivatives(field_file, derivatives):
+    return bool(field_file) and (derivatives or {}).get('source') != field_file.name
+
+
+def read_source(field_file):
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        return source.read()
+
+
+def build_derivatives(data, source_name, config, rendered=None):
+    """
+    Grava os derivados no storage e devolve o dicionário guardado no modelo:
+    {'source': nome, 'hash': sha256, 'thumb': {'width', 'height', 'webp', 'jpeg'}, ...}
+    Se os arquivos desse conteúdo já existem, nada é recalculado.
+    """
+    digest = content_hash(data)
+    names = {
+        size: {fmt: derivative_name(digest, size, fmt, config) for fmt in config['FORMATS']}
+        for size in config['SIZES']
+    }
+    probe = names[next(iter(config['SIZES']))][config['FORMATS'][0]]
+    if rendered is None and not default_storage.exists(probe):
+        rendered = render_derivatives(data, config['SIZES'], config['FORMATS'], config['QUALITY'])
+
+    derivatives = {'source': source_name, 'hash': digest}
+    for size, formats in names.items():
+        if rendered is not None:
+            entry = {'width': rendered[size]['width'], 'height': rendered[size]['height']}
+        else:
+            # Derivados já existentes: basta ler o cabeçalho para obter as dimensões
+            with default_storage.open(formats[config['FORMATS'][0]], 'rb') as existing:
+                with Image.open(existing) as image:
+                    entry = {'width': image.width, 'height': image.height}
+        for fmt, name in formats.items():
+            if rendered is not None and not default_storage.exists(name):
+                default_storage.save(name, ContentFile(rendered[size]['files'][fmt]))
+            entry[fmt] = name
+        derivatives[size] = entry
+    return derivatives
+
+
+def store_derivatives(model_label, pk, derivatives):
+    """
+    Grava o resultado sem disparar post_save e invalida os caches do catálogo.
+    Só grava se a imagem ainda for a mesma de que os derivados foram gerados:
+    um resultado lento de um upload antigo não sobrescreve o do upload novo.
+    Retorna se gravou.
+    """
+    from .cache import (
+        bump_catalog_version, bump_emergency_version, invalidate_category_tree, invalidate_emergency_products,
+    )
+
+    model = apps.get_model(model_label)
+    if not model.objects.filter(pk=pk, image=derivatives['source']).update(image_derivatives=derivatives):
+        logger.info(f"Derivados de {model_label} #{pk} descartados: a imagem mudou desde {derivatives['source']}")
+        return False
+    transaction.on_commit(bump_catalog_version)
+    if model_label == 'products.Category':
+        transaction.on_commit(invalidate_category_tree)
+        transaction.on_commit(bump_emergency_version)
+    else:
+        invalidate_emergency_products(images__pk=pk)
+    return True
+
+
+def generate_for_instance(instance, config=None):
+    """Gera os derivados de forma síncrona (usado pelo backfill e com ASYNC=False)"""
+    config = config or get_derivative_settings()
+    data = read_source(instance.image)
+    derivatives = build_derivatives(data, instance.image.name, config)
+    store_derivatives(instance._meta.label, instance.pk, derivatives)
+    return derivatives
+
+
+def write_results():
+    """
+    Laço da thread de gravação: espera cada resultado do pool e grava os
+    derivados no storage e no banco. Fica fora da thread de gerenciamento do
+    ProcessPoolExecutor (onde rodam os callbacks dos futures), que não deve
+    bloquear nem usar o ORM; aqui as exceções são registradas com o traceback
+    e a conexão da thread é fechada depois de cada gravação.
+    """
+    while True:
+        future, data, model_label, pk, source_name, config = _results.get()
+        try:
+            derivatives = build_derivatives(data, source_name, config, rendered=future.result())
+            store_derivatives(model_label, pk, derivatives)
+        except Exception:
+            logger.exception(f"Erro ao gerar derivados de {model_label} #{pk}")
+        finally:
+            connections.close_all()
+            _results.task_done()
+
+
+def get_writer():
+    """Thread de gravação compartilhada, criada sob demanda"""
+    global _writer
+    with _executor_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=write_results, name='image-derivatives-writer', daemon=True)
+            _writer.start()
+        return _writer
+
+
+def schedule_derivatives(instance):
+    """
+    Agenda a geração dos derivados para depois do commit. O redimensionamento
+    roda no pool de processos; a gravação no storage e no banco acontece na
+    thread de gravação (write_results), fora da requisição.
+    """
+    config = get_derivative_settings()
+    model_label = instance._meta.label
+    pk = instance.pk
+    source_name = instance.image.name
+
+    def submit():
+        if not config['ASYNC']:
+            generate_for_instance(instance, config)
+            return
+
+        data = read_source(instance.image)
+        future = get_executor().submit(
+            render_derivatives, data, config['SIZES'], config['FORMATS'], config['QUALITY']
+        )
+        get_writer()
+        _results.put((future, data, model_label, pk, source_name, config))
+
+    transaction.on_commit(submit)
+
+
+def build_srcset(derivatives, url_builder=None):
+    """
+    Converte o dicionário de derivados em URLs prontas para <img srcset>:
+    {'sizes': {'thumb': {'width', 'height', 'webp', 'jpeg'}}, 'srcset': {'webp': '... 160w, ...'}}
+    """
+    if not derivatives or 'hash' not in derivatives:
+        return None
+
+    url_builder = url_builder or (lambda url: url)
+    config = get_derivative_settings()
+    sizes = {}
+    srcset = {}
+    for size in config['SIZES']:
+        entry = derivatives.get(size)
+        if not entry:
+            continue
+        urls = {fmt: url_builder(default_storage.url(entry[fmt])) for fmt in config['FORMATS'] if fmt in entry}
+        sizes[size] = dict(urls, width=entry.get('width'), height=entry.get('height'))
+        for fmt, url in urls.items():
+            if entry.get('width'):
+                srcset.setdefault(fmt, []).append(f"{url} {entry['width']}w")
+    return {
+        'sizes': sizes,
+        'srcset': {fmt: ', '.join(parts) for fmt, parts in srcset.items()},
+    }
@@ -0,0 +1,269 @@
+# products/importer.py
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+from .autocomplete import record_autocomplete_change
+from .cache import bump_catalog_version, bump_emergency_version, invalidate_category_tree
+from .models import Category, Product
+from .search import get_search_backend, product_index_queryset
+
+# Colunas aceitas além de sku e category; as ausentes recebem o padrão do modelo
+IMPORT_FIELDS = [
+    'name', 'description', 'price', 'discount_price', 'stock', 'availability',
+    'is_emergency', 'weight', 'dimensions', 'is_active',
+]
+SLUG_MAX_LENGTH = 200
+BOOLEAN_VALUES = {
+    'true': True, 'false': False, '1': True, '0': False,
+    'sim': True, 'não': False, 'nao': False, 's': True, 'n': False,
+    'yes': True, 'no': False, 't': True, 'f': False,
+}
+
+
+class ImportStats:
+    """Contadores de uma importação, gravados também no checkpoint"""
+
+    def __init__(self, rows=0, created=0, updated=0, invalid=0):
+        self.rows = rows
+        self.created = created
+        self.updated = updated
+        self.invalid = invalid
+        self.resumed_rows = rows
+        self.started = time.perf_counter()
+        self.errors = []
+        self.omitted_errors = 0
+
+    def as_dict(self):
+        return {'rows': self.rows, 'created': self.created, 'updated': self.updated, 'invalid': self.invalid}
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return (self.rows - self.resumed_rows) / elapsed if elapsed else 0.0
+
+
+def read_rows(path, fmt=None):
+    """
+    Lê o arquivo linha a linha (CSV ou JSONL, opcionalmente .gz) sem carregá-lo
+    na memória. Gera (número da linha, dados, erro).
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    fmt = fmt or ('jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv')
+    raw = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+    with io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as stream:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(stream), start=1):
+                yield number, row, None
+            return
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, None, f"JSON inválido: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "A linha não é um objeto JSON"
+                continue
+            yield number, row, None
+
+
+def load_checkpoint(path, source):
+    """Retorna as estatísticas salvas para o arquivo de origem, ou None"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('source') != os.path.abspath(source):
+        return None
+    return ImportStats(**{key: data[key] for key in ('rows', 'created', 'updated', 'invalid')})
+
+
+def save_checkpoint(path, source, stats):
+    # Grava em um arquivo temporário e renomeia: o checkpoint nunca fica pela metade
+    data = dict(stats.as_dict(), source=os.path.abspath(source))
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class CatalogImporter:
+    """
+    Importa produtos em lotes com upsert por SKU.
+
+    Cada lote é validado com os próprios campos do modelo, as categorias são
+    resolvidas por um mapa slug -> id em memória e os slugs novos são gerados
+    em bloco (uma consulta por lote, mais uma se houver conflitos). A gravação
+    é um único bulk_create(update_conflicts=True) por lote; produtos existentes
+    mantêm o slug. Como bulk_create não dispara signals, o índice de busca e os caches
+    do catálogo são atualizados aqui.
+    """
+
+    def __init__(self, batch_size=1000, dry_run=False, create_categories=False, max_errors=50):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.create_categories = create_categories
+        self.max_errors = max_errors
+        self.fields = {name: Product._meta.get_field(name) for name in IMPORT_FIELDS}
+        self.sku_field = Product._meta.get_field('sku')
+        self.categories = {slug: pk for slug, pk in Category.objects.values_list('slug', 'id')}
+        self.assigned_slugs = set()
+        self.search_backend = get_search_backend()
+
+    def run(self, rows, stats=None, on_batch=None):
+        """Processa (linha, dados, erro) a partir de stats.rows e chama on_batch após cada lote"""
+        stats = stats or ImportStats()
+        skip = stats.rows
+        batch = []
+        for number, data, error in rows:
+            if number <= skip:
+                continue
+            batch.append((number, data, error))
+            if len(batch) >= self.batch_size:
+                self.process_batch(batch, stats)
+                batch = []
+                if on_batch:
+                    on_batch(stats)
+        if batch:
+            self.process_batch(batch, stats)
+            if on_batch:
+                on_batch(stats)
+        return stats
+
+    def process_batch(self, batch, stats):
+        products = {}
+        for number, data, error in batch:
+            product = None
+            if error is None:
+                try:
+                    product = self.build_product(data)
+                except ValidationError as e:
+                    error = '; '.join(e.messages)
+            if product is None:
+                stats.invalid += 1
+                if len(stats.errors) < self.max_errors:
+                    stats.errors.append((number, error))
+                else:
+                    stats.omitted_errors += 1
+                continue
+            # SKU repetido no mesmo lote: vale a última linha
+            products[product.sku] = product
+
+        stats.rows = batch[-1][0]
+        if not products:
+            return
+
+        existing = dict(Product.objects.filter(sku__in=list(products)).values_list('sku', 'slug'))
+        self.assign_slugs(products.values(), existing)
+        stats.created += len(products) - len(existing)
+        stats.updated += len(existing)
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                list(products.values()),
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=['category'] + IMPORT_FIELDS + ['updated_at'],
+            )
+            self.update_search_index(list(products))
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(bump_emergency_version)
+        transaction.on_commit(invalidate_category_tree)
+
+    def build_product(self, data):
+        """Valida uma linha com os campos do modelo e monta o Product (ainda sem slug)"""
+        data = {key.strip().lower(): value for key, value in data.items() if key}
+        try:
+            sku = self.sku_field.clean(str(data.get('sku') or '').strip(), None)
+        except ValidationError as e:
+            raise ValidationError(f"sku: {' '.join(e.messages)}")
+
+        values = {}
+        errors = []
+        for name, field in self.fields.items():
+            value = data.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+                if field.get_internal_type() == 'BooleanField':
+                    value = BOOLEAN_VALUES.get(value.lower(), value)
+            if value in (None, '') and (field.has_default() or field.null or field.blank):
+                values[name] = field.get_default()
+                continue
+            try:
+                values[name] = field.clean(value, None)
+            except ValidationError as e:
+                errors.append(f"{name}: {' '.join(e.messages)}")
+        if errors:
+            raise ValidationError(errors)
+
+        values['category_id'] = self.resolve_category(data.get('category'))
+        return Product(sku=sku, **values)
+
+    def resolve_category(self, value):
+        """Aceita slug ou nome da categoria; cria as que faltam com --create-categories"""
+        name = str(value or '').strip()
+        slug = slugify(name)
+        if not slug:
+            raise ValidationError("Categoria obrigatória.")
+        if slug not in self.categories:
+            if not self.create_categories:
+                raise ValidationError(f"Categoria '{name}' não encontrada.")
+            if self.dry_run:
+                self.categories[slug] = None
+            else:
+                self.categories[slug] = Category.objects.create(name=name, slug=slug).pk
+        return self.categories[slug]
+
+    def assign_slugs(self, products, existing):
+        """
+        Produtos existentes mantêm o slug atual. Para os novos, usa slugify(nome)
+        e, em caso de conflito, o primeiro sufixo -2, -3... livre, consultando de
+        uma vez todos os slugs já usados com as mesmas bases.
+        """
+        new = [product for product in products if product.sku not in existing]
+        for product in products:
+            if product.sku in existing:
+                product.slug = existing[product.sku]
+        if not new:
+            return
+
+        bases = {product.sku: slugify(product.name)[:SLUG_MAX_LENGTH] or slugify(product.sku) for product in new}
+        taken = set(Product.objects.filter(slug__in=set(bases.values())).values_list('slug', flat=True))
+        taken |= self.assigned_slugs
+        colliding = sorted({base for base in bases.values() if base in taken})
+        # Em blocos para não estourar o limite de profundidade de expressões do SQLite
+        for start in range(0, len(colliding), 100):
+            query = Q()
+            for base in colliding[start:start + 100]:
+                query |= Q(slug__startswith=f"{base}-")
+            taken.update(Product.objects.filter(query).values_list('slug', flat=True))
+
+        for product in new:
+            base = bases[product.sku]
+            slug, suffix = base, 1
+            while slug in taken:
+                suffix += 1
+                slug = f"{base}-{suffix}"
+            product.slug = slug
+            taken.add(slug)
+            self.assigned_slugs.add(slug)
+
+    def update_search_index(self, skus):
+        imported = Product.objects.filter(sku__in=skus)
+        self.search_backend.remove_products(
+            imported.filter(is_active=False).values_list('id', flat=True)
+        )
+        self.search_backend.index_products(product_index_queryset(imported))
+        product_ids = list(imported.values_list('id', flat=True))
+        transaction.on_commit(lambda: record_autocomplete_change(product_ids))
@@ -0,0 +1,73 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o custo de polls repetidos com e sem GET condicional (If-None-Match) "
+        "nos endpoints de produtos e histórico de pedidos. Os dados são revertidos ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--polls', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self._populate(options['products'], options['orders'])
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+
+            product = Product.objects.filter(slug__startswith='poll-').first()
+            for url in ['/api/products/', f'/api/products/{product.slug}/', '/api/orders/history/']:
+                self._report(client, url, options['polls'])
+
+            transaction.set_rollback(True)
+
+    def _populate(self, products, orders):
+        category = Category.objects.create(name="Benchmark Polling", slug="benchmark-polling")
+        Product.objects.bulk_create([
+            Product(
+                name=f"Produto {i}", slug=f"poll-{i}", sku=f"POLL{i:06d}", category=category,
+                description="Produto usado no benchmark de polling " * 5, price=10 + i % 90, stock=i % 7,
+            )
+            for i in range(products)
+        ])
+        user = User.objects.create(username="benchmark-polling", email="polling@example.com")
+        created = Order.objects.bulk_create([Order(user=user, full_name="Cliente", phone="11999999999") for _ in range(orders)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_name=f"Produto {n}", price=10, quantity=1 + n)
+            for order in created for n in range(3)
+        ])
+        return user
+
+    def _report(self, client, url, polls):
+        first = client.get(url, HTTP_ACCEPT='application/json')
+        etag = first['ETag']
+
+        full_times, full_bytes = [], 0
+        cond_times, cond_bytes = [], 0
+        for _ in range(polls):
+            started = time.perf_counter()
+            response = client.get(url, HTTP_ACCEPT='application/json')
+            full_times.append((time.perf_counter() - started) * 1000)
+            full_bytes += len(response.content)
+
+            started = time.perf_counter()
+            response = client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+            cond_times.append((time.perf_counter() - started) * 1000)
+            cond_bytes += len(response.content)
+            assert response.status_code == 304, response.status_code
+
+        self.stdout.write(
+            f"{url}\n"
+            f"  200 completo : {statistics.median(full_times):7.2f} ms/poll, {full_bytes // polls} bytes/poll\n"
+            f"  304 (ETag)   : {statistics.median(cond_times):7.2f} ms/poll, {cond_bytes // polls} bytes/poll"
+        )
@@ -0,0 +1,88 @@
+import time
+import tracemalloc
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from products.models import Category, Product, ProductReview
+from products.serializers import ProductListSerializer, ProductSerializer
+from products.views import ProductViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara memória, consultas e tempo da listagem e do detalhe de produtos com o "
+        "prefetch de todas as avaliações (comportamento antigo) e com o caminho atual "
+        "(sem avaliações na listagem, Prefetch limitado no detalhe). Os dados são revertidos ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--reviews', type=int, default=50, help="Avaliações por produto")
+        parser.add_argument('--comment-size', type=int, default=1000, help="Tamanho de cada comentário")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            products = self._populate(options['products'], options['reviews'], options['comment_size'])
+            request = Request(APIRequestFactory().get('/api/products/'))
+            slug = products[0].slug
+
+            self.stdout.write(f"{options['products']} produtos x {options['reviews']} avaliações")
+            self._report("listagem antes  (prefetch images + reviews)", lambda: ProductSerializer(
+                Product.objects.filter(is_active=True, slug__startswith='mem-')
+                .select_related('category', 'rating_summary').prefetch_related('images', 'reviews'),
+                many=True, context={'request': request},
+            ).data)
+            self._report("listagem depois (ProductListSerializer)", lambda: ProductListSerializer(
+                self._view('list', request).get_queryset().filter(slug__startswith='mem-'),
+                many=True, context={'request': request},
+            ).data)
+
+            self._report("detalhe antes  (todas as avaliações)", lambda: ProductSerializer(
+                Product.objects.select_related('category', 'rating_summary')
+                .prefetch_related('images', 'reviews').get(slug=slug),
+                context={'request': request},
+            ).data)
+            view = self._view('retrieve', request)
+            self._report("detalhe depois (últimas N avaliações)", lambda: ProductSerializer(
+                view.get_queryset().get(slug=slug), context=view.get_serializer_context(),
+            ).data)
+
+            transaction.set_rollback(True)
+
+    def _view(self, action, request):
+        return ProductViewSet(action=action, request=request, format_kwarg=None)
+
+    def _populate(self, products, reviews, comment_size):
+        category = Category.objects.create(name="Benchmark Memória", slug="benchmark-memoria")
+        created = Product.objects.bulk_create([
+            Product(
+                name=f"Produto {i}", slug=f"mem-{i}", sku=f"MEM{i:06d}", category=category,
+                description="Produto usado no benchmark de memória", price=10 + i % 90, stock=i % 7,
+            )
+            for i in range(products)
+        ])
+        users = User.objects.bulk_create([
+            User(username=f"benchmark-mem-{n}", email=f"mem{n}@example.com") for n in range(reviews)
+        ])
+        comment = ("Comentário longo de avaliação. " * (comment_size // 30 + 1))[:comment_size]
+        ProductReview.objects.bulk_create([
+            ProductReview(product=product, user=user, rating=1 + n % 5, title="Avaliação", comment=comment)
+            for product in created for n, user in enumerate(users)
+        ], batch_size=2000)
+        return created
+
+    def _report(self, label, build):
+        tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            data = build()
+        elapsed = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del data
+        self.stdout.write(
+            f"  {label:48s} pico {peak / 1024 / 1024:7.2f} MB  {len(queries):4d} consultas  {elapsed:8.1f} ms"
+        )
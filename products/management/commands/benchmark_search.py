@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from products.models import Category, Product
+from products.search import get_search_backend, product_index_queryset
+
+ITEMS = [
+    'lâmpada', 'extensão', 'tomada', 'cabo', 'fita isolante', 'disjuntor', 'lanterna',
+    'pilha', 'bateria', 'chuveiro', 'resistência', 'torneira', 'parafuso', 'bucha',
+    'martelo', 'alicate', 'chave de fenda', 'interruptor', 'braço de chuveiro', 'luminária',
+]
+ATTRIBUTES = [
+    'led', 'bivolt', 'branco', 'preto', 'alumínio', 'inox', 'emergência', 'econômica',
+    'residencial', 'industrial', '10a', '20a', '127v', '220v', '30cm', '1m', '5m',
+]
+QUERIES = ['lampada', 'emergencia', 'extensao bivolt', 'chuveiro resistencia', 'alicate', 'xyzinexistente']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a latência da busca por índice textual com o caminho antigo (icontains) "
+        "em um catálogo sintético. Os dados são criados em uma transação revertida ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help="Tamanho do catálogo sintético")
+        parser.add_argument('--repeat', type=int, default=20, help="Execuções por consulta")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f"Backend: {backend.__class__.__name__}")
+
+        with transaction.atomic():
+            self._populate(options['products'], backend)
+
+            base = Product.objects.filter(is_active=True)
+            for query in QUERIES:
+                legacy = self._measure(options['repeat'], lambda: list(
+                    base.filter(
+                        Q(name__icontains=query) |
+                        Q(description__icontains=query) |
+                        Q(sku__icontains=query) |
+                        Q(category__name__icontains=query)
+                    ).values_list('id', flat=True)[:50]
+                ))
+                indexed = self._measure(options['repeat'], lambda: list(
+                    backend.filter_queryset(base, query).values_list('id', flat=True)[:50]
+                ))
+                self.stdout.write(
+                    f"{query!r:28} icontains: {legacy:8.2f} ms   índice: {indexed:8.2f} ms   "
+                    f"({legacy / indexed if indexed else 0:.1f}x)"
+                )
+
+            transaction.set_rollback(True)
+
+    def _populate(self, total, backend):
+        """Cria o catálogo sintético com bulk_create e alimenta o índice"""
+        rng = random.Random(42)
+        # Vocabulário amplo (marcas e termos técnicos) para que cada termo real
+        # apareça em uma fração pequena do catálogo, como em um catálogo de verdade
+        brands = [f"marca{i}" for i in range(300)]
+        vocabulary = [f"termo{i}" for i in range(5000)]
+        categories = [
+            Category.objects.create(name=f"Benchmark {name}", slug=f"benchmark-{i}")
+            for i, name in enumerate(['Elétrica', 'Hidráulica', 'Ferramentas', 'Iluminação'])
+        ]
+        started = time.perf_counter()
+        batch = []
+        for i in range(total):
+            item = ITEMS[i % len(ITEMS)] if rng.random() < 0.2 else rng.choice(vocabulary)
+            batch.append(Product(
+                name=f"{item} {rng.choice(ATTRIBUTES)} {rng.choice(brands)}".capitalize(),
+                slug=f"benchmark-{i}",
+                sku=f"BENCH{i:07d}",
+                category=rng.choice(categories),
+                description=' '.join(rng.choices(vocabulary, k=25) + rng.sample(ATTRIBUTES, 2)),
+                price=rng.randint(1, 500),
+                stock=rng.randint(0, 50),
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
+
+        backend.rebuild(product_index_queryset(Product.objects.all()))
+        self.stdout.write(f"{total} produtos criados e indexados em {time.perf_counter() - started:.1f}s")
+
+    def _measure(self, repeat, func):
+        """Mediana do tempo de execução em milissegundos"""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,71 @@
+import random
+import resource
+import time
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from products.models import Category, Product, SimilarProduct
+from products.similar import refresh_similar_products
+
+WORDS = (
+    "kit primeiros socorros lanterna led bateria recarregavel radio manivela agua potavel filtro "
+    "barraca termica cobertor emergencia apito corda nylon canivete multiuso fogareiro gas racao "
+    "desidratada capa chuva luva protecao mascara respirador gerador solar painel powerbank cabo "
+    "usb tomada extensao fita adesiva lona plastica balde dobravel purificador pastilha cloro "
+    "sinalizador bussola mapa mochila impermeavel saco dormir isolante colchonete"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o cálculo completo e incremental dos produtos similares sobre um catálogo "
+        "sintético. Os dados são revertidos ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--changed', type=int, default=100, help="Produtos alterados antes do cálculo incremental")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            categories = Category.objects.bulk_create([
+                Category(name=f"Similares {n}", slug=f"benchmark-similares-{n}") for n in range(options['categories'])
+            ])
+            started = time.perf_counter()
+            products = [product.pk for product in Product.objects.bulk_create([
+                Product(
+                    name=" ".join(rng.sample(WORDS, 3)).title(), slug=f"sim-{i}", sku=f"SIM{i:07d}",
+                    category=rng.choice(categories), description=" ".join(rng.choices(WORDS, k=30)),
+                    price=round(rng.lognormvariate(4, 1), 2), weight=round(rng.uniform(0.1, 20), 2),
+                )
+                for i in range(options['products'])
+            ], batch_size=2000)]
+            self.stdout.write(f"{len(products)} produtos criados em {time.perf_counter() - started:.1f}s")
+
+            self._measure("completo", lambda: refresh_similar_products(full=True))
+
+            changed = rng.sample(products, min(options['changed'], len(products)))
+            Product.objects.filter(pk__in=changed).update(
+                name="Lanterna Solar Recarregavel", updated_at=timezone.now()
+            )
+            self._measure(f"incremental ({len(changed)} alterados)", lambda: refresh_similar_products())
+
+            started = time.perf_counter()
+            for pk in changed[:50]:
+                list(SimilarProduct.objects.filter(product_id=pk).values_list('similar_id', 'score'))
+            elapsed = (time.perf_counter() - started) * 1000 / max(len(changed[:50]), 1)
+            self.stdout.write(f"  leitura de uma lista pré-calculada: {elapsed:.2f} ms")
+
+            transaction.set_rollback(True)
+
+    def _measure(self, label, run):
+        started = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - started
+        # ru_maxrss em KB no Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f"  {label:32s} {result.recomputed:7d} listas  {elapsed:7.1f}s  pico do processo {peak:7.0f} MB"
+        )
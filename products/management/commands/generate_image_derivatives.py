@@ -0,0 +1,76 @@
+import time
+from collections import deque
+from django.core.management.base import BaseCommand
+from products.images import (
+    build_derivatives, get_derivative_settings, get_executor, needs_derivatives,
+    read_source, store_derivatives,
+)
+from products.image_processing import render_derivatives
+from products.models import Category, ProductImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as versões redimensionadas (thumb/card/zoom em WebP e JPEG) das imagens "
+        "de produtos e categorias que ainda não as têm. O redimensionamento roda em "
+        "paralelo no pool de processos, com poucas imagens em memória por vez."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regera mesmo as imagens já processadas")
+
+    def handle(self, *args, **options):
+        config = get_derivative_settings()
+        # Imagens lidas e ainda não gravadas: no máximo algumas por processo do pool
+        in_flight = config['WORKERS'] * 4
+        started = time.perf_counter()
+        self.total = self.errors = 0
+
+        for model in (ProductImage, Category):
+            label = model._meta.label
+            window = deque()
+            for obj in self.pending(model, options['force'], in_flight):
+                try:
+                    data = read_source(obj.image)
+                except OSError as e:
+                    self.fail(label, obj.pk, e)
+                    continue
+                future = get_executor().submit(
+                    render_derivatives, data, config['SIZES'], config['FORMATS'], config['QUALITY']
+                )
+                window.append((obj, data, future))
+                if len(window) >= in_flight:
+                    self.write(label, config, *window.popleft())
+            while window:
+                self.write(label, config, *window.popleft())
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.total} imagem(ns) processada(s) em {elapsed:.1f}s ({self.errors} erro(s))."
+        ))
+
+    def pending(self, model, force, chunk_size):
+        """Imagens sem derivados atuais, carregadas em blocos de IDs"""
+        queryset = model.objects.exclude(image='').exclude(image__isnull=True)
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(ids), chunk_size):
+            chunk = queryset.only('id', 'image', 'image_derivatives').in_bulk(ids[start:start + chunk_size])
+            for pk in ids[start:start + chunk_size]:
+                obj = chunk.get(pk)
+                if obj is not None and (force or needs_derivatives(obj.image, obj.image_derivatives)):
+                    yield obj
+
+    def write(self, label, config, obj, data, future):
+        """Grava o resultado de uma imagem; depois disso os bytes lidos podem ser liberados"""
+        try:
+            rendered = future.result()
+            derivatives = build_derivatives(data, obj.image.name, config, rendered=rendered)
+        except Exception as e:
+            self.fail(label, obj.pk, e)
+            return
+        store_derivatives(label, obj.pk, derivatives)
+        self.total += 1
+
+    def fail(self, label, pk, error):
+        self.errors += 1
+        self.stderr.write(f"{label} #{pk}: {error}")
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import CatalogImporter, load_checkpoint, read_rows, save_checkpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa um catálogo de fornecedor (CSV ou JSONL, opcionalmente .gz) com upsert "
+        "de produtos por SKU. Colunas: sku, name, category (slug ou nome), description, "
+        "price, discount_price, stock, availability, is_emergency, weight, dimensions, is_active."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo .csv, .jsonl ou .ndjson (aceita .gz)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Força o formato do arquivo")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Valida e conta criações/atualizações sem gravar")
+        parser.add_argument('--create-categories', action='store_true', help="Cria as categorias inexistentes")
+        parser.add_argument(
+            '--checkpoint',
+            help="Arquivo JSON com o progresso; se existir para o mesmo arquivo, a importação continua de onde parou"
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size deve ser maior que zero.")
+
+        checkpoint = None if options['dry_run'] else options['checkpoint']
+        stats = load_checkpoint(checkpoint, path)
+        if stats:
+            self.stdout.write(f"Retomando após a linha {stats.rows} ({stats.created} criados, {stats.updated} atualizados).")
+
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            create_categories=options['create_categories'],
+        )
+
+        def on_batch(stats):
+            if checkpoint:
+                save_checkpoint(checkpoint, path, stats)
+            self.stdout.write(
+                f"linha {stats.rows}: {stats.created} criados, {stats.updated} atualizados, "
+                f"{stats.invalid} inválidos ({stats.rate:,.0f} linhas/s)"
+            )
+
+        try:
+            stats = importer.run(read_rows(path, options['format']), stats, on_batch)
+        except OSError as e:
+            raise CommandError(f"Não foi possível ler {path}: {e}")
+
+        for number, error in stats.errors:
+            self.stderr.write(f"Linha {number}: {error}")
+        if stats.omitted_errors:
+            self.stderr.write(f"... e mais {stats.omitted_errors} linha(s) inválida(s).")
+
+        prefix = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{stats.rows} linha(s) lidas: {stats.created} produto(s) criado(s), "
+            f"{stats.updated} atualizado(s), {stats.invalid} inválida(s) ({stats.rate:,.0f} linhas/s)."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.search import get_search_backend, product_index_queryset
+
+
+class Command(BaseCommand):
+    help = "Recria o índice de busca textual dos produtos"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild(product_index_queryset(Product.objects.all()))
+        total = Product.objects.filter(is_active=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice de busca ({backend.__class__.__name__}) recriado com {total} produto(s)."
+        ))
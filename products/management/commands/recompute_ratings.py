@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from products.ratings import recompute_rating_summaries
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o resumo de avaliações (contagem, soma, média e histograma) dos produtos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product', type=int, action='append', dest='product_ids',
+            help="ID de um produto específico (pode ser repetido)"
+        )
+
+    def handle(self, *args, **options):
+        total = recompute_rating_summaries(options['product_ids'])
+        self.stdout.write(self.style.SUCCESS(f"{total} resumo(s) de avaliações recalculado(s)."))
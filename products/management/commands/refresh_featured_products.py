@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from products.autocomplete import record_autocomplete_change
+from products.featured import refresh_featured_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula o ranking de produtos em destaque (avaliações, vendas recentes e estoque). "
+        "Deve ser agendado periodicamente, por exemplo via cron a cada hora."
+    )
+
+    def handle(self, *args, **options):
+        total = refresh_featured_products()
+        # A popularidade do autocomplete usa as mesmas vendas recentes
+        record_autocomplete_change()
+        self.stdout.write(self.style.SUCCESS(f"{total} produto(s) em destaque gravado(s)."))
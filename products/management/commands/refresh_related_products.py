@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from products.cache import bump_catalog_version
+from products.related import refresh_related_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Atualiza os produtos \"comprados juntos\" a partir dos pedidos pagos. Por padrão só "
+        "conta os pedidos desde a última execução; agende também uma execução --full "
+        "periódica (por exemplo semanal) para refletir cancelamentos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recalcula a partir de todos os pedidos")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        run, written = refresh_related_products(full=options['full'])
+        if run is None:
+            self.stdout.write("Nenhum pedido novo para contar.")
+            return
+
+        # A resposta de /api/products/<slug>/related/ fica no cache do catálogo
+        bump_catalog_version()
+        kind = "completo" if run.full else "incremental"
+        self.stdout.write(self.style.SUCCESS(
+            f"Cálculo {kind}: {run.processed_orders} pedido(s) processado(s), "
+            f"{run.skipped_orders} ignorado(s), {written} vizinho(s) gravado(s) "
+            f"em {time.perf_counter() - started:.1f}s."
+        ))
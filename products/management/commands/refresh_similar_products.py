@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from products.cache import bump_catalog_version
+from products.similar import refresh_similar_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Atualiza os produtos similares por conteúdo (TF-IDF de nome e descrição, categoria, "
+        "preço e peso). Por padrão recalcula só o que mudou desde a última execução; "
+        "agende também uma execução --full periódica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recalcula as listas de todos os produtos")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        run = refresh_similar_products(full=options['full'])
+        if run.recomputed:
+            # A resposta de /api/products/<slug>/similar/ fica no cache do catálogo
+            bump_catalog_version()
+        kind = "completo" if run.full else "incremental"
+        self.stdout.write(self.style.SUCCESS(
+            f"Cálculo {kind}: {run.recomputed} lista(s) recalculada(s) de {run.products_count} "
+            f"produto(s) em {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_rating_summaries(apps, schema_editor):
+    ProductReview = apps.get_model('products', 'ProductReview')
+    ProductRatingSummary = apps.get_model('products', 'ProductRatingSummary')
+
+    summaries = {}
+    rows = (
+        ProductReview.objects.filter(is_approved=True)
+        .values('product_id', 'rating')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        summary = summaries.setdefault(row['product_id'], ProductRatingSummary(product_id=row['product_id']))
+        summary.reviews_count += row['total']
+        summary.rating_sum += row['rating'] * row['total']
+        setattr(summary, f"rating_{row['rating']}", row['total'])
+
+    for summary in summaries.values():
+        summary.average_rating = summary.rating_sum / summary.reviews_count
+
+    ProductRatingSummary.objects.bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_reviews_enabled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRatingSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='products.product')),
+                ('reviews_count', models.PositiveIntegerField(default=0, verbose_name='Número de avaliações')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='Soma das notas')),
+                ('average_rating', models.FloatField(blank=True, null=True, verbose_name='Avaliação média')),
+                ('rating_1', models.PositiveIntegerField(default=0, verbose_name='Avaliações 1 estrela')),
+                ('rating_2', models.PositiveIntegerField(default=0, verbose_name='Avaliações 2 estrelas')),
+                ('rating_3', models.PositiveIntegerField(default=0, verbose_name='Avaliações 3 estrelas')),
+                ('rating_4', models.PositiveIntegerField(default=0, verbose_name='Avaliações 4 estrelas')),
+                ('rating_5', models.PositiveIntegerField(default=0, verbose_name='Avaliações 5 estrelas')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Resumo de avaliações',
+                'verbose_name_plural': 'Resumos de avaliações',
+            },
+        ),
+        migrations.RunPython(populate_rating_summaries, migrations.RunPython.noop),
+    ]
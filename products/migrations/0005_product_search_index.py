@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from products.search import get_search_backend, product_index_queryset
+
+
+def create_search_index(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    backend = get_search_backend(schema_editor.connection.vendor)
+    with schema_editor.connection.cursor() as cursor:
+        backend.install(cursor)
+    backend.rebuild(product_index_queryset(Product.objects.all()))
+
+
+def drop_search_index(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection.vendor)
+    table = getattr(backend, 'table', None)
+    if table:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
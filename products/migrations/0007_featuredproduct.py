@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeaturedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(unique=True, verbose_name='Posição')),
+                ('score', models.FloatField(verbose_name='Pontuação')),
+                ('computed_at', models.DateTimeField(auto_now_add=True, verbose_name='Calculado em')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='featured_entry', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Produto em destaque',
+                'verbose_name_plural': 'Produtos em destaque',
+                'ordering': ['rank'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_featuredproduct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Versões da imagem'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Versões da imagem'),
+        ),
+    ]
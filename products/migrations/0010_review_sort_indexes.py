@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['product', '-rating', '-created_at', '-id'], name='review_approved_high_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['product', 'rating', '-created_at', '-id'], name='review_approved_low_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_review_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProductsRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_until', models.DateTimeField(verbose_name='Pedidos contados até')),
+                ('total_orders', models.PositiveIntegerField(verbose_name='Total de pedidos contados')),
+                ('processed_orders', models.PositiveIntegerField(verbose_name='Pedidos processados na execução')),
+                ('skipped_orders', models.PositiveIntegerField(default=0, verbose_name='Pedidos ignorados (acima de MAX_BASKET)')),
+                ('full', models.BooleanField(verbose_name='Reconstrução completa')),
+                ('computed_at', models.DateTimeField(auto_now_add=True, verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Cálculo de produtos comprados juntos',
+                'verbose_name_plural': 'Cálculos de produtos comprados juntos',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(verbose_name='Pedidos')),
+                ('product_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+                ('product_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Contagem de pedidos do par',
+                'verbose_name_plural': 'Contagens de pedidos dos pares',
+                'constraints': [models.UniqueConstraint(fields=('product_a', 'product_b'), name='product_pair_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Posição')),
+                ('score', models.FloatField(verbose_name='Pontuação')),
+                ('orders', models.PositiveIntegerField(verbose_name='Pedidos em comum')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_products', to='products.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_from', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Produto comprado junto',
+                'verbose_name_plural': 'Produtos comprados juntos',
+                'ordering': ['product', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='related_product_rank_unique')],
+            },
+        ),
+    ]
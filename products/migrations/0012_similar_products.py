@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_related_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProductsRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Iniciado em')),
+                ('full', models.BooleanField(verbose_name='Reconstrução completa')),
+                ('products_count', models.PositiveIntegerField(verbose_name='Produtos no índice')),
+                ('recomputed', models.PositiveIntegerField(verbose_name='Listas recalculadas')),
+                ('computed_at', models.DateTimeField(auto_now_add=True, verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Cálculo de produtos similares',
+                'verbose_name_plural': 'Cálculos de produtos similares',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Posição')),
+                ('score', models.FloatField(verbose_name='Similaridade')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_products', to='products.product')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_from', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Produto similar',
+                'verbose_name_plural': 'Produtos similares',
+                'ordering': ['product', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='similar_product_rank_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_similar_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSimilarList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.PositiveIntegerField(verbose_name='Produto')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Lista de similares pendente',
+                'verbose_name_plural': 'Listas de similares pendentes',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarTerm',
+            fields=[
+                ('term', models.TextField(primary_key=True, serialize=False, verbose_name='Termo')),
+                ('documents', models.PositiveIntegerField(verbose_name='Produtos com o termo')),
+            ],
+            options={
+                'verbose_name': 'Termo de similaridade',
+                'verbose_name_plural': 'Termos de similaridade',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarProductTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.TextField(verbose_name='Termo')),
+                ('weight', models.FloatField(verbose_name='Peso')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Termo do produto',
+                'verbose_name_plural': 'Termos dos produtos',
+                'indexes': [models.Index(fields=['term', '-weight'], name='similar_term_weight_idx')],
+            },
+        ),
+    ]
@@ -11,6 +11,7 @@ class Category(models.Model):
     slug = models.SlugField(_("Slug"), max_length=120, unique=True)
     description = models.TextField(_("Descrição"), blank=True)
     image = models.ImageField(_("Imagem"), upload_to='categories/', blank=True, null=True)
+    image_derivatives = models.JSONField(_("Versões da imagem"), default=dict, blank=True, editable=False)
     is_active = models.BooleanField(_("Ativo"), default=True)
     
     class Meta:
@@ -54,6 +55,25 @@ class Product(models.Model):
         verbose_name = _("Produto")
         verbose_name_plural = _("Produtos")
         ordering = ['-created_at']
+        # Índices compostos para a paginação por cursor (ordenação + ID como desempate)
+        indexes = [
+            # Índices parciais (WHERE is_active): no SQLite o filtro is_active=True vira
+            # `WHERE "is_active"` e não casa com um índice que começa pela coluna booleana
+            models.Index(fields=['-created_at', '-id'], name='product_active_created_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['price', 'id'], name='product_active_price_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['name', 'id'], name='product_active_name_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['stock', 'id'], name='product_active_stock_idx', condition=models.Q(is_active=True)),
+            # Listagem filtrada por categoria (category_id__in) na ordenação padrão
+            models.Index(
+                fields=['category', '-created_at', '-id'], name='product_cat_active_created_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # Índice parcial: só os poucos produtos ativos de emergência
+            models.Index(
+                fields=['-created_at', '-id'], name='product_emergency_idx',
+                condition=models.Q(is_active=True, is_emergency=True),
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -68,6 +88,7 @@ class ProductImage(models.Model):
     image = models.ImageField(_("Imagem"), upload_to='products/')
     alt_text = models.CharField(_("Texto alternativo"), max_length=200, blank=True)
     is_main = models.BooleanField(_("Imagem principal"), default=False)
+    image_derivatives = models.JSONField(_("Versões da imagem"), default=dict, blank=True, editable=False)
     
     class Meta:
         verbose_name = _("Imagem do produto")
@@ -95,6 +116,210 @@ class ProductReview(models.Model):
         ordering = ['-created_at']
         # Garantir que um usuário só possa avaliar um produto uma vez
         unique_together = ('product', 'user')
+        indexes = [
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='review_user_created_idx'),
+            # Avaliações aprovadas de um produto (listagem pública, últimas N do detalhe)
+            models.Index(
+                fields=['product', '-created_at', '-id'], name='review_approved_created_idx',
+                condition=models.Q(is_approved=True),
+            ),
+            # Ordenações ?sort=highest e ?sort=lowest das listagens de avaliações
+            models.Index(
+                fields=['product', '-rating', '-created_at', '-id'], name='review_approved_high_idx',
+                condition=models.Q(is_approved=True),
+            ),
+            models.Index(
+                fields=['product', 'rating', '-created_at', '-id'], name='review_approved_low_idx',
+                condition=models.Q(is_approved=True),
+            ),
+        ]
     
     def __str__(self):
-        return f"Avaliação de {self.user.username} para {self.product.name}"
\ No newline at end of file
+        return f"Avaliação de {self.user.username} para {self.product.name}"
+
+class ProductRatingSummary(models.Model):
+    """Resumo desnormalizado das avaliações aprovadas de um produto"""
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary'
+    )
+    reviews_count = models.PositiveIntegerField(_("Número de avaliações"), default=0)
+    rating_sum = models.PositiveIntegerField(_("Soma das notas"), default=0)
+    average_rating = models.FloatField(_("Avaliação média"), blank=True, null=True)
+    rating_1 = models.PositiveIntegerField(_("Avaliações 1 estrela"), default=0)
+    rating_2 = models.PositiveIntegerField(_("Avaliações 2 estrelas"), default=0)
+    rating_3 = models.PositiveIntegerField(_("Avaliações 3 estrelas"), default=0)
+    rating_4 = models.PositiveIntegerField(_("Avaliações 4 estrelas"), default=0)
+    rating_5 = models.PositiveIntegerField(_("Avaliações 5 estrelas"), default=0)
+    updated_at = models.DateTimeField(_("Atualizado em"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Resumo de avaliações")
+        verbose_name_plural = _("Resumos de avaliações")
+
+    def __str__(self):
+        return f"Resumo de avaliações de {self.product.name}"
+
+    @property
+    def histogram(self):
+        """Distribuição das avaliações aprovadas por número de estrelas"""
+        return {star: getattr(self, f'rating_{star}') for star in range(1, 6)}
+
+
+class FeaturedProduct(models.Model):
+    """Ranking pré-calculado de produtos em destaque (ver products/featured.py)"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='featured_entry')
+    rank = models.PositiveIntegerField(_("Posição"), unique=True)
+    score = models.FloatField(_("Pontuação"))
+    computed_at = models.DateTimeField(_("Calculado em"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Produto em destaque")
+        verbose_name_plural = _("Produtos em destaque")
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.product.name}"
+
+
+class ProductPairCount(models.Model):
+    """
+    Número de pedidos pagos que contêm os dois produtos (product_a < product_b).
+    A diagonal (product_a == product_b) guarda o total de pedidos de cada produto.
+    Mantida por refresh_related_products (ver products/related.py).
+    """
+    product_a = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    product_b = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(_("Pedidos"))
+
+    class Meta:
+        verbose_name = _("Contagem de pedidos do par")
+        verbose_name_plural = _("Contagens de pedidos dos pares")
+        constraints = [
+            models.UniqueConstraint(fields=['product_a', 'product_b'], name='product_pair_unique'),
+        ]
+
+
+class RelatedProduct(models.Model):
+    """Vizinhos "comprados juntos" de um produto, pré-calculados a partir de ProductPairCount"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_products')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_from')
+    rank = models.PositiveSmallIntegerField(_("Posição"))
+    score = models.FloatField(_("Pontuação"))
+    orders = models.PositiveIntegerField(_("Pedidos em comum"))
+
+    class Meta:
+        verbose_name = _("Produto comprado junto")
+        verbose_name_plural = _("Produtos comprados juntos")
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='related_product_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.related.name} (com {self.product.name})"
+
+
+class RelatedProductsRun(models.Model):
+    """Execução de refresh_related_products; a última define de onde a próxima continua"""
+    orders_until = models.DateTimeField(_("Pedidos contados até"))
+    total_orders = models.PositiveIntegerField(_("Total de pedidos contados"))
+    processed_orders = models.PositiveIntegerField(_("Pedidos processados na execução"))
+    skipped_orders = models.PositiveIntegerField(_("Pedidos ignorados (acima de MAX_BASKET)"), default=0)
+    full = models.BooleanField(_("Reconstrução completa"))
+    computed_at = models.DateTimeField(_("Calculado em"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Cálculo de produtos comprados juntos")
+        verbose_name_plural = _("Cálculos de produtos comprados juntos")
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{self.computed_at:%Y-%m-%d %H:%M} ({self.processed_orders} pedidos)"
+
+
+class SimilarProduct(models.Model):
+    """Produtos parecidos por conteúdo (nome, descrição, categoria, preço, peso); ver products/similar.py"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_products')
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_from')
+    rank = models.PositiveSmallIntegerField(_("Posição"))
+    score = models.FloatField(_("Similaridade"))
+
+    class Meta:
+        verbose_name = _("Produto similar")
+        verbose_name_plural = _("Produtos similares")
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='similar_product_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.similar.name} (parecido com {self.product.name})"
+
+
+class SimilarProductsRun(models.Model):
+    """Execução de refresh_similar_products; produtos alterados depois de started_at entram na próxima"""
+    started_at = models.DateTimeField(_("Iniciado em"))
+    full = models.BooleanField(_("Reconstrução completa"))
+    products_count = models.PositiveIntegerField(_("Produtos no índice"))
+    recomputed = models.PositiveIntegerField(_("Listas recalculadas"))
+    computed_at = models.DateTimeField(_("Calculado em"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Cálculo de produtos similares")
+        verbose_name_plural = _("Cálculos de produtos similares")
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{self.computed_at:%Y-%m-%d %H:%M} ({self.recomputed} listas)"
+
+
+class SimilarTerm(models.Model):
+    """Produtos com o termo no último cálculo completo; o IDF dos cálculos incrementais sai daqui"""
+    term = models.TextField(_("Termo"), primary_key=True)
+    documents = models.PositiveIntegerField(_("Produtos com o termo"))
+
+    class Meta:
+        verbose_name = _("Termo de similaridade")
+        verbose_name_plural = _("Termos de similaridade")
+
+    def __str__(self):
+        return f"{self.term} ({self.documents})"
+
+
+class SimilarProductTerm(models.Model):
+    """
+    Peso de um termo no vetor TF-IDF normalizado do produto. A tabela guarda o
+    índice entre execuções e serve de índice invertido (termo -> maiores pesos).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    term = models.TextField(_("Termo"))
+    weight = models.FloatField(_("Peso"))
+
+    class Meta:
+        verbose_name = _("Termo do produto")
+        verbose_name_plural = _("Termos dos produtos")
+        indexes = [
+            models.Index(fields=['term', '-weight'], name='similar_term_weight_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term}={self.weight:.3f} ({self.product_id})"
+
+
+class PendingSimilarList(models.Model):
+    """
+    Lista de similares a recalcular no próximo cálculo incremental: a de um
+    produto que continha outro excluído (as linhas somem em cascata, sem
+    alterar o updated_at de ninguém). Sem FK: o produto pode ser excluído na
+    mesma operação.
+    """
+    product_id = models.PositiveIntegerField(_("Produto"))
+    created_at = models.DateTimeField(_("Criado em"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Lista de similares pendente")
+        verbose_name_plural = _("Listas de similares pendentes")
+
+    def __str__(self):
+        return f"Produto {self.product_id}"
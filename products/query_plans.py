@@ -0,0 +1,36 @@
+# products/query_plans.py
+#
+# Consultas quentes do catálogo, verificadas pelo teste de planos (products/tests.py).
+# Cada entrada faz a requisição real; as consultas executadas pela view, pelos
+# filtros e pela paginação passam por EXPLAIN (ver backend/query_plans.py).
+from backend.query_plans import QueryPlan, api_get
+
+QUERY_PLANS = [
+    QueryPlan('produtos: listagem', api_get('/api/products/', pages=2), index_scans=['product_active_created_idx']),
+    QueryPlan('produtos: listagem por categoria', api_get(
+        '/api/products/', {'category': '{category_slug}'}, pages=2,
+    )),
+    QueryPlan('produtos: ordenação por preço', api_get(
+        '/api/products/', {'ordering': 'price', 'min_price': 10}, pages=2,
+    )),
+    QueryPlan('produtos: ordenação por nome', api_get(
+        '/api/products/', {'ordering': 'name'}, pages=2,
+    ), index_scans=['product_active_name_idx']),
+    QueryPlan('produtos: em estoque', api_get(
+        '/api/products/', {'ordering': 'stock', 'in_stock': 'true'}, pages=2,
+    )),
+    QueryPlan('produtos: busca', api_get('/api/products/', {'q': 'cabo', 'category': '{category_slug}'})),
+    QueryPlan('produtos: facetas da busca', api_get('/api/products/facets/', {'q': 'cabo'})),
+    QueryPlan('produtos: emergência', api_get('/api/products/emergency/'), index_scans=['product_emergency_idx']),
+    QueryPlan('produtos: detalhe por slug', api_get('/api/products/{product_slug}/')),
+    QueryPlan('avaliações: do produto', api_get('/api/products/{product_slug}/reviews/', pages=2)),
+    QueryPlan('avaliações: melhores do produto', api_get(
+        '/api/products/{product_slug}/reviews/', {'sort': 'highest'}, pages=2,
+    )),
+    QueryPlan('avaliações: piores do produto', api_get(
+        '/api/products/{product_slug}/reviews/', {'sort': 'lowest'}, pages=2,
+    )),
+    QueryPlan('avaliações: do usuário', api_get('/api/products/reviews/my_reviews/', user='user', pages=2)),
+    QueryPlan('relacionados: comprados juntos', api_get('/api/products/{product_slug}/related/')),
+    QueryPlan('similares: por conteúdo', api_get('/api/products/{product_slug}/similar/')),
+]
@@ -0,0 +1,138 @@
+# products/ratings.py
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Value
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+from .cache import bump_catalog_version, bump_emergency_version, invalidate_emergency_products
+from .models import ProductRatingSummary, ProductReview
+
+RATING_VALUES = range(1, 6)
+
+# Ordenações aceitas pelas listagens de avaliações (?sort=), com desempate
+# pela data e pelo ID para a paginação por cursor
+REVIEW_SORTS = {
+    'newest': ('-created_at', '-id'),
+    'highest': ('-rating', '-created_at', '-id'),
+    'lowest': ('rating', '-created_at', '-id'),
+}
+DEFAULT_REVIEW_SORT = 'newest'
+
+
+def get_rating_summary(product):
+    """
+    Retorna o resumo de avaliações do produto ou None se ainda não existir.
+    Usa o objeto carregado via select_related('rating_summary') quando disponível.
+    """
+    try:
+        return product.rating_summary
+    except ProductRatingSummary.DoesNotExist:
+        return None
+
+
+def rating_summary_data(summary):
+    """
+    Bloco de resumo das listagens de avaliações: total, média e histograma de
+    1 a 5 estrelas das avaliações aprovadas, lidos do resumo desnormalizado
+    (custo constante, qualquer que seja o número de avaliações)
+    """
+    if summary is None:
+        return {'reviews_count': 0, 'average_rating': None, 'histogram': {star: 0 for star in RATING_VALUES}}
+    average = summary.average_rating
+    return {
+        'reviews_count': summary.reviews_count,
+        'average_rating': round(average, 1) if average is not None else None,
+        'histogram': summary.histogram,
+    }
+
+
+def apply_rating_deltas(product_id, deltas):
+    """
+    Aplica variações incrementais ao resumo de um produto.
+
+    `deltas` é um dicionário {nota: variação}, por exemplo {5: 1} ao aprovar
+    uma avaliação de 5 estrelas ou {3: -1} ao remover uma de 3 estrelas.
+    Tudo é feito em um único UPDATE com expressões F(), sem ler as avaliações.
+    """
+    deltas = {rating: delta for rating, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    count_delta = sum(deltas.values())
+    sum_delta = sum(rating * delta for rating, delta in deltas.items())
+
+    new_count = F('reviews_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    updates = {
+        'reviews_count': new_count,
+        'rating_sum': new_sum,
+        # No UPDATE as colunas referenciadas ainda têm os valores antigos,
+        # então a média é calculada sobre os valores já somados ao delta
+        'average_rating': Cast(new_sum, FloatField()) / NullIf(Cast(new_count, FloatField()), Value(0.0)),
+        'updated_at': timezone.now(),
+    }
+    for rating, delta in deltas.items():
+        field = f'rating_{rating}'
+        updates[field] = F(field) + delta
+
+    with transaction.atomic():
+        updated = ProductRatingSummary.objects.filter(product_id=product_id).update(**updates)
+        if not updated and count_delta > 0:
+            # Primeira avaliação aprovada do produto: cria o resumo e aplica o delta
+            ProductRatingSummary.objects.get_or_create(product_id=product_id)
+            ProductRatingSummary.objects.filter(product_id=product_id).update(**updates)
+
+
+def apply_review_changes(reviews, sign):
+    """
+    Aplica a entrada (sign=1) ou saída (sign=-1) de várias avaliações no resumo.
+    `reviews` é um iterável de tuplas (product_id, rating), como as geradas por
+    values_list('product_id', 'rating') nas ações em massa do admin.
+    """
+    per_product = defaultdict(lambda: defaultdict(int))
+    for product_id, rating in reviews:
+        per_product[product_id][rating] += sign
+
+    for product_id, deltas in per_product.items():
+        apply_rating_deltas(product_id, deltas)
+
+
+def recompute_rating_summaries(product_ids=None):
+    """
+    Reconstrói os resumos a partir das avaliações aprovadas e, depois do
+    commit, invalida as respostas do catálogo e de emergência que os exibem.
+    Retorna o número de resumos gravados.
+    """
+    reviews = ProductReview.objects.filter(is_approved=True)
+    summaries = ProductRatingSummary.objects.all()
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+        summaries = summaries.filter(product_id__in=product_ids)
+
+    counts = defaultdict(dict)
+    rows = reviews.values('product_id', 'rating').annotate(total=Count('id')).order_by()
+    for row in rows:
+        counts[row['product_id']][row['rating']] = row['total']
+
+    objs = []
+    for product_id, histogram in counts.items():
+        reviews_count = sum(histogram.values())
+        rating_sum = sum(rating * total for rating, total in histogram.items())
+        objs.append(ProductRatingSummary(
+            product_id=product_id,
+            reviews_count=reviews_count,
+            rating_sum=rating_sum,
+            average_rating=rating_sum / reviews_count,
+            **{f'rating_{rating}': histogram.get(rating, 0) for rating in RATING_VALUES}
+        ))
+
+    with transaction.atomic():
+        summaries.delete()
+        ProductRatingSummary.objects.bulk_create(objs, batch_size=500)
+        transaction.on_commit(bump_catalog_version)
+        if product_ids is None:
+            transaction.on_commit(bump_emergency_version)
+        else:
+            invalidate_emergency_products(pk__in=product_ids)
+
+    return len(objs)
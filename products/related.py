@@ -0,0 +1,230 @@
+# products/related.py
+import heapq
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .featured import PAID_ORDER_STATUSES
+from .models import Product, ProductPairCount, RelatedProduct, RelatedProductsRun
+
+DEFAULT_RELATED = {
+    # Vizinhos guardados por produto
+    'TOP_K': 10,
+    # 'jaccard' (pedidos em comum / pedidos com qualquer um dos dois) ou 'lift'
+    'METRIC': 'jaccard',
+    # Pares vistos em menos pedidos que isso não viram recomendação
+    'MIN_ORDERS': 2,
+    # Pedidos com mais produtos distintos (compras de atacado) são ignorados
+    'MAX_BASKET': 50,
+    # Pedidos mais novos que isso ainda podem ser pagos ou cancelados e ficam para a próxima execução
+    'SETTLE_HOURS': 48,
+}
+CHUNK_SIZE = 20000
+BATCH_SIZE = 5000
+
+
+def get_related_settings():
+    config = dict(DEFAULT_RELATED)
+    config.update(getattr(settings, 'RELATED_PRODUCTS', {}))
+    return config
+
+
+def jaccard(together, orders_a, orders_b, total_orders):
+    return together / (orders_a + orders_b - together)
+
+
+def lift(together, orders_a, orders_b, total_orders):
+    return together * total_orders / (orders_a * orders_b)
+
+
+METRICS = {'jaccard': jaccard, 'lift': lift}
+
+
+def order_baskets(since, until):
+    """
+    Conjuntos de produtos dos pedidos pagos criados em [since, until), lidos em
+    blocos de (pedido, produto) ordenados por pedido, sem carregar a tabela inteira
+    """
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.filter(
+        product__isnull=False,
+        order__status__in=PAID_ORDER_STATUSES,
+        order__created_at__lt=until,
+    )
+    if since is not None:
+        items = items.filter(order__created_at__gte=since)
+
+    current, basket = None, set()
+    for order_id, product_id in items.order_by('order_id').values_list('order_id', 'product_id').iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        if order_id != current:
+            if basket:
+                yield basket
+            current, basket = order_id, set()
+        basket.add(product_id)
+    if basket:
+        yield basket
+
+
+class PairCounts:
+    """Contagens de co-ocorrência de um conjunto de pedidos: {(a, b): pedidos}, com a <= b"""
+
+    def __init__(self):
+        self.pairs = Counter()
+        self.orders = 0
+        self.skipped = 0
+
+    def add_baskets(self, baskets, max_basket):
+        for basket in baskets:
+            if len(basket) > max_basket:
+                self.skipped += 1
+                continue
+            self.orders += 1
+            products = sorted(basket)
+            # Diagonal: total de pedidos do produto
+            self.pairs.update(zip(products, products))
+            self.pairs.update(combinations(products, 2))
+        return self
+
+    def products(self):
+        return {product_id for pair in self.pairs for product_id in pair}
+
+
+def replace_pair_counts(counts):
+    """Reconstrução completa: substitui a tabela de pares"""
+    with transaction.atomic():
+        ProductPairCount.objects.all().delete()
+        ProductPairCount.objects.bulk_create(
+            (
+                ProductPairCount(product_a_id=a, product_b_id=b, orders=orders)
+                for (a, b), orders in counts.pairs.items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def merge_pair_counts(counts):
+    """Atualização incremental: soma as contagens novas às já gravadas"""
+    by_product = defaultdict(dict)
+    for (a, b), orders in counts.pairs.items():
+        by_product[a][b] = orders
+
+    existing = []
+    product_ids = list(by_product)
+    with transaction.atomic():
+        for start in range(0, len(product_ids), 500):
+            rows = ProductPairCount.objects.filter(product_a__in=product_ids[start:start + 500]).select_for_update()
+            for row in rows.only('id', 'product_a_id', 'product_b_id', 'orders').iterator(chunk_size=CHUNK_SIZE):
+                delta = by_product[row.product_a_id].pop(row.product_b_id, None)
+                if delta:
+                    row.orders += delta
+                    existing.append(row)
+
+        ProductPairCount.objects.bulk_update(existing, ['orders'], batch_size=BATCH_SIZE)
+        ProductPairCount.objects.bulk_create(
+            (
+                ProductPairCount(product_a_id=a, product_b_id=b, orders=orders)
+                for a, neighbors in by_product.items() for b, orders in neighbors.items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def compute_neighbors(config, total_orders, changed=None):
+    """
+    Top-K de cada produto ativo em uma passada pela tabela de pares, com um heap
+    de tamanho K por produto. Com `changed`, retorna só os produtos cujas listas
+    podem ter mudado: os alterados e todos os que formam par com eles.
+    """
+    metric = METRICS[config['METRIC']]
+    top_k = config['TOP_K']
+    active = set(Product.objects.filter(is_active=True).values_list('id', flat=True).order_by())
+    totals = dict(
+        ProductPairCount.objects.filter(product_a=F('product_b')).values_list('product_a', 'orders').order_by()
+    )
+
+    heaps = defaultdict(list)
+    affected = set(changed) if changed is not None else None
+    pairs = ProductPairCount.objects.filter(
+        product_a__lt=F('product_b'), orders__gte=config['MIN_ORDERS']
+    ).values_list('product_a', 'product_b', 'orders').order_by()
+    for a, b, together in pairs.iterator(chunk_size=CHUNK_SIZE):
+        if a not in active or b not in active:
+            continue
+        if affected is not None and (a in changed or b in changed):
+            affected.add(a)
+            affected.add(b)
+        score = metric(together, totals[a], totals[b], total_orders)
+        for product_id, neighbor in ((a, b), (b, a)):
+            heap = heaps[product_id]
+            entry = (score, together, -neighbor)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    if affected is not None:
+        heaps = {product_id: heaps.get(product_id, []) for product_id in affected}
+    return heaps
+
+
+def write_neighbors(heaps, full):
+    """Grava as listas calculadas; sem `full`, só as dos produtos de `heaps`"""
+    entries = [
+        RelatedProduct(product_id=product_id, related_id=-neighbor, rank=rank, score=score, orders=together)
+        for product_id, heap in heaps.items()
+        for rank, (score, together, neighbor) in enumerate(sorted(heap, reverse=True), start=1)
+    ]
+    with transaction.atomic():
+        if full:
+            RelatedProduct.objects.all().delete()
+        else:
+            product_ids = list(heaps)
+            for start in range(0, len(product_ids), 500):
+                RelatedProduct.objects.filter(product_id__in=product_ids[start:start + 500]).delete()
+        RelatedProduct.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+    return len(entries)
+
+
+def refresh_related_products(full=False, now=None):
+    """
+    Atualiza os produtos "comprados juntos".
+
+    Sem `full`, conta só os pedidos criados desde a última execução e soma as
+    contagens às já gravadas; as listas são recalculadas para os produtos
+    afetados e seus pares. Pedidos são contados depois de SETTLE_HOURS, e
+    mudanças posteriores de status (cancelamentos) só entram numa reconstrução
+    completa, que deve ser agendada com menos frequência.
+
+    Retorna a execução gravada (RelatedProductsRun) e o número de linhas de
+    vizinhos escritas, ou (None, 0) se não houver pedidos novos para contar.
+    """
+    config = get_related_settings()
+    until = (now or timezone.now()) - timedelta(hours=config['SETTLE_HOURS'])
+    last = None if full else RelatedProductsRun.objects.first()
+    full = last is None
+    since = None if full else last.orders_until
+    if since is not None and since >= until:
+        return None, 0
+
+    counts = PairCounts().add_baskets(order_baskets(since, until), config['MAX_BASKET'])
+    total_orders = counts.orders + (0 if full else last.total_orders)
+
+    if full:
+        replace_pair_counts(counts)
+        heaps = compute_neighbors(config, total_orders)
+    else:
+        merge_pair_counts(counts)
+        heaps = compute_neighbors(config, total_orders, changed=counts.products())
+    written = write_neighbors(heaps, full)
+
+    run = RelatedProductsRun.objects.create(
+        orders_until=until, total_orders=total_orders, processed_orders=counts.orders,
+        skipped_orders=counts.skipped, full=full,
+    )
+    return run, written
@@ -0,0 +1,290 @@
+# products/search.py
+import re
+import unicodedata
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Pesos de relevância por coluna (nome pesa mais que descrição)
+SEARCH_WEIGHTS = {'name': 10.0, 'sku': 8.0, 'category': 4.0, 'description': 1.0}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Regras de redução de plural (texto já sem acentos)
+_PLURAL_RULES = (
+    ('ns', 'm'), ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'),
+    ('eis', 'el'), ('ois', 'ol'), ('res', 'r'), ('les', 'l'), ('s', ''),
+)
+_DIMINUTIVE_SUFFIXES = ('zinho', 'zinha', 'inho', 'inha')
+
+
+def fold_accents(text):
+    """Remove acentos e converte para minúsculas ("Emergência" -> "emergencia")"""
+    text = text or ''
+    if text.isascii():
+        return text.lower()
+    normalized = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in normalized if not unicodedata.combining(c)).lower()
+
+
+def stem_token(token):
+    """
+    Stemmer leve para português: reduz plural, diminutivo e a vogal final,
+    de forma que "lâmpadas", "lampada" e "lâmpadinha" gerem o mesmo radical.
+    Tokens curtos ou com dígitos (SKUs, medidas) são mantidos como estão.
+    """
+    if len(token) < 4 or any(c.isdigit() for c in token):
+        return token
+
+    for suffix, replacement in _PLURAL_RULES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)] + replacement
+            break
+
+    for suffix in _DIMINUTIVE_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+
+    if len(token) > 4 and token[-1] in 'aeo':
+        token = token[:-1]
+    return token
+
+
+def tokenize(text, stem=True):
+    """Normaliza o texto e retorna a lista de termos indexáveis"""
+    tokens = _TOKEN_RE.findall(fold_accents(text))
+    if stem:
+        return [stem_token(token) for token in tokens]
+    return tokens
+
+
+def product_document(product):
+    """Extrai os campos indexados de um dict de values() ou de uma instância de Product"""
+    if isinstance(product, dict):
+        return product
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'sku': product.sku,
+        'description': product.description,
+        'category__name': product.category.name if product.category_id else '',
+    }
+
+
+class BaseSearchBackend:
+    """Interface comum dos backends de busca de produtos"""
+    vendor = None
+    # Tabela do índice e a coluna com o ID do produto
+    table = None
+    key = None
+
+    def install(self, cursor):
+        """Cria as estruturas do índice (chamado pela migração)"""
+
+    def index_products(self, products):
+        """Insere ou atualiza os produtos no índice"""
+
+    def remove_products(self, product_ids):
+        """Remove produtos do índice"""
+
+    def clear(self):
+        """Apaga todo o conteúdo do índice"""
+
+    def match_condition(self, query):
+        """
+        Condição SQL (com parâmetros) sobre a tabela do índice que seleciona os
+        produtos que casam com a busca, ou None se a busca não tiver termos indexáveis
+        """
+        raise NotImplementedError
+
+    def rank_expression(self, query):
+        """Ordenação por relevância, calculada no banco sobre a linha do índice"""
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query):
+        """
+        Restringe o queryset aos resultados da busca, ordenados por relevância.
+        A tabela do índice entra como junção no mesmo SQL dos demais filtros
+        (categoria, preço, ativos), sem limite prévio: nenhum produto que casa
+        com a busca e com os filtros fica de fora, e o banco percorre o índice
+        textual uma única vez.
+        """
+        match = self.match_condition(query)
+        if match is None:
+            return queryset.none()
+        condition, params = match
+        joined = queryset.extra(
+            tables=[self.table], where=[f'{self.table}.{self.key} = "products_product"."id"', condition], params=params,
+        )
+        return joined.order_by(self.rank_expression(query), 'id')
+
+    def rebuild(self, products):
+        """Recria o índice a partir de um iterável de produtos"""
+        with transaction.atomic():
+            self.clear()
+            batch = []
+            for product in products:
+                batch.append(product)
+                if len(batch) >= 1000:
+                    self.index_products(batch)
+                    batch = []
+            if batch:
+                self.index_products(batch)
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Busca com tabela virtual FTS5 e ordenação por bm25()"""
+    vendor = 'sqlite'
+    table = 'products_product_fts'
+    key = 'rowid'
+
+    def install(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+            f"USING fts5(name, sku, category, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def index_products(self, products):
+        rows = []
+        for product in products:
+            doc = product_document(product)
+            rows.append((
+                doc['id'],
+                ' '.join(tokenize(doc['name'])),
+                ' '.join(tokenize(doc['sku'], stem=False)),
+                ' '.join(tokenize(doc['category__name'])),
+                ' '.join(tokenize(doc['description'])),
+            ))
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, name, sku, category, description) VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def fts_query(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        # Cada termo vira um prefixo ("lamp"*) para funcionar durante a digitação
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    def match_condition(self, query):
+        match = self.fts_query(query)
+        if match is None:
+            return None
+        return f"{self.table} MATCH %s", [match]
+
+    def rank_expression(self, query):
+        weights = ', '.join(str(SEARCH_WEIGHTS[col]) for col in ('name', 'sku', 'category', 'description'))
+        return RawSQL(f"bm25({self.table}, {weights})", []).asc()
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Busca com tsvector (configuração 'portuguese'), índice GIN e ts_rank_cd"""
+    vendor = 'postgresql'
+    table = 'products_product_search'
+    key = 'product_id'
+    config = 'portuguese'
+
+    def install(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f"product_id bigint PRIMARY KEY REFERENCES products_product (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin ON {self.table} USING gin (document)"
+        )
+
+    def index_products(self, products):
+        rows = []
+        for product in products:
+            doc = product_document(product)
+            # Os acentos são removidos antes do to_tsvector, que aplica o stemmer português
+            rows.append((
+                doc['id'],
+                ' '.join(tokenize(doc['name'], stem=False)),
+                ' '.join(tokenize(doc['sku'], stem=False)),
+                ' '.join(tokenize(doc['category__name'], stem=False)),
+                ' '.join(tokenize(doc['description'], stem=False)),
+            ))
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (product_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+                f"setweight(to_tsvector('simple', %s), 'A') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'B') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'D')) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows
+            )
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE product_id = ANY(%s)", [list(product_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+    def tsquery(self, query):
+        tokens = tokenize(query, stem=False)
+        if not tokens:
+            return None
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def match_condition(self, query):
+        tsquery = self.tsquery(query)
+        if tsquery is None:
+            return None
+        return f"{self.table}.document @@ to_tsquery('{self.config}', %s)", [tsquery]
+
+    def rank_expression(self, query):
+        return RawSQL(
+            f"ts_rank_cd({self.table}.document, to_tsquery('{self.config}', %s))", [self.tsquery(query)]
+        ).desc()
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Fallback para bancos sem busca textual: icontains em múltiplos campos"""
+
+    def filter_queryset(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(sku__icontains=query) |
+            Q(category__name__icontains=query)
+        )
+
+
+SEARCH_BACKENDS = {
+    backend.vendor: backend for backend in (SQLiteFTSBackend, PostgresSearchBackend)
+}
+
+
+def get_search_backend(vendor=None):
+    """Retorna o backend de busca adequado ao banco de dados em uso"""
+    backend_class = SEARCH_BACKENDS.get(vendor or connection.vendor, DatabaseSearchBackend)
+    return backend_class()
+
+
+def product_index_queryset(queryset):
+    """Colunas necessárias para indexar os produtos ativos do queryset"""
+    return queryset.filter(is_active=True).values(
+        'id', 'name', 'sku', 'description', 'category__name'
+    ).order_by().iterator(chunk_size=2000)
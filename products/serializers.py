@@ -1,24 +1,51 @@
 from rest_framework import serializers
-from django.db.models import Avg
+from backend.serializers import SparseFieldsetsMixin
+from .images import build_srcset
 from .models import Category, Product, ProductImage, ProductReview
+from .ratings import get_rating_summary
+
+
+def image_srcset(serializer, derivatives):
+    """Versões redimensionadas (thumb/card/zoom em WebP e JPEG) com URLs absolutas"""
+    request = serializer.context.get('request')
+    return build_srcset(derivatives, request.build_absolute_uri if request else None)
 
 class ProductImageSerializer(serializers.ModelSerializer):
     """Serializer para imagens de produto"""
+    derivatives = serializers.SerializerMethodField()
+    
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_main']
+        fields = ['id', 'image', 'alt_text', 'is_main', 'derivatives']
+    
+    def get_derivatives(self, obj):
+        return image_srcset(self, obj.image_derivatives)
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer para categorias de produtos"""
     products_count = serializers.SerializerMethodField()
+    image_derivatives = serializers.SerializerMethodField()
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'image', 'is_active', 'products_count']
+        fields = ['id', 'name', 'slug', 'description', 'image', 'image_derivatives', 'is_active', 'products_count']
+    
+    def get_fields(self):
+        """Remove a contagem de produtos quando a view pede ?with_counts=false"""
+        fields = super().get_fields()
+        if not self.context.get('with_counts', True):
+            fields.pop('products_count')
+        return fields
         
     def get_products_count(self, obj):
         """Retorna o número de produtos ativos na categoria"""
+        # A view anota a contagem em uma única consulta agrupada
+        if hasattr(obj, 'active_products_count'):
+            return obj.active_products_count
         return obj.products.filter(is_active=True).count()
+    
+    def get_image_derivatives(self, obj):
+        return image_srcset(self, obj.image_derivatives)
 
 class ProductReviewSerializer(serializers.ModelSerializer):
     """Serializer para avaliações de produtos"""
@@ -47,7 +74,7 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         validated_data['user'] = user
         return super().create(validated_data)
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer completo para produtos"""
     images = ProductImageSerializer(many=True, read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -56,6 +83,7 @@ class ProductSerializer(serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
     average_rating = serializers.SerializerMethodField()
     reviews_count = serializers.SerializerMethodField()
+    latest_reviews = ProductReviewSerializer(many=True, read_only=True)
     
     class Meta:
         model = Product
@@ -63,20 +91,58 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'name', 'slug', 'sku', 'category', 'category_name', 'category_slug',
             'description', 'price', 'discount_price', 'stock', 'availability', 
             'is_emergency', 'weight', 'dimensions', 'is_active', 'images',
-            'average_rating', 'reviews_count'
+            'average_rating', 'reviews_count', 'latest_reviews'
         ]
     
+    def get_fields(self):
+        """As últimas avaliações só entram no detalhe, que as carrega com um Prefetch limitado"""
+        fields = super().get_fields()
+        if not self.context.get('include_latest_reviews'):
+            fields.pop('latest_reviews', None)
+        return fields
+    
     def get_average_rating(self, obj):
-        """Calcula a média das avaliações do produto"""
-        if not obj.reviews.exists():
+        """Retorna a média das avaliações aprovadas a partir do resumo do produto"""
+        summary = get_rating_summary(obj)
+        if not summary or summary.average_rating is None:
             return None
-        
-        avg = obj.reviews.filter(is_approved=True).aggregate(
-            avg_rating=Avg('rating')
-        )['avg_rating']
-        
-        return round(avg, 1) if avg else None
+        return round(summary.average_rating, 1)
     
     def get_reviews_count(self, obj):
         """Retorna o número de avaliações aprovadas do produto"""
-        return obj.reviews.filter(is_approved=True).count()
\ No newline at end of file
+        summary = get_rating_summary(obj)
+        return summary.reviews_count if summary else 0
+
+class ProductListSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Serializer enxuto para a grade de produtos: apenas os campos exibidos nos
+    cards e a imagem principal (carregada via ProductViewSet.get_queryset)
+    """
+    main_image = serializers.SerializerMethodField()
+    main_image_derivatives = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'slug', 'price', 'discount_price', 'stock', 'main_image', 'main_image_derivatives']
+    
+    def _main_image(self, obj):
+        images = getattr(obj, 'main_images', None)
+        if images is None:
+            # Sem o prefetch da view: consulta uma vez e guarda no objeto
+            obj.main_images = images = list(obj.images.order_by('-is_main', 'id')[:1])
+        return images[0] if images else None
+    
+    def get_main_image(self, obj):
+        """Retorna a URL da imagem principal (ou da primeira imagem) do produto"""
+        image = self._main_image(obj)
+        if not image:
+            return None
+        
+        url = image.image.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_main_image_derivatives(self, obj):
+        """Versões redimensionadas da imagem principal, para o srcset dos cards"""
+        image = self._main_image(obj)
+        return image_srcset(self, image.image_derivatives) if image else None
@@ -0,0 +1,182 @@
+# products/signals.py
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from .cache import (
+    bump_catalog_version, bump_emergency_version, invalidate_category_tree, invalidate_emergency_products,
+)
+from .autocomplete import record_autocomplete_change
+from .categories import invalidate_category_resolver
+from .models import Category, PendingSimilarList, Product, ProductImage, ProductReview, SimilarProduct
+from .images import needs_derivatives, schedule_derivatives
+from .ratings import apply_rating_deltas
+from .search import get_search_backend, product_index_queryset
+
+
+@receiver(pre_save, sender=ProductReview)
+def remember_review_state(sender, instance, **kwargs):
+    """Guarda o estado anterior da avaliação para calcular o delta no post_save"""
+    instance._rating_state = None
+    if instance.pk:
+        instance._rating_state = (
+            ProductReview.objects.filter(pk=instance.pk)
+            .values_list('product_id', 'rating', 'is_approved')
+            .first()
+        )
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_summary_on_save(sender, instance, created, **kwargs):
+    """Atualiza o resumo de avaliações quando uma avaliação é criada ou alterada"""
+    old_state = getattr(instance, '_rating_state', None)
+    new_state = (instance.product_id, instance.rating, instance.is_approved)
+    if old_state == new_state:
+        return
+
+    if old_state and old_state[2]:
+        apply_rating_deltas(old_state[0], {old_state[1]: -1})
+    if instance.is_approved:
+        apply_rating_deltas(instance.product_id, {instance.rating: 1})
+
+
+@receiver(post_delete, sender=ProductReview)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    """Remove a avaliação excluída do resumo"""
+    if instance.is_approved:
+        apply_rating_deltas(instance.product_id, {instance.rating: -1})
+
+
+@receiver(post_save, sender=Product)
+def update_search_index_on_product_save(sender, instance, **kwargs):
+    """Mantém o índice de busca sincronizado com o produto"""
+    backend = get_search_backend()
+    if instance.is_active:
+        backend.index_products([instance])
+    else:
+        backend.remove_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def update_search_index_on_product_delete(sender, instance, **kwargs):
+    """Remove o produto excluído do índice de busca"""
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(pre_delete, sender=Product)
+def remember_similar_lists_on_product_delete(sender, instance, **kwargs):
+    """
+    As listas de similares que contêm o produto perdem a linha em cascata;
+    ficam marcadas para o próximo cálculo incremental completá-las
+    """
+    holders = SimilarProduct.objects.filter(similar=instance).values_list('product_id', flat=True)
+    PendingSimilarList.objects.bulk_create(PendingSimilarList(product_id=pk) for pk in holders)
+
+
+@receiver(post_save, sender=Category)
+def update_search_index_on_category_save(sender, instance, created, **kwargs):
+    """Reindexa os produtos da categoria, já que o nome dela faz parte do índice"""
+    if not created:
+        get_search_backend().index_products(product_index_queryset(instance.products.all()))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Qualquer escrita no catálogo invalida as respostas em cache"""
+    # Depois do commit: antes dele, uma requisição concorrente leria as linhas
+    # antigas e as guardaria em cache já com a versão nova
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, **kwargs):
+    """
+    Guarda ativação e categoria anteriores (para decidir se o menu de categorias
+    muda) e se o produto era de emergência (para o snapshot de emergência)
+    """
+    instance._menu_state = None
+    instance._was_emergency = False
+    if instance.pk:
+        state = Product.objects.filter(pk=instance.pk).values_list('is_active', 'category_id', 'is_emergency').first()
+        if state:
+            instance._menu_state = state[:2]
+            instance._was_emergency = state[2]
+
+
+@receiver(post_save, sender=Product)
+def invalidate_category_tree_on_product_save(sender, instance, created, **kwargs):
+    """O menu só muda quando o produto é criado, ativado/desativado ou trocado de categoria"""
+    if getattr(instance, '_menu_state', None) != (instance.is_active, instance.category_id):
+        transaction.on_commit(invalidate_category_tree)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree_on_change(sender, **kwargs):
+    # O menu não tem versão: apagado antes do commit, seria reconstruído com as
+    # linhas antigas e ficaria assim até a próxima alteração
+    transaction.on_commit(invalidate_category_tree)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def generate_image_derivatives(sender, instance, **kwargs):
+    """Agenda thumbnail/card/zoom quando a imagem é enviada ou trocada"""
+    if needs_derivatives(instance.image, instance.image_derivatives):
+        schedule_derivatives(instance)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_emergency_snapshot_on_product_save(sender, instance, **kwargs):
+    """Qualquer alteração (estoque, preço, ativação) em um produto que é ou era de emergência"""
+    if instance.is_emergency or getattr(instance, '_was_emergency', False):
+        transaction.on_commit(bump_emergency_version)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_emergency_snapshot_on_product_delete(sender, instance, **kwargs):
+    if instance.is_emergency:
+        transaction.on_commit(bump_emergency_version)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_emergency_snapshot_on_related_change(sender, instance, **kwargs):
+    """Imagens e avaliações fazem parte da resposta de emergência"""
+    invalidate_emergency_products(pk=instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_emergency_snapshot_on_category_change(sender, **kwargs):
+    transaction.on_commit(bump_emergency_version)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_resolver_on_change(sender, **kwargs):
+    # Depois do commit, para outro processo não recarregar o mapa antigo com a versão nova
+    transaction.on_commit(invalidate_category_resolver)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_autocomplete_on_product_change(sender, instance, **kwargs):
+    """Os processos atualizam no índice de prefixos apenas o produto alterado"""
+    product_id = instance.pk
+    transaction.on_commit(lambda: record_autocomplete_change([product_id]))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def rebuild_autocomplete_on_category_change(sender, **kwargs):
+    transaction.on_commit(record_autocomplete_change)
@@ -0,0 +1,391 @@
+# products/similar.py
+import heapq
+import math
+from collections import Counter
+from functools import lru_cache
+from itertools import islice, repeat
+from operator import mul
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+from .models import (
+    PendingSimilarList, Product, SimilarProduct, SimilarProductTerm, SimilarProductsRun, SimilarTerm,
+)
+from .search import stem_token, tokenize
+
+DEFAULT_SIMILAR = {
+    # Vizinhos guardados por produto
+    'TOP_K': 10,
+    # Similaridade mínima (cosseno) para entrar na lista
+    'MIN_SCORE': 0.05,
+    # Peso de cada campo no vetor do produto
+    'FIELD_WEIGHTS': {'name': 3.0, 'description': 1.0, 'category': 2.0, 'price': 1.0, 'weight': 0.5},
+    # Termos mantidos por produto (os de maior peso)
+    'MAX_TERMS': 32,
+    # Termos do produto usados para buscar candidatos no índice invertido
+    'QUERY_TERMS': 8,
+    # Entradas por termo no índice invertido (as de maior peso); limita o custo dos termos comuns
+    'MAX_POSTINGS': 100,
+    # Candidatos reavaliados com o cosseno completo
+    'CANDIDATES': 40,
+    # Produtos calculados e gravados por bloco
+    'BLOCK_SIZE': 2000,
+}
+
+
+def get_similar_settings():
+    config = dict(DEFAULT_SIMILAR)
+    config.update(getattr(settings, 'SIMILAR_PRODUCTS', {}))
+    return config
+
+
+def _bucket(value):
+    """Faixa logarítmica (meia oitava) de preço ou peso: 10 e 12 caem juntos, 10 e 40 não"""
+    if not value or value <= 0:
+        return None
+    return round(math.log2(float(value)) * 2)
+
+
+# O vocabulário do catálogo é pequeno perto do número de ocorrências
+_stem = lru_cache(maxsize=200000)(stem_token)
+
+
+def product_features(name, description, category_id, price, weight, field_weights):
+    """Frequência ponderada de cada termo do produto, com o campo como prefixo"""
+    features = Counter()
+    for field, text in (('name', name), ('description', description)):
+        for token, count in Counter(map(_stem, tokenize(text, stem=False))).items():
+            if len(token) > 2:
+                features[f'{field[0]}:{token}'] += field_weights[field] * (1 + math.log(count))
+    if category_id:
+        features[f'c:{category_id}'] = field_weights['category']
+    for field, value in (('price', price), ('weight', weight)):
+        bucket = _bucket(value)
+        if bucket is not None:
+            features[f'{field[0]}:{bucket}'] = field_weights[field]
+    return features
+
+
+def weigh(features, idf, max_terms):
+    """Vetor TF-IDF normalizado com os `max_terms` termos mais pesados, do maior para o menor peso"""
+    weighted = sorted(((weight * idf(term), term) for term, weight in features.items()), reverse=True)[:max_terms]
+    norm = math.sqrt(sum(weight * weight for weight, _ in weighted)) or 1.0
+    return {term: weight / norm for weight, term in weighted}
+
+
+def cosine(vector, other):
+    return sum(map(mul, map(vector.get, other, repeat(0.0)), other.values()))
+
+
+def _chunks(items, size=2000):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SimilarityIndex:
+    """
+    Vetores TF-IDF normalizados dos produtos ativos e um índice invertido
+    truncado (termo -> produtos com maior peso no termo).
+
+    Os vizinhos de um produto são encontrados em duas etapas: candidatos que
+    compartilham mais termos entre os QUERY_TERMS mais pesados do produto
+    (contados pelo Counter, em C), e o cosseno completo só para os CANDIDATES
+    melhores. O custo por produto é constante, independente do catálogo.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.ids = []
+        self.positions = {}
+        self.vectors = []
+        self.query_terms = []
+        self.postings = {}
+        self.frequency = Counter()
+
+    def build(self, rows):
+        """`rows`: tuplas (id, name, description, category_id, price, weight)"""
+        field_weights = self.config['FIELD_WEIGHTS']
+        documents = []
+        frequency = Counter()
+        for pk, name, description, category_id, price, weight in rows:
+            features = product_features(name, description, category_id, price, weight, field_weights)
+            self.positions[pk] = len(self.ids)
+            self.ids.append(pk)
+            documents.append(features)
+            frequency.update(features.keys())
+
+        total = len(documents)
+        idf = {term: math.log((1 + total) / (1 + count)) + 1 for term, count in frequency.items()}
+        self.frequency = frequency
+        postings = {}
+        for position, features in enumerate(documents):
+            vector = weigh(features, idf.__getitem__, self.config['MAX_TERMS'])
+            self.vectors.append(vector)
+            self.query_terms.append(tuple(islice(vector, self.config['QUERY_TERMS'])))
+            for term, weight in vector.items():
+                postings.setdefault(term, []).append((weight, position))
+            documents[position] = None
+
+        limit = self.config['MAX_POSTINGS']
+        self.postings = {
+            term: tuple(position for _, position in heapq.nlargest(limit, entries))
+            for term, entries in postings.items()
+        }
+        return self
+
+    def __contains__(self, pk):
+        return pk in self.positions
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scored_candidates(self, pk):
+        """Lista de (cosseno, id) dos candidatos do produto, do mais para o menos parecido"""
+        position = self.positions[pk]
+        shared = Counter()
+        for term in self.query_terms[position]:
+            shared.update(self.postings.get(term, ()))
+        shared.pop(position, None)
+
+        vector = self.vectors[position]
+        scored = []
+        for candidate, _ in shared.most_common(self.config['CANDIDATES']):
+            score = cosine(vector, self.vectors[candidate])
+            if score >= self.config['MIN_SCORE']:
+                scored.append((score, self.ids[candidate]))
+        scored.sort(reverse=True)
+        return scored
+
+    def neighbors(self, pk):
+        return self.scored_candidates(pk)[:self.config['TOP_K']]
+
+    def save(self):
+        """
+        Grava os vetores (SimilarProductTerm) e o número de produtos por termo
+        (SimilarTerm), lidos pelos cálculos incrementais (StoredSimilarityIndex)
+        """
+        table = connection.ops.quote_name(SimilarProductTerm._meta.db_table)
+        insert = f"INSERT INTO {table} (product_id, term, weight) VALUES (%s, %s, %s)"
+        with transaction.atomic():
+            SimilarTerm.objects.all().delete()
+            for block in _chunks(self.frequency.items(), 5000):
+                SimilarTerm.objects.bulk_create(SimilarTerm(term=term, documents=count) for term, count in block)
+            SimilarProductTerm.objects.all().delete()
+            with connection.cursor() as cursor:
+                for block in _chunks(range(len(self.ids))):
+                    cursor.executemany(insert, [
+                        (self.ids[position], term, weight)
+                        for position in block for term, weight in self.vectors[position].items()
+                    ])
+
+
+class StoredSimilarityIndex:
+    """
+    Índice gravado pelo último cálculo completo, lido do banco sob demanda.
+
+    Os vetores ficam em SimilarProductTerm, que também responde às buscas de
+    candidatos pelo índice (termo, -peso); o IDF vem das contagens de
+    SimilarTerm. Um cálculo incremental refaz só os vetores dos produtos
+    alterados (update) e consulta os demais conforme precisa, sem tokenizar o
+    catálogo. Com a mesma interface de SimilarityIndex para affected_products
+    e write_similar.
+    """
+
+    def __init__(self, config, documents):
+        self.config = config
+        # Produtos do cálculo completo em que as contagens de SimilarTerm foram feitas
+        self.documents = documents
+        self.active = set(Product.objects.filter(is_active=True).values_list('id', flat=True).order_by())
+        self.vectors = {}
+        self.postings = {}
+
+    def __contains__(self, pk):
+        return pk in self.active
+
+    def __len__(self):
+        return len(self.active)
+
+    def update(self, changed):
+        """Recalcula e grava os vetores dos produtos de `changed` (os inativos ou excluídos saem do índice)"""
+        field_weights = self.config['FIELD_WEIGHTS']
+        features = {}
+        for block in _chunks(changed):
+            rows = Product.objects.filter(pk__in=block, is_active=True).values_list(
+                'id', 'name', 'description', 'category_id', 'price', 'weight'
+            ).order_by()
+            for pk, name, description, category_id, price, weight in rows:
+                features[pk] = product_features(name, description, category_id, price, weight, field_weights)
+
+        frequency = {}
+        for block in _chunks(set().union(*features.values())):
+            frequency.update(SimilarTerm.objects.filter(term__in=block).values_list('term', 'documents'))
+        total = self.documents
+
+        def idf(term):
+            return math.log((1 + total) / (1 + frequency.get(term, 0))) + 1
+
+        vectors = {pk: weigh(terms, idf, self.config['MAX_TERMS']) for pk, terms in features.items()}
+        with transaction.atomic():
+            for block in _chunks(changed):
+                SimilarProductTerm.objects.filter(product_id__in=block).delete()
+            SimilarProductTerm.objects.bulk_create(
+                (SimilarProductTerm(product_id=pk, term=term, weight=weight)
+                 for pk, vector in vectors.items() for term, weight in vector.items()),
+                batch_size=2000,
+            )
+        for pk in changed:
+            self.vectors.pop(pk, None)
+        self.vectors.update(vectors)
+        self.postings.clear()
+
+    def load_vectors(self, product_ids):
+        missing = [pk for pk in product_ids if pk not in self.vectors]
+        for block in _chunks(missing):
+            for pk in block:
+                self.vectors[pk] = {}
+            rows = SimilarProductTerm.objects.filter(product_id__in=block).values_list(
+                'product_id', 'term', 'weight'
+            ).order_by('product_id', '-weight')
+            for pk, term, weight in rows:
+                self.vectors[pk][term] = weight
+        return self.vectors
+
+    def posting(self, term):
+        if term not in self.postings:
+            self.postings[term] = tuple(
+                SimilarProductTerm.objects.filter(term=term).order_by('-weight').values_list(
+                    'product_id', flat=True
+                )[:self.config['MAX_POSTINGS']]
+            )
+        return self.postings[term]
+
+    def scored_candidates(self, pk):
+        vector = self.load_vectors([pk])[pk]
+        shared = Counter()
+        for term in islice(vector, self.config['QUERY_TERMS']):
+            shared.update(self.posting(term))
+        shared.pop(pk, None)
+
+        candidates = [candidate for candidate, _ in shared.most_common(self.config['CANDIDATES'])]
+        vectors = self.load_vectors(candidates)
+        scored = []
+        for candidate in candidates:
+            score = cosine(vector, vectors[candidate])
+            if score >= self.config['MIN_SCORE']:
+                scored.append((score, candidate))
+        scored.sort(reverse=True)
+        return scored
+
+    def neighbors(self, pk):
+        return self.scored_candidates(pk)[:self.config['TOP_K']]
+
+
+def write_similar(index, product_ids, block_size):
+    """
+    Recalcula e grava as listas dos produtos em blocos (uma transação por
+    bloco). As linhas vão em um executemany direto: com TOP_K linhas por
+    produto, o bulk_create do ORM dominaria o tempo total.
+    """
+    table = connection.ops.quote_name(SimilarProduct._meta.db_table)
+    insert = f"INSERT INTO {table} (product_id, similar_id, rank, score) VALUES (%s, %s, %s, %s)"
+    written = 0
+    for block in _chunks(product_ids, block_size):
+        rows = [
+            (pk, similar_id, rank, score)
+            for pk in block
+            for rank, (score, similar_id) in enumerate(index.neighbors(pk), start=1)
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            SimilarProduct.objects.filter(product_id__in=block).delete()
+            cursor.executemany(insert, rows)
+        written += len(rows)
+    return written
+
+
+def affected_products(index, changed, top_k):
+    """
+    Listas que podem mudar quando os produtos de `changed` mudam: as deles,
+    as que já os contêm e as de candidatos em que o produto alterado passa a
+    superar o último colocado (ou que ainda têm menos de TOP_K vizinhos)
+    """
+    targets = {pk for pk in changed if pk in index}
+    holders = SimilarProduct.objects.filter(similar_id__in=changed).values_list('product_id', flat=True)
+    targets.update(pk for pk in holders.distinct().order_by() if pk in index)
+
+    scores = {}
+    for pk in changed:
+        if pk in index:
+            for score, candidate in index.scored_candidates(pk):
+                scores[candidate] = max(score, scores.get(candidate, 0))
+    candidates = [pk for pk in scores if pk not in targets]
+    for start in range(0, len(candidates), 2000):
+        block = candidates[start:start + 2000]
+        thresholds = {
+            row['product_id']: (row['total'], row['lowest'])
+            for row in SimilarProduct.objects.filter(product_id__in=block).values('product_id').annotate(
+                total=Count('id'), lowest=Min('score')
+            ).order_by()
+        }
+        for pk in block:
+            total, lowest = thresholds.get(pk, (0, 0))
+            if total < top_k or scores[pk] > lowest:
+                targets.add(pk)
+    return targets
+
+
+def refresh_similar_products(full=False):
+    """
+    Atualiza os produtos similares.
+
+    O cálculo completo monta o índice com o catálogo inteiro, recalcula todas
+    as listas e grava o índice (SimilarityIndex.save). Sem `full`, o índice
+    gravado é reaproveitado: só os vetores dos produtos alterados desde a
+    última execução (updated_at) são refeitos, e só as listas afetadas por
+    eles ou marcadas em PendingSimilarList (as que continham um produto
+    excluído) são recalculadas. Mudanças só de categoria e a deriva do IDF
+    entram no próximo cálculo completo.
+
+    Retorna a execução gravada (SimilarProductsRun).
+    """
+    config = get_similar_settings()
+    started_at = timezone.now()
+    last = None if full else SimilarProductsRun.objects.first()
+    last_full = None if last is None else SimilarProductsRun.objects.filter(full=True).first()
+    full = last_full is None or not SimilarTerm.objects.exists()
+    pending = PendingSimilarList.objects.aggregate(last=Max('id'))['last']
+
+    if not full:
+        index = StoredSimilarityIndex(config, last_full.products_count)
+        changed = set(Product.objects.filter(updated_at__gte=last.started_at).values_list('id', flat=True))
+        # Com boa parte do catálogo alterada (importação), recalcular tudo é mais barato
+        full = len(changed) > len(index) // 4
+
+    if full:
+        rows = Product.objects.filter(is_active=True).values_list(
+            'id', 'name', 'description', 'category_id', 'price', 'weight'
+        ).order_by().iterator(chunk_size=2000)
+        index = SimilarityIndex(config).build(rows)
+        targets = index.ids
+    else:
+        index.update(changed)
+        # Produtos desativados ou excluídos saem das listas
+        SimilarProduct.objects.filter(product_id__in=[pk for pk in changed if pk not in index]).delete()
+        targets = affected_products(index, changed, config['TOP_K'])
+        if pending is not None:
+            holders = PendingSimilarList.objects.filter(id__lte=pending).values_list('product_id', flat=True)
+            targets.update(pk for pk in holders if pk in index)
+        targets = sorted(targets)
+        index.load_vectors(targets)
+
+    write_similar(index, targets, config['BLOCK_SIZE'])
+    if full:
+        SimilarProduct.objects.filter(Q(product__is_active=False) | Q(similar__is_active=False)).delete()
+        index.save()
+    if pending is not None:
+        PendingSimilarList.objects.filter(id__lte=pending).delete()
+
+    return SimilarProductsRun.objects.create(
+        started_at=started_at, full=full, products_count=len(index), recomputed=len(targets),
+    )
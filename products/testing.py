@@ -0,0 +1,27 @@
+# products/testing.py
+#
+# Dados de teste compartilhados pelas suítes dos apps (products/tests.py, orders/tests.py).
+from .models import Category, Product, ProductImage
+
+
+def create_products(count, prefix='produto', category=None, name=None, images=False, **fields):
+    """
+    Produtos salvos um a um, para passarem pelos signals (índice de busca,
+    caches). Sem `category`, cria uma para o prefixo; com `images`, cada
+    produto ganha uma imagem principal.
+    """
+    if category is None:
+        category = Category.objects.create(name=f"Categoria {prefix}", slug=f"categoria-{prefix}")
+    name = name or prefix.capitalize()
+    products = [
+        Product.objects.create(
+            name=f"{name} {i}", slug=f"{prefix}-{i}", sku=f"{prefix.upper()}{i:04d}", category=category,
+            description="Produto de teste", price=10 + i % 50, stock=100, **fields,
+        )
+        for i in range(count)
+    ]
+    if images:
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f"products/{prefix}-{product.pk}.jpg", is_main=True) for product in products
+        )
+    return products
@@ -1,3 +1,694 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import Future
+from urllib.parse import parse_qs, urlparse
+from unittest import mock
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from backend.pagination import KeysetPagination
+from backend.query_plans import collect_query_plans, explain
+from orders.models import Order, OrderItem
+from users.models import User
+from . import autocomplete, images, similar
+from .admin import ProductReviewAdmin
+from .cache import bump_catalog_version, bump_emergency_version, get_catalog_version, get_category_tree, get_emergency_version
+from .categories import get_category_resolver, invalidate_category_resolver
+from .importer import CatalogImporter, read_rows
+from .models import (
+    Category, Product, ProductImage, ProductRatingSummary, ProductReview, RelatedProduct, SimilarProduct,
+    SimilarProductTerm,
+)
+from .ratings import recompute_rating_summaries
+from .testing import create_products
+from .views import ProductExportView
 
-# Create your tests here.
+
+class RatingSummaryTests(TestCase):
+    """O resumo desnormalizado acompanha cada escrita em avaliações"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Cat A", slug="cat-a")
+        cls.product, cls.other = create_products(2, "cabo", category=category)
+        cls.users = [User.objects.create(username=f'cliente{i}', email=f'cliente{i}@example.com') for i in range(3)]
+
+    def review(self, user, rating, product=None, **fields):
+        return ProductReview.objects.create(
+            product=product or self.product, user=self.users[user], rating=rating, title="Bom", comment="Bom", **fields
+        )
+
+    def assertSummary(self, product, count, histogram=None):
+        summary = ProductRatingSummary.objects.filter(product=product).first()
+        if summary is None:
+            self.assertEqual(count, 0)
+            return
+        self.assertEqual(summary.reviews_count, count)
+        ratings = {star: total for star, total in (histogram or {}).items()}
+        self.assertEqual(summary.histogram, {star: ratings.get(star, 0) for star in range(1, 6)})
+        self.assertEqual(summary.rating_sum, sum(star * total for star, total in ratings.items()))
+        if count:
+            self.assertAlmostEqual(summary.average_rating, summary.rating_sum / count)
+
+    def test_create_and_delete(self):
+        first = self.review(0, 5)
+        self.review(1, 3)
+        self.review(2, 1, is_approved=False)
+        self.assertSummary(self.product, 2, {5: 1, 3: 1})
+        first.delete()
+        self.assertSummary(self.product, 1, {3: 1})
+
+    def test_approve_unapprove_and_change_rating(self):
+        review = self.review(0, 4, is_approved=False)
+        self.assertSummary(self.product, 0)
+        review.is_approved = True
+        review.save()
+        self.assertSummary(self.product, 1, {4: 1})
+        review.rating = 2
+        review.save()
+        self.assertSummary(self.product, 1, {2: 1})
+        review.is_approved = False
+        review.save()
+        self.assertSummary(self.product, 0, {})
+
+    def test_move_review_to_another_product(self):
+        review = self.review(0, 5)
+        review.product = self.other
+        review.save()
+        self.assertSummary(self.product, 0, {})
+        self.assertSummary(self.other, 1, {5: 1})
+
+    def test_admin_bulk_actions(self):
+        self.review(0, 5, is_approved=False)
+        self.review(1, 2, is_approved=False)
+        self.review(2, 4, product=self.other)
+        model_admin = ProductReviewAdmin(ProductReview, admin.site)
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.approve_reviews(None, ProductReview.objects.all())
+            self.assertSummary(self.product, 2, {5: 1, 2: 1})
+            self.assertSummary(self.other, 1, {4: 1})
+            model_admin.reject_reviews(None, ProductReview.objects.filter(rating__gte=4))
+        self.assertSummary(self.product, 1, {2: 1})
+        self.assertSummary(self.other, 0, {})
+
+    def test_recompute_matches_and_invalidates_the_caches(self):
+        self.review(0, 5)
+        self.review(1, 1, product=self.other)
+        ProductRatingSummary.objects.update(reviews_count=9)
+        catalog, emergency = get_catalog_version(), get_emergency_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(recompute_rating_summaries(), 2)
+        self.assertSummary(self.product, 1, {5: 1})
+        self.assertSummary(self.other, 1, {1: 1})
+        self.assertNotEqual(get_catalog_version(), catalog)
+        self.assertNotEqual(get_emergency_version(), emergency)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat_a = Category.objects.create(name="Cat A", slug="cat-a")
+        cls.cat_b = Category.objects.create(name="Cat B", slug="cat-b")
+        create_products(600, "cabo-a", category=cls.cat_a, name="Cabo flexível")
+        cls.special = Product.objects.create(
+            name="Cabo especial", slug="cabo-especial", sku="CABOESP", category=cls.cat_b,
+            description="Produto de teste", price=99, stock=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_search_applies_filters_before_ranking(self):
+        """A busca não corta os resultados antes dos filtros de categoria"""
+        response = self.client.get('/api/products/', {'q': 'cabo', 'category': 'cat-b'}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.special.pk])
+
+    def test_search_ranks_name_matches_first(self):
+        Product.objects.create(
+            name="Fita isolante", slug="fita", sku="FITA", category=self.cat_b,
+            description="Boa para emendar cabo", price=5, stock=10,
+        )
+        response = self.client.get('/api/products/', {'q': 'especial cabo'}, HTTP_HOST='localhost')
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.special.pk])
+        response = self.client.get('/api/products/', {'q': 'cabo', 'page_size': 100}, HTTP_HOST='localhost')
+        names = [product['name'] for product in response.json()['results']]
+        self.assertNotIn("Fita isolante", names)
+        self.assertTrue(response.json()['next'])
+
+    def test_facets_count_the_whole_match_set(self):
+        response = self.client.get('/api/products/facets/', {'q': 'cabo'}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        facets = response.json()
+        self.assertEqual(facets['total'], 601)
+        counts = {category['slug']: category['count'] for category in facets['categories']}
+        self.assertEqual(counts, {'cat-a': 600, 'cat-b': 1})
+
+
+@override_settings(AUTOCOMPLETE={'CHECK_INTERVAL': 0})
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Iluminação", slug="iluminacao")
+        cls.products = create_products(3, "lanterna", category=cls.category, name="Lanterna led")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def suggest(self, prefix):
+        response = self.client.get('/api/products/autocomplete/', {'prefix': prefix})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return sorted(product['id'] for product in data['products']), [category['slug'] for category in data['categories']]
+
+    def commit(self, write):
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+
+    def test_prefixes_of_name_sku_and_category(self):
+        ids = sorted(product.pk for product in self.products)
+        self.assertEqual(self.suggest('lant le'), (ids, []))
+        self.assertEqual(self.suggest('lanterna0001')[0], [self.products[1].pk])
+        self.assertEqual(self.suggest('ilum'), (ids, ['iluminacao']))
+        self.assertEqual(self.suggest('ilum led'), (ids, []))
+
+    def test_product_changes_are_applied_incrementally(self):
+        self.suggest('lant')
+        product = self.products[0]
+        product.name = "Refletor solar"
+        with mock.patch('products.autocomplete.build_index', wraps=autocomplete.build_index) as build:
+            self.commit(product.save)
+            self.assertEqual(self.suggest('refl')[0], [product.pk])
+            self.assertNotIn(product.pk, self.suggest('led')[0])
+            product.is_active = False
+            self.commit(product.save)
+            self.assertEqual(self.suggest('refl')[0], [])
+        self.assertEqual(build.call_count, 0)
+
+    def test_category_rename_rebuilds_the_product_terms(self):
+        self.suggest('ilum')
+        self.category.name = "Energia"
+        self.commit(self.category.save)
+        self.assertEqual(self.suggest('ilum'), ([], []))
+        self.assertEqual(len(self.suggest('energ')[0]), 3)
+
+
+class CategoryResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lighting = Category.objects.create(name="Iluminação", slug="iluminacao")
+        cls.tools = Category.objects.create(name="Ferramentas elétricas", slug="ferramentas")
+        cls.lamp = create_products(1, "lanterna", category=cls.lighting)[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def resolve(self, value):
+        return get_category_resolver().resolve(value)
+
+    def test_id_slug_and_name(self):
+        self.assertEqual(self.resolve(str(self.tools.pk)), [self.tools.pk])
+        self.assertEqual(self.resolve(' ILUMINAÇÃO '), [self.lighting.pk])
+        self.assertEqual(self.resolve('elétri'), [self.tools.pk])
+        self.assertEqual(self.resolve('a'), [self.tools.pk, self.lighting.pk])
+        self.assertEqual(self.resolve('jardim'), [])
+
+    def test_map_is_kept_in_memory_until_the_version_changes(self):
+        self.resolve('ferramentas')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve('ferramentas'), [self.tools.pk])
+        # Alteração sem signals (outro processo, update em massa): vale a versão
+        Category.objects.filter(pk=self.tools.pk).update(name='Elétricos', slug='eletricos')
+        self.assertEqual(self.resolve('ferramentas'), [self.tools.pk])
+        invalidate_category_resolver()
+        self.assertEqual(self.resolve('eletricos'), [self.tools.pk])
+        self.assertEqual(self.resolve('ferramentas'), [])
+
+    def test_rename_and_new_slug_after_commit(self):
+        self.resolve('iluminacao')
+        self.lighting.name = "Lanternas"
+        self.lighting.slug = "lanternas"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lighting.save()
+        self.assertEqual(self.resolve('lanternas'), [self.lighting.pk])
+        self.assertEqual(self.resolve('iluminacao'), [])
+        response = APIClient().get('/api/products/', {'category': 'lanternas'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.lamp.pk])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Cat A", slug="cat-a")
+        cls.products = create_products(7, "cabo", category=category)
+        # Mesmo preço e mesma data em todos: só o ID desempata
+        Product.objects.update(price=10, created_at=datetime.datetime(2024, 1, 10, tzinfo=datetime.timezone.utc))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, params=None, status_code=200):
+        response = self.client.get(url, params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status_code, response.content[:200])
+        return response.json()
+
+    def walk(self, params):
+        pages, url = [], '/api/products/'
+        while url:
+            page = self.get(url, params)
+            pages.append(page)
+            url, params = page['next'], None
+        return pages
+
+    def ids(self, page):
+        return [product['id'] for product in page['results']]
+
+    def test_ties_are_broken_by_id_in_both_directions(self):
+        ids = sorted(product.pk for product in self.products)
+        for ordering, expected in (('price', ids), ('-created_at', ids[::-1])):
+            with self.subTest(ordering=ordering):
+                pages = self.walk({'ordering': ordering, 'page_size': 3})
+                self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+                self.assertEqual([pk for page in pages for pk in self.ids(page)], expected)
+                self.assertIsNone(pages[0]['previous'])
+                self.assertEqual(self.ids(self.get(pages[2]['previous'])), self.ids(pages[1]))
+                self.assertEqual(self.ids(self.get(pages[1]['previous'])), self.ids(pages[0]))
+
+    def test_page_size_bounds(self):
+        with mock.patch.object(KeysetPagination, 'max_page_size', 5):
+            self.assertEqual(len(self.get('/api/products/', {'page_size': 1000})['results']), 5)
+        self.assertEqual(len(self.get('/api/products/', {'page_size': 2})['results']), 2)
+        for invalid in ('0', '-1', 'abc'):
+            self.assertEqual(len(self.get('/api/products/', {'page_size': invalid})['results']), 7)
+
+    def test_tampered_cursor_is_a_bad_request(self):
+        def token(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+        valid = parse_qs(urlparse(self.get('/api/products/', {'page_size': 2})['next']).query)['cursor'][0]
+        self.get('/api/products/', {'cursor': valid})
+        for cursor in ('%%%', 'bm90IGpzb24', token([1, 2]), token({'v': 'ab'}), token({'v': [1]}),
+                       token({'v': ['ontem', 1]}), token({'v': ['2024-01-10T00:00:00Z', 'x']})):
+            with self.subTest(cursor=cursor):
+                self.assertIn('cursor', self.get('/api/products/', {'cursor': cursor}, status_code=400))
+
+
+class CatalogConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Cat A", slug="cat-a")
+        cls.products = create_products(3, "cabo", category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, **headers):
+        return self.client.get(url, HTTP_HOST='localhost', HTTP_ACCEPT='application/json', **headers)
+
+    def test_cached_validators_answer_without_queries(self):
+        etag = self.get('/api/products/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_last_modified_for_versioned_responses(self):
+        """Exclusões não mudam nenhuma data: só o ETag (com a versão do catálogo) detecta a mudança"""
+        first = self.get('/api/products/')
+        self.assertNotIn('Last-Modified', first)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].delete()
+        response = self.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class ImageDerivativeTests(TestCase):
+    def test_stale_derivatives_are_discarded(self):
+        """Um resultado atrasado de um upload antigo não sobrescreve o do upload novo"""
+        category = Category.objects.create(name="Cat A", slug="cat-a", image='categories/new.jpg')
+        self.assertFalse(images.store_derivatives('products.Category', category.pk, {'source': 'categories/old.jpg'}))
+        category.refresh_from_db()
+        self.assertEqual(category.image_derivatives, {})
+
+        self.assertTrue(images.store_derivatives('products.Category', category.pk, {'source': 'categories/new.jpg'}))
+        category.refresh_from_db()
+        self.assertEqual(category.image_derivatives, {'source': 'categories/new.jpg'})
+
+    @override_settings(IMAGE_DERIVATIVES={'WORKERS': 1})
+    def test_backfill_keeps_few_images_in_memory(self):
+        category = Category.objects.create(name="Cat A", slug="cat-a")
+        product = create_products(1, "cabo", category=category)[0]
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f'products/cabo-{i}.jpg') for i in range(10)
+        )
+        in_memory = []
+
+        def read(field_file):
+            in_memory.append(field_file.name)
+            return b'imagem'
+
+        def submit(function, *args):
+            future = Future()
+            future.set_result({})
+            return future
+
+        def store(label, pk, derivatives):
+            in_memory.remove(derivatives['source'])
+            peak[0] = max(peak[0], len(in_memory) + 1)
+
+        peak = [0]
+        command = 'products.management.commands.generate_image_derivatives'
+        with mock.patch(f'{command}.read_source', side_effect=read), \
+                mock.patch(f'{command}.get_executor', return_value=mock.Mock(submit=submit)), \
+                mock.patch(f'{command}.build_derivatives', side_effect=lambda data, name, *a, **k: {'source': name}), \
+                mock.patch(f'{command}.store_derivatives', side_effect=store):
+            call_command('generate_image_derivatives', stdout=io.StringIO())
+        self.assertEqual(in_memory, [])
+        self.assertEqual(peak[0], 4)
+
+    def test_writer_logs_failed_renders(self):
+        future = Future()
+        future.set_exception(OSError("imagem corrompida"))
+        images.get_writer()
+        with self.assertLogs('products.images', 'ERROR') as logs:
+            images._results.put((future, b'', 'products.Category', 1, 'categories/a.jpg', images.get_derivative_settings()))
+            images._results.join()
+        self.assertIn("imagem corrompida", logs.output[0])
+
+
+@override_settings(SIMILAR_PRODUCTS={'TOP_K': 3})
+class SimilarProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Cat A", slug="cat-a")
+        cls.products = create_products(8, "lanterna", category=category, name="Lanterna led recarregável")
+
+    def neighbors(self, product):
+        return list(SimilarProduct.objects.filter(product=product).values_list('similar_id', flat=True))
+
+    def test_incremental_run_reuses_the_stored_index(self):
+        """Só o produto alterado é reprocessado; os demais vetores vêm do índice gravado"""
+        similar.refresh_similar_products(full=True)
+        self.assertTrue(SimilarProductTerm.objects.filter(product=self.products[0]).exists())
+        product = self.products[0]
+        product.name = "Lanterna led solar"
+        product.save()
+        with mock.patch.object(similar, 'product_features', wraps=similar.product_features) as features:
+            run = similar.refresh_similar_products()
+        self.assertFalse(run.full)
+        self.assertEqual(features.call_count, 1)
+        self.assertEqual(len(self.neighbors(product)), 3)
+
+    def test_lists_with_deleted_products_are_completed(self):
+        similar.refresh_similar_products(full=True)
+        product = self.products[0]
+        removed = Product.objects.get(pk=self.neighbors(product)[0])
+        removed.delete()
+        self.assertEqual(len(self.neighbors(product)), 2)
+        run = similar.refresh_similar_products()
+        self.assertFalse(run.full)
+        neighbors = self.neighbors(product)
+        self.assertEqual(len(neighbors), 3)
+        self.assertNotIn(removed.pk, neighbors)
+
+
+class CacheInvalidationTests(TestCase):
+    """As invalidações esperam o commit, para ninguém guardar linhas antigas com a versão nova"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Cat A", slug="cat-a")
+        cls.product = create_products(1, "cabo", category=cls.category)[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def assertChangesOnCommit(self, read, write):
+        before = read()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+            self.assertEqual(read(), before)
+        self.assertNotEqual(read(), before)
+
+    def test_catalog_version(self):
+        self.product.price = 20
+        self.assertChangesOnCommit(get_catalog_version, self.product.save)
+
+    def test_category_tree(self):
+        def read():
+            return get_category_tree(lambda: list(Product.objects.filter(is_active=True).values_list('id', flat=True)))
+
+        read()
+        self.product.is_active = False
+        self.assertChangesOnCommit(read, self.product.save)
+
+    def test_emergency_version(self):
+        self.product.is_emergency = True
+        self.assertChangesOnCommit(get_emergency_version, self.product.save)
+
+
+class CatalogImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Cat A", slug="cat-a")
+        cls.existing = create_products(1, "cabo", category=cls.category)[0]
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['sku', 'name', 'category', 'description', 'price', 'stock', 'is_active'])
+            writer.writeheader()
+            writer.writerows({'description': 'Importado', **row} for row in rows)
+        return path
+
+    def run_import(self, rows, **options):
+        path = self.write('catalogo.csv', rows)
+        importer = CatalogImporter(batch_size=2, **options)
+        with self.captureOnCommitCallbacks(execute=True):
+            return importer.run(read_rows(path))
+
+    def test_inserts_new_skus_and_updates_existing_ones(self):
+        stats = self.run_import([
+            {'sku': 'CABO0000', 'name': 'Cabo novo', 'category': 'cat-a', 'price': '15.50', 'stock': '3'},
+            {'sku': 'FITA1', 'name': 'Cabo 0', 'category': 'Cat A', 'price': '5', 'stock': '1', 'is_active': 'não'},
+            {'sku': 'FITA2', 'name': 'Fita', 'category': 'cat-a', 'price': '6'},
+        ])
+        self.assertEqual(stats.as_dict(), {'rows': 3, 'created': 2, 'updated': 1, 'invalid': 0})
+        existing = Product.objects.get(sku='CABO0000')
+        self.assertEqual((existing.pk, existing.slug, existing.name, existing.price), (self.existing.pk, 'cabo-0', 'Cabo novo', 15.5))
+        created = Product.objects.get(sku='FITA1')
+        # O slug do nome já estava em uso: recebe o primeiro sufixo livre
+        self.assertEqual((created.slug, created.is_active), ('cabo-0-2', False))
+        self.assertEqual(Product.objects.get(sku='FITA2').stock, 0)
+
+    def test_invalid_rows_are_reported_without_aborting(self):
+        stats = self.run_import([
+            {'sku': 'A1', 'name': 'Válido', 'category': 'cat-a', 'price': '1'},
+            {'sku': 'A2', 'name': 'Preço ruim', 'category': 'cat-a', 'price': 'caro'},
+            {'sku': 'A3', 'name': 'Sem categoria', 'category': 'inexistente', 'price': '1'},
+            {'sku': '', 'name': 'Sem SKU', 'category': 'cat-a', 'price': '1'},
+        ])
+        self.assertEqual((stats.created, stats.invalid), (1, 3))
+        self.assertEqual([number for number, _ in stats.errors], [2, 3, 4])
+        self.assertIn('price', stats.errors[0][1])
+        self.assertTrue(Product.objects.filter(sku='A1').exists())
+        self.assertFalse(Product.objects.filter(sku__in=['A2', 'A3']).exists())
+
+    def test_dry_run_writes_nothing(self):
+        stats = self.run_import([{'sku': 'A1', 'name': 'Novo', 'category': 'outra', 'price': '1'}],
+                                dry_run=True, create_categories=True)
+        self.assertEqual(stats.created, 1)
+        self.assertFalse(Product.objects.filter(sku='A1').exists())
+        self.assertFalse(Category.objects.filter(slug='outra').exists())
+
+    def test_refreshes_caches_and_search_index(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/products/', {'q': 'lanterna'}, HTTP_ACCEPT='application/json').json()['results'], [])
+        catalog, emergency = get_catalog_version(), get_emergency_version()
+        self.run_import([
+            {'sku': 'L1', 'name': 'Lanterna tática', 'category': 'cat-a', 'price': '30'},
+            {'sku': 'CABO0000', 'name': 'Cabo', 'category': 'cat-a', 'price': '10', 'is_active': 'false'},
+        ])
+        self.assertNotEqual(get_catalog_version(), catalog)
+        self.assertNotEqual(get_emergency_version(), emergency)
+        results = client.get('/api/products/', {'q': 'lanterna'}, HTTP_ACCEPT='application/json').json()['results']
+        self.assertEqual([product['name'] for product in results], ['Lanterna tática'])
+        self.assertEqual(client.get('/api/products/', {'q': 'cabo'}, HTTP_ACCEPT='application/json').json()['results'], [])
+
+    def test_command_reports_invalid_lines(self):
+        path = self.write('catalogo.csv', [
+            {'sku': 'A1', 'name': 'Válido', 'category': 'cat-a', 'price': '1'},
+            {'sku': 'A2', 'name': 'Inválido', 'category': 'cat-a', 'price': '-'},
+        ])
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_catalog', path, stdout=stdout, stderr=stderr)
+        self.assertIn('1 produto(s) criado(s)', stdout.getvalue())
+        self.assertIn('Linha 2: price', stderr.getvalue())
+
+
+class ProductExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Cat A", slug="cat-a")
+        other = Category.objects.create(name="Cat B", slug="cat-b")
+        cls.products = create_products(3, "cabo", category=cls.category) + create_products(2, "fita", category=other)
+        Product.objects.filter(pk=cls.products[0].pk).update(is_active=False)
+        Product.objects.filter(pk=cls.products[1].pk).update(updated_at=datetime.datetime(2024, 1, 10, 12, tzinfo=datetime.timezone.utc))
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, params=None, status_code=200):
+        response = self.client.get('/api/products/export/', {'format': 'csv', **(params or {})})
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+    def skus(self, params=None):
+        rows = csv.DictReader(io.StringIO(b''.join(self.export(params).streaming_content).decode()))
+        return sorted(row['sku'] for row in rows)
+
+    def test_filters_convert_values_with_the_model_field(self):
+        self.assertEqual(self.skus({'is_active': 'false'}), ['CABO0000'])
+        self.assertEqual(len(self.skus({'is_active': 'true,1'})), 4)
+        self.assertEqual(self.skus({'category': 'cat-b', 'is_active': 'True'}), ['FITA0000', 'FITA0001'])
+        self.assertIn('is_active', self.export({'is_active': 'talvez'}, 400).json())
+
+    def test_date_range_includes_the_whole_last_day(self):
+        self.assertEqual(self.skus({'date_from': '2024-01-10', 'date_to': '2024-01-10'}), ['CABO0001'])
+        self.assertEqual(self.skus({'date_to': '2024-01-09'}), [])
+        self.assertIn('date_from', self.export({'date_from': '10/01/2024'}, 400).json())
+
+    def test_streams_in_chunks(self):
+        with mock.patch.object(ProductExportView, 'buffer_size', 100):
+            response = self.export()
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(len(b''.join(chunks).decode().splitlines()), 6)
+
+    def test_ndjson_and_gzip(self):
+        response = self.export({'format': 'ndjson', 'gzip': 'true', 'category': 'cat-b'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(sorted(json.loads(line)['sku'] for line in lines), ['FITA0000', 'FITA0001'])
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(User.objects.create(username='cliente', email='cliente@example.com'))
+        self.export(status_code=403)
+
+
+@override_settings(EMERGENCY_SNAPSHOT_CHECK_INTERVAL=0)
+class EmergencySnapshotTests(TestCase):
+    """O snapshot de emergência é o mesmo para todas as requisições do host"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Cat A", slug="cat-a")
+        create_products(2, "lanterna", category=category, is_emergency=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, params=None):
+        response = self.client.get('/api/products/emergency/', params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sparse_fieldsets_do_not_replace_the_snapshot(self):
+        self.assertEqual([set(product) for product in self.get({'fields': 'id'})], [{'id'}, {'id'}])
+        self.assertTrue(all('name' not in product for product in self.get({'omit': 'name'})))
+        products = self.get()
+        self.assertEqual(len(products), 2)
+        self.assertTrue(all({'id', 'name', 'price', 'images'} <= set(product) for product in products))
+
+
+@override_settings(EMERGENCY_SNAPSHOT_CHECK_INTERVAL=0)
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN das consultas quentes declaradas em <app>/query_plans.py, a partir
+    das requisições reais: falha se alguma tabela for lida sem busca por índice
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Cat A", slug="cat-a")
+        other = Category.objects.create(name="Cat B", slug="cat-b")
+        products = create_products(25, "cabo", category=category, name="Cabo flexível", is_emergency=True)
+        create_products(25, "fita", category=other, name="Fita isolante")
+        users = [User.objects.create(username=f'cliente{i}', email=f'cliente{i}@example.com') for i in range(25)]
+        admin = User.objects.create(username='admin', email='admin@example.com', is_staff=True)
+        ProductReview.objects.bulk_create(
+            [ProductReview(product=products[0], user=user, rating=1 + i % 5, is_approved=True) for i, user in enumerate(users)]
+            + [ProductReview(product=product, user=users[0], rating=5) for product in products[1:]]
+        )
+        RelatedProduct.objects.bulk_create(
+            RelatedProduct(product=products[0], related=product, rank=rank, score=1, orders=1)
+            for rank, product in enumerate(products[1:11])
+        )
+        SimilarProduct.objects.bulk_create(
+            SimilarProduct(product=products[0], similar=product, rank=rank, score=1)
+            for rank, product in enumerate(products[1:11])
+        )
+        orders = [
+            Order.objects.create(user=users[0], status='PAID', total_amount=10, preference_id=f'pref-{i}')
+            for i in range(25)
+        ]
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=products[0], product_name=products[0].name, price=10) for order in orders
+        )
+        cls.fixtures = {
+            'category_slug': category.slug, 'product_slug': products[0].slug, 'user': users[0], 'admin': admin,
+            'user_id': users[0].pk, 'order_id': orders[0].pk, 'preference_id': orders[0].preference_id,
+        }
+
+    def test_hot_queries_use_indexes(self):
+        failures = []
+        for plan in collect_query_plans():
+            cache.clear()
+            client = APIClient()
+            # A primeira execução aquece os caches de processo (categorias, emergência);
+            # as versões novas fazem a segunda ir ao banco como numa mudança do catálogo
+            plan.run(client, self.fixtures)
+            bump_catalog_version()
+            bump_emergency_version()
+            with CaptureQueriesContext(connection) as queries:
+                plan.run(client, self.fixtures)
+            selects = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+            if all('"django_session"' in sql for sql in selects):
+                failures.append(f"{plan.name}: nenhuma consulta executada")
+            for sql in selects:
+                lines, problems = explain(connection, sql, plan.index_scans)
+                if problems:
+                    failures.append(f"{plan.name}: {'; '.join(problems)}\n    {sql}\n    " + '\n    '.join(lines))
+        self.assertFalse(failures, '\n'.join(failures))
+
+    def test_index_scans_must_be_declared(self):
+        """Percorrer um índice inteiro só passa se a entrada o declarar; ler a tabela nunca passa"""
+        page = str(Product.objects.filter(is_active=True).order_by('name', 'id')[:21].query)
+        self.assertTrue(explain(connection, page)[1])
+        self.assertFalse(explain(connection, page, ['product_active_name_idx'])[1])
+        self.assertTrue(explain(connection, str(Product.objects.filter(reviews_enabled=False).query))[1])
@@ -8,5 +8,7 @@ router.register('reviews', views.ProductReviewViewSet, basename='product-reviews
 router.register('', views.ProductViewSet)  # O basename não é mais necessário porque adicionamos queryset
 
 urlpatterns = [
+    # Antes do router para não ser interpretada como o slug de um produto
+    path('export/', views.ProductExportView.as_view(), name='product-export'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
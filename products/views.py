@@ -1,11 +1,29 @@
 from rest_framework import viewsets, filters, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet
 from django_filters import rest_framework as df_filters
-from django.db.models import Q, Avg
-from .models import Category, Product, ProductImage, ProductReview
-from .serializers import CategorySerializer, ProductSerializer, ProductImageSerializer, ProductReviewSerializer
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery
+from .models import Category, FeaturedProduct, Product, ProductImage, ProductRatingSummary, ProductReview
+from .autocomplete import autocomplete, get_autocomplete_settings
+from .categories import get_category_resolver
+from .search import get_search_backend
+from .facets import compute_facets
+from .related import get_related_settings
+from .similar import get_similar_settings
+from .ratings import DEFAULT_REVIEW_SORT, REVIEW_SORTS, get_rating_summary, rating_summary_data
+from .cache import (
+    CatalogCacheMixin, get_cache_stats, get_category_tree, get_emergency_snapshot,
+)
+from backend.exports import StreamingExportView
+from backend.serializers import apply_sparse_fieldsets, sparse_fieldsets
+from .serializers import (
+    CategorySerializer, ProductSerializer, ProductListSerializer,
+    ProductImageSerializer, ProductReviewSerializer
+)
 
 class ProductFilter(FilterSet):
     """FilterSet personalizado para filtrar produtos com opções avançadas"""
@@ -33,81 +51,274 @@ class ProductFilter(FilterSet):
         
     def filter_category(self, queryset, name, value):
         """
-        Filtrar por categoria de forma flexível (ID, nome ou slug)
+        Filtrar por categoria de forma flexível (ID, slug ou nome), resolvida
+        em memória: o filtro vira um único category_id__in, sem consulta prévia
         """
-        # Tentar como ID
-        try:
-            category_id = int(value)
-            return queryset.filter(category_id=category_id)
-        except (ValueError, TypeError):
-            pass
-            
-        # Tentar como slug
-        category_by_slug = queryset.filter(category__slug__iexact=value)
-        if category_by_slug.exists():
-            return category_by_slug
-            
-        # Tentar como nome
-        return queryset.filter(category__name__icontains=value)
+        return queryset.filter(category_id__in=get_category_resolver().resolve(value))
+
+class FullTextSearchFilter(filters.BaseFilterBackend):
+    """
+    Filtro de busca textual usando o índice de produtos (FTS5/tsvector).
+    Aceita o parâmetro 'q' e, por compatibilidade, o 'search' do SearchFilter.
+    """
+    search_params = ('q', 'search')
+
+    def filter_queryset(self, request, queryset, view):
+        for param in self.search_params:
+            query = request.query_params.get(param, '').strip()
+            if query:
+                return get_search_backend().filter_queryset(queryset, query)
+        return queryset
+
+def paginated_reviews(view, reviews, summary=False):
+    """
+    Página de avaliações na ordenação de ?sort= (newest, highest ou lowest),
+    com o autor carregado na mesma consulta. Com `summary` (um
+    ProductRatingSummary ou None), a resposta traz também o bloco
+    'rating_summary' com o histograma pré-calculado do produto.
+    """
+    ordering = REVIEW_SORTS.get(view.request.query_params.get('sort'), REVIEW_SORTS[DEFAULT_REVIEW_SORT])
+    page = view.paginate_queryset(reviews.select_related('user').order_by(*ordering))
+    serializer = ProductReviewSerializer(page, many=True, context=view.get_serializer_context())
+    response = view.get_paginated_response(serializer.data)
+    if summary is not False:
+        response.data = {'rating_summary': rating_summary_data(summary), **response.data}
+    return response
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para listar e recuperar categorias"""
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     lookup_field = 'slug'
+    # Lista pequena usada em menus: retornada sem paginação
+    pagination_class = None
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description']
+    
+    def with_counts(self):
+        """?with_counts=false dispensa a contagem de produtos"""
+        value = self.request.query_params.get('with_counts', '').lower()
+        return value not in ('false', '0', 'no')
+    
+    def get_queryset(self):
+        """Anota a contagem de produtos ativos em uma única consulta agrupada"""
+        queryset = Category.objects.filter(is_active=True)
+        if self.with_counts():
+            queryset = queryset.annotate(
+                active_products_count=Count('products', filter=Q(products__is_active=True))
+            )
+        return queryset
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['with_counts'] = self.with_counts()
+        return context
+    
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """
+        Menu de categorias com contagem de produtos, em cache até que uma
+        categoria mude ou um produto seja ativado, desativado ou movido
+        """
+        def build():
+            categories = Category.objects.filter(is_active=True).annotate(
+                active_products_count=Count('products', filter=Q(products__is_active=True))
+            )
+            # Sem request no contexto as URLs de imagem ficam relativas e valem para qualquer host
+            return CategorySerializer(categories, many=True).data
+        
+        return Response(get_category_tree(build))
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para listar e recuperar produtos com filtros avançados"""
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     lookup_field = 'slug'
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # A busca textual ('q' ou 'search') é resolvida pelo índice em FullTextSearchFilter
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name', 'description', 'sku', 'category__name']
     ordering_fields = ['price', 'created_at', 'name', 'stock']
     
+    # Ações que usam o serializer enxuto da grade de produtos
+    list_actions = ('list', 'search', 'related', 'similar')
+    cached_actions = ('list', 'retrieve', 'facets', 'related', 'similar')
+    # As facetas usam a mesma chave normalizada da listagem, sem os parâmetros de apresentação
+    cache_ignored_params = {
+        'facets': ('cursor', 'page', 'page_size', 'ordering', 'fields', 'omit'),
+    }
+    
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return ProductListSerializer
+        return ProductSerializer
+    
     def get_queryset(self):
-        """Retorna produtos ativos e permite filtragem por pesquisa de texto"""
+        """Retorna produtos ativos com as relações usadas pelo serializer"""
         queryset = Product.objects.filter(is_active=True)
         
+        if self.action == 'facets':
+            return queryset
+        
+        if self.action in self.list_actions:
+            # Só as colunas da grade e uma única imagem por produto (a principal ou a primeira)
+            first_image = ProductImage.objects.filter(
+                product=OuterRef('product')
+            ).order_by('-is_main', 'id').values('id')[:1]
+            main_images = ProductImage.objects.filter(id=Subquery(first_image)).only('id', 'product_id', 'image', 'image_derivatives')
+            return queryset.only(
+                'id', 'name', 'slug', 'price', 'discount_price', 'stock', 'created_at'
+            ).prefetch_related(Prefetch('images', queryset=main_images, to_attr='main_images'))
+        
+        if self.action == 'reviews':
+            # A sub-rota de avaliações só precisa do ID do produto e do resumo (histograma)
+            return queryset.only('id', 'slug', 'rating_summary').select_related('rating_summary')
+        
         # Adicionar prefetch_related para otimizar consultas
-        queryset = queryset.select_related('category').prefetch_related('images', 'reviews')
+        queryset = queryset.select_related('category', 'rating_summary').prefetch_related('images')
         
-        # Filtrar por pesquisa de texto em múltiplos campos se o parâmetro 'q' estiver presente
-        query = self.request.query_params.get('q', None)
-        if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) | 
-                Q(description__icontains=query) | 
-                Q(sku__icontains=query) |
-                Q(category__name__icontains=query)
-            )
+        if self.action == 'retrieve':
+            # Apenas as N avaliações aprovadas mais recentes; as demais ficam em /<slug>/reviews/
+            latest_reviews = ProductReview.objects.filter(is_approved=True).select_related('user').order_by(
+                '-created_at', '-id'
+            )[:getattr(settings, 'PRODUCT_DETAIL_REVIEWS', 5)]
+            queryset = queryset.prefetch_related(Prefetch('reviews', queryset=latest_reviews, to_attr='latest_reviews'))
         
         return queryset
     
-    @action(detail=False, methods=['get'])
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_latest_reviews'] = self.action == 'retrieve'
+        return context
+    
+    @action(detail=False, methods=['get'], authentication_classes=[], permission_classes=[permissions.AllowAny])
     def emergency(self, request):
-        """Endpoint para produtos de emergência"""
-        emergency_products = Product.objects.filter(is_emergency=True, is_active=True)
-        serializer = self.get_serializer(emergency_products, many=True)
-        return Response(serializer.data)
+        """
+        Endpoint para produtos de emergência. A resposta JSON vem de um snapshot
+        pré-renderizado na memória do processo (ver get_emergency_snapshot), sem
+        consultas ao banco; por isso a ação também dispensa autenticação.
+        """
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return Response(self.get_serializer(self._emergency_products(), many=True).data)
+        
+        data, content = get_emergency_snapshot(request.get_host(), lambda: self._render_emergency(request))
+        only, omit = sparse_fieldsets(request.query_params)
+        if only or omit:
+            # O snapshot é compartilhado: ?fields=/?omit= são aplicados só nesta resposta
+            content = self._render(request, apply_sparse_fieldsets(data, only, omit))
+        return HttpResponse(content, content_type=request.accepted_renderer.media_type)
+    
+    def _emergency_products(self):
+        return self.get_queryset().filter(is_emergency=True)
+    
+    def _render_emergency(self, request):
+        context = {**self.get_serializer_context(), 'sparse_fieldsets': False}
+        data = self.get_serializer_class()(self._emergency_products(), many=True, context=context).data
+        return data, self._render(request, data)
+    
+    def _render(self, request, data):
+        return request.accepted_renderer.render(data, request.accepted_media_type, self.get_renderer_context())
     
     @action(detail=False, methods=['get'])
     def featured(self, request):
-        """Endpoint para produtos em destaque"""
-        featured_products = Product.objects.filter(
-            is_active=True,
-            stock__gt=0
-        ).order_by('-reviews__rating', '-created_at')[:8]  # Limitar a 8 produtos
+        """Endpoint para produtos em destaque (ranking pré-calculado por refresh_featured_products)"""
+        featured_products = [
+            entry.product for entry in FeaturedProduct.objects.filter(
+                product__is_active=True,
+                product__stock__gt=0
+            ).select_related(
+                'product__category', 'product__rating_summary'
+            ).prefetch_related('product__images')[:8]  # Limitar a 8 produtos
+        ]
         
-        # Garantir que não haja duplicatas
-        featured_products = featured_products.distinct()
+        if not featured_products:
+            # Ranking ainda não calculado: ordenar pelo resumo de avaliações
+            featured_products = Product.objects.filter(
+                is_active=True,
+                stock__gt=0
+            ).select_related('category', 'rating_summary').prefetch_related('images').order_by(
+                F('rating_summary__average_rating').desc(nulls_last=True),
+                F('rating_summary__reviews_count').desc(nulls_last=True),
+                '-created_at'
+            )[:8]
         
         serializer = self.get_serializer(featured_products, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Contadores de acertos e falhas do cache do catálogo (apenas administradores)"""
+        return Response(get_cache_stats())
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Contagens por categoria, disponibilidade, emergência e faixa de preço
+        para o mesmo conjunto filtrado da listagem (ProductFilter e busca 'q')
+        """
+        return self.cached_response(request, self._facets)
+    
+    def _facets(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(compute_facets(queryset))
+    
+    @action(detail=True, methods=['get'])
+    def reviews(self, request, slug=None):
+        """
+        Avaliações aprovadas do produto, paginadas por cursor (?sort=newest,
+        highest ou lowest), com o resumo e o histograma de estrelas
+        """
+        product = self.get_object()
+        reviews = ProductReview.objects.filter(product=product, is_approved=True)
+        return paginated_reviews(self, reviews, get_rating_summary(product))
+    
+    @action(detail=True, methods=['get'])
+    def related(self, request, slug=None):
+        """
+        Produtos comprados junto com este (?limit=), na ordem pré-calculada
+        por refresh_related_products
+        """
+        return self.cached_response(request, self._related, slug=slug)
+    
+    def _related(self, request, slug=None):
+        return self.neighbors_response(request, slug, 'related_from', get_related_settings()['TOP_K'])
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, slug=None):
+        """
+        Produtos parecidos com este por nome, descrição, categoria, preço e peso
+        (?limit=), pré-calculados por refresh_similar_products; úteis para
+        produtos novos, ainda sem vendas para /related/
+        """
+        return self.cached_response(request, self._similar, slug=slug)
+    
+    def _similar(self, request, slug=None):
+        return self.neighbors_response(request, slug, 'similar_from', get_similar_settings()['TOP_K'])
+    
+    def neighbors_response(self, request, slug, relation, top_k):
+        """Lista pré-calculada de vizinhos do produto, na ordem gravada em `relation`"""
+        product_id = Product.objects.filter(is_active=True, slug=slug).values_list('id', flat=True).first()
+        if product_id is None:
+            raise Http404
+        try:
+            limit = min(max(int(request.query_params.get('limit', top_k)), 1), top_k)
+        except ValueError:
+            limit = top_k
+        products = self.get_queryset().filter(**{f'{relation}__product_id': product_id}).order_by(f'{relation}__rank')
+        return Response(self.get_serializer(products[:limit], many=True).data)
+    
+    @action(detail=False, methods=['get'], authentication_classes=[], permission_classes=[permissions.AllowAny])
+    def autocomplete(self, request):
+        """
+        Sugestões para a caixa de busca (?prefix=&limit=), respondidas pelo
+        índice de prefixos em memória, sem consultas ao banco
+        """
+        config = get_autocomplete_settings()
+        try:
+            limit = min(max(int(request.query_params.get('limit', config['LIMIT'])), 1), config['MAX_LIMIT'])
+        except ValueError:
+            limit = config['LIMIT']
+        return Response(autocomplete(request.query_params.get('prefix', ''), limit))
+    
     @action(detail=False, methods=['get'])
     def search(self, request):
         """Endpoint de pesquisa avançada para produtos"""
@@ -131,21 +342,22 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
         Retorna todas as avaliações aprovadas, ou todas as avaliações
         para administradores.
         """
+        queryset = ProductReview.objects.select_related('user')
         if self.request.user.is_staff:
-            return ProductReview.objects.all()
+            return queryset
         # Para usuários normais, retorna apenas avaliações aprovadas
-        return ProductReview.objects.filter(is_approved=True)
+        return queryset.filter(is_approved=True)
     
     def get_permissions(self):
         """
         Define permissões por ação:
         - Listar e detalhar: qualquer usuário
-        - Criar: apenas usuários autenticados
+        - Criar e listar as próprias avaliações: apenas usuários autenticados
         - Editar e excluir: apenas o autor ou administradores
         """
         if self.action in ['list', 'retrieve', 'product_reviews']:
             permission_classes = [permissions.AllowAny]
-        elif self.action == 'create':
+        elif self.action in ['create', 'my_reviews']:
             permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [permissions.IsAdminUser]
@@ -153,13 +365,15 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def my_reviews(self, request):
-        """Endpoint para listar avaliações do usuário autenticado"""
-        reviews = ProductReview.objects.filter(user=request.user)
-        serializer = self.get_serializer(reviews, many=True)
-        return Response(serializer.data)
+        """Endpoint para listar avaliações do usuário autenticado (?sort=newest, highest ou lowest)"""
+        return paginated_reviews(self, ProductReview.objects.filter(user=request.user))
     
     @action(detail=False, methods=['get'])
     def product_reviews(self, request):
+        """
+        Avaliações de um produto (?product_id= ou ?product_slug=), paginadas e
+        ordenadas por ?sort=, com o histograma pré-calculado das aprovadas
+        """
         product_id = request.query_params.get('product_id')
         product_slug = request.query_params.get('product_slug')
     
@@ -169,14 +383,39 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-        # Para usuários normais, filtrar apenas avaliações aprovadas
         if product_id:
-             reviews = ProductReview.objects.filter(product_id=product_id)
+            lookup = {'product_id': product_id}
         else:
-            reviews = ProductReview.objects.filter(product__slug=product_slug)
+            lookup = {'product__slug': product_slug}
+        try:
+            reviews = ProductReview.objects.filter(**lookup)
+            summary = ProductRatingSummary.objects.filter(**lookup).first()
+        except ValueError:
+            return Response({"detail": "product_id inválido"}, status=status.HTTP_400_BAD_REQUEST)
     
+        # Para usuários normais, filtrar apenas avaliações aprovadas
         if not request.user.is_staff:
              reviews = reviews.filter(is_approved=True)
     
-        serializer = self.get_serializer(reviews, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return paginated_reviews(self, reviews, summary)
+
+
+class ProductExportView(StreamingExportView):
+    """
+    Exportação completa do catálogo (CSV ou NDJSON) para parceiros e contabilidade.
+    O período (?date_from= / ?date_to=) é aplicado sobre updated_at, para
+    permitir sincronizações incrementais.
+    """
+    columns = [
+        ('id', 'id'), ('sku', 'sku'), ('name', 'name'), ('slug', 'slug'),
+        ('category', 'category__slug'), ('price', 'price'), ('discount_price', 'discount_price'),
+        ('stock', 'stock'), ('availability', 'availability'), ('is_emergency', 'is_emergency'),
+        ('weight', 'weight'), ('dimensions', 'dimensions'), ('is_active', 'is_active'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]
+    date_field = 'updated_at'
+    filter_params = {'category': 'category__slug', 'availability': 'availability', 'is_active': 'is_active'}
+    filename = 'produtos'
+
+    def get_queryset(self):
+        return Product.objects.all()